@@ -0,0 +1,237 @@
+"""
+historical candle backfill
+
+downloads a date range of candles for several symbols into the local candle store
+(utils.candle_store), e.g. years of 1m history for utils.resampler and the backtester:
+  - the range is split in pages of `limit` candles, pages of every symbol are requested
+    concurrently through one WeightScheduler (the exchange weight budget is shared)
+  - pages are written in order, a window at a time: an interrupted run keeps what was
+    written and a rerun only asks for what is missing (before the first / after the last
+    stored candle, and the gaps between them)
+  - candles after the stored ones are appended; the ones before or between them go with the
+    stored candles, in time order, to a staging store that then replaces the stored one, so the
+    store is never rewritten in memory and an interrupted rebuild resumes where it stopped
+  - gaps in the stored range are refetched once, the ones the exchange has no candles for
+    (maintenance) are only reported
+Market data comes from the public Binance USD-M endpoints (no api key, not the testnet, which
+keeps little history), or from the simulator when one is swapped in utils.api.
+
+usage: python script/backfill.py --symbols BTC/USDT,ETH/USDT --start 2021-01-01 [--end 2025-01-01] [--timeframe 1m]
+"""
+import asyncio
+import os
+import sys
+import time
+
+import ccxt
+import numpy as np
+import pandas as pd
+
+from utils.api import simulated_client
+from utils.async_api import get_async_client
+from utils.candle_store import CandleStore, as_columns, timeframe_to_ms
+from utils.rate_limit import WeightScheduler, klines_weight
+from utils.startup import load_cached_markets
+
+# candles per request: 1000 is the largest page at weight 5 (1500 costs 10)
+PAGE_LIMIT = 1000
+# pages downloaded before they are written to the store
+WINDOW = 50
+RETRIES = 5
+# directory of the staging store, under the candle store root (symbol directories have no '.')
+STAGING_DIR = '.staging'
+
+def public_client():
+    """
+    Async client of the public market data endpoints (the simulator's when one is swapped in).
+    """
+    if simulated_client() is not None:
+        return get_async_client()
+    # imported here like utils.async_api, ccxt.async_support is only needed by the async path
+    import ccxt.async_support as ccxt_async
+    # the WeightScheduler paces the requests, not ccxt's own throttle
+    client = ccxt_async.binanceusdm({'enableRateLimit': False, 'options': {'defaultType': 'future'}})
+    load_cached_markets(client)
+    return client
+
+def to_ms(date):
+    """
+    Milliseconds since epoch of a date string ('2021-01-01'), a timestamp or ms.
+    """
+    if isinstance(date, (int, np.integer)):
+        return int(date)
+    timestamp = pd.Timestamp(date)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize('UTC')
+    return timestamp.value // 10**6
+
+def pages(start, end, timeframe_ms, limit=PAGE_LIMIT):
+    """
+    [since, until) ranges of at most `limit` candles covering [start, end), aligned on candles.
+    """
+    start = -(-start // timeframe_ms) * timeframe_ms
+    step = limit * timeframe_ms
+    return [(since, min(since + step, end)) for since in range(start, end, step)]
+
+def find_gaps(timestamps, timeframe_ms, start=None, end=None):
+    """
+    [since, until) ranges of the candles missing from sorted timestamps, within [start, end).
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if start is not None:
+        timestamps = timestamps[timestamps >= start]
+    if end is not None:
+        timestamps = timestamps[timestamps < end]
+    if len(timestamps) < 2:
+        return []
+    holes = np.flatnonzero(np.diff(timestamps) > timeframe_ms)
+    return [(int(timestamps[i]) + timeframe_ms, int(timestamps[i + 1])) for i in holes]
+
+class Backfill:
+    """
+    concurrent, resumable download of candle ranges into a CandleStore
+    """
+    def __init__(self, client, store=None, timeframe='1m', limit=PAGE_LIMIT, scheduler=None, window=WINDOW):
+        self.client = client
+        self.store = store if store is not None else CandleStore()
+        self.timeframe = timeframe
+        self.timeframe_ms = timeframe_to_ms(timeframe)
+        self.limit = limit
+        self.scheduler = scheduler or WeightScheduler()
+        self.window = window
+        self.staging = CandleStore(os.path.join(self.store.root, STAGING_DIR))
+        self.requests = 0
+
+    async def fetch_page(self, symbol, since, until):
+        """
+        Candles of symbol in [since, until) as ccxt rows, retried on network errors and rate limits.
+        """
+        for attempt in range(RETRIES):
+            try:
+                async with self.scheduler.request(klines_weight(self.limit)):
+                    ohlcv = await self.client.fetch_ohlcv(symbol, timeframe=self.timeframe, since=since, limit=self.limit)
+                self.requests += 1
+                self.scheduler.observe(getattr(self.client, 'last_response_headers', None))
+                return [row for row in ohlcv if since <= row[0] < until]
+            except (ccxt.NetworkError, ccxt.RateLimitExceeded) as e:
+                if attempt == RETRIES - 1:
+                    raise
+                delay = 2 ** attempt
+                print(f"Retrying {symbol} page {since} in {delay}s: {e}")
+                await asyncio.sleep(delay)
+        return []
+
+    async def fetch_range(self, symbol, start, end, store=None):
+        """
+        Download [start, end) of symbol `window` pages at a time, in order, each window written
+        as it completes to store (the backfill's by default), whose candles are all older.
+        """
+        store = store if store is not None else self.store
+        ranges = pages(start, end, self.timeframe_ms, self.limit)
+        for i in range(0, len(ranges), self.window):
+            results = await asyncio.gather(*(self.fetch_page(symbol, since, until) for since, until in ranges[i:i + self.window]))
+            store.write(symbol, self.timeframe, [row for result in results for row in result])
+
+    def copy_stored(self, symbol, start, end):
+        """
+        Append the stored candles of [start, end) to the staging store, a window of candles at a time.
+        """
+        columns = self.store.read(symbol, self.timeframe, start=start, end=end)
+        step = self.window * self.limit
+        for i in range(0, len(columns['timestamp']), step):
+            self.staging.write(symbol, self.timeframe, {column: values[i:i + step] for column, values in columns.items()})
+
+    async def fetch_missing(self, symbol, ranges):
+        """
+        Download sorted [since, until) ranges before or between the stored candles: the stored
+        candles and the downloaded windows are appended in time order to the staging store,
+        which then replaces the stored candles. A rerun resumes after the last staged candle.
+        """
+        first = min(-(-ranges[0][0] // self.timeframe_ms) * self.timeframe_ms, self.store.first_timestamp(symbol, self.timeframe))
+        staged_first = self.staging.first_timestamp(symbol, self.timeframe)
+        if staged_first is not None and staged_first > first:
+            # left by a rebuild of a shorter range
+            self.staging.clear(symbol, self.timeframe)
+        staged_last = self.staging.last_timestamp(symbol, self.timeframe)
+        position = staged_last + 1 if staged_last is not None else None
+        for since, until in ranges:
+            if position is not None and position >= until:
+                continue
+            self.copy_stored(symbol, position, since)
+            await self.fetch_range(symbol, since if position is None else max(since, position), until, store=self.staging)
+            position = until
+        self.copy_stored(symbol, position, None)
+        self.store.replace(symbol, self.timeframe, self.staging)
+
+    async def backfill(self, symbol, start, end):
+        """
+        Bring the stored candles of symbol to cover [start, end): the missing tail is appended,
+        then the missing head and the gaps in between are fetched once through the staging
+        store. Returns the gaps still missing.
+        """
+        if self.store.count(symbol, self.timeframe) == 0 and self.staging.count(symbol, self.timeframe):
+            # interrupted while the staged candles replaced the stored ones
+            self.store.replace(symbol, self.timeframe, self.staging)
+        first = self.store.first_timestamp(symbol, self.timeframe)
+        last = self.store.last_timestamp(symbol, self.timeframe)
+        if first is None:
+            await self.fetch_range(symbol, start, end)
+        elif last + self.timeframe_ms < end:
+            # the last stored candle may have been written while still open
+            await self.fetch_range(symbol, last, end)
+        missing = find_gaps(self.store.read(symbol, self.timeframe)['timestamp'], self.timeframe_ms, start, end)
+        if first is not None and start < first:
+            missing.insert(0, (start, first))
+        gaps = missing
+        if missing:
+            await self.fetch_missing(symbol, missing)
+            gaps = find_gaps(self.store.read(symbol, self.timeframe)['timestamp'], self.timeframe_ms, start, end)
+        for since, until in gaps:
+            print(f"{symbol}: no {self.timeframe} candles on the exchange from {pd.Timestamp(since, unit='ms')} to {pd.Timestamp(until, unit='ms')}")
+        return gaps
+
+    async def run(self, symbols, start, end):
+        """
+        Backfill every symbol concurrently, returns {symbol: gaps still missing}.
+        """
+        results = await asyncio.gather(*(self.backfill(symbol, start, end) for symbol in symbols), return_exceptions=True)
+        gaps = {}
+        for symbol, result in zip(symbols, results):
+            if isinstance(result, ccxt.BaseError):
+                print(f"Error backfilling {symbol}: {result}")
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                gaps[symbol] = result
+        return gaps
+
+def parse_args(argv):
+    """
+    --flag value pairs of the command line as a dict.
+    """
+    return {argv[i][2:]: argv[i + 1] for i in range(len(argv) - 1) if argv[i].startswith('--')}
+
+async def run(argv):
+    """
+    backfill the symbols of the command line and print a summary
+    """
+    args = parse_args(argv)
+    if 'symbols' not in args or 'start' not in args:
+        print(__doc__)
+        return
+    client = public_client()
+    start = to_ms(args['start'])
+    end = to_ms(args['end']) if 'end' in args else client.milliseconds()
+    backfill = Backfill(client, timeframe=args.get('timeframe', '1m'))
+    symbols = args['symbols'].split(',')
+    began = time.perf_counter()
+    try:
+        await backfill.run(symbols, start, end)
+    finally:
+        await client.close()
+    for symbol in symbols:
+        print(f"{symbol}: {backfill.store.count(symbol, backfill.timeframe)} {backfill.timeframe} candles stored")
+    print(f"{backfill.requests} requests in {time.perf_counter() - began:.1f}s")
+
+if __name__ == "__main__":
+    asyncio.run(run(sys.argv[1:]))
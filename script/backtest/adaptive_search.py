@@ -0,0 +1,133 @@
+"""
+adaptive parameter search (successive halving)
+
+instead of a full backtest for every tuple of the grid:
+  - rung 0 backtests the candidates on the most recent `min_fraction` of the history only
+  - the best 1/eta of them (selection metric, trade count scaled to the window) move to the next
+    rung, backtested on eta times more history, until the survivors run on the whole history
+  - with sample < 1 only a random part of the grid starts at rung 0, the grid neighbours of the
+    survivors of each rung (one parameter moved by one step) are added to it, so the budget
+    goes to the regions that already score well
+Signals come from the whole history (indicator cache) and each rung simulates the tail rows,
+so a rung-0 backtest costs about min_fraction of a full one.
+Returns the full-history results of the last rung with the same columns as grid_search.
+"""
+import itertools
+import math
+import os
+import random
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backtest.backtest_simulation import (
+    FREQUENCY, fetch_historical_data, generate_signals_batch, simulate_batch,
+    backtest_result, param_grid
+)
+
+def evaluate(data, candidates, fraction=1.0, chunk_size=512):
+    """
+    Backtest rows (same as run_backtest) of the candidates on the last `fraction` of data.
+    """
+    start = len(data) - max(2, int(round(len(data) * fraction)))
+    results = []
+    for i in range(0, len(candidates), chunk_size):
+        chunk = candidates[i:i + chunk_size]
+        entries, exits = generate_signals_batch(data, chunk)
+        stats = simulate_batch(data.iloc[start:], entries[start:], exits[start:])
+        results.extend(backtest_result(params, stats.iloc[j]) for j, params in enumerate(chunk))
+    return results
+
+def rank(results, metric='sharpe_ratio', min_trades=0):
+    """
+    Indexes of results from best to worst metric, tuples under min_trades trades and undefined
+    (nan / inf) scores last.
+    """
+    def key(i):
+        score = results[i][metric]
+        valid = score is not None and np.isfinite(score) and results[i]['total_trades'] >= min_trades
+        return (0, -score) if valid else (1, 0)
+    return sorted(range(len(results)), key=key)
+
+def neighbours(params, values):
+    """
+    Tuples of the grid one step away from params on one numeric parameter.
+    values: sorted distinct values per position of the tuple (numeric positions only).
+    """
+    found = []
+    for position, axis in values.items():
+        i = axis.index(params[position])
+        for j in (i - 1, i + 1):
+            if 0 <= j < len(axis):
+                found.append(params[:position] + (axis[j],) + params[position + 1:])
+    return found
+
+def successive_halving(symbol='BTC-USD',
+                       data=None,
+                       metric='sharpe_ratio',
+                       eta=3,
+                       min_fraction=1 / 27,
+                       min_trades=10,
+                       sample=1.0,
+                       seed=0,
+                       chunk_size=512,
+                       **grid):
+    """
+    Successive halving over the grid (same keyword ranges as grid_search).
+    min_trades applies to the full history and is scaled down on partial ones.
+    Returns (results DataFrame of the full-history rung, number of backtests per rung).
+    """
+    if data is None:
+        data = fetch_historical_data(symbol)
+    grid.setdefault('ma_combinations', [('SMA', 'SMA'), ('EMA', 'EMA'), ('EMA', 'SMA'), ('SMA', 'EMA')])
+    space = param_grid(**grid)
+    in_grid = set(space)
+    values = {position: sorted({params[position] for params in space}) for position in range(5)}
+
+    candidates = space
+    if sample < 1:
+        candidates = random.Random(seed).sample(space, max(1, math.ceil(len(space) * sample)))
+    evaluated = set()
+    budget = []
+    for rung in itertools.count():
+        fraction = min(1.0, min_fraction * eta ** rung)
+        results = evaluate(data, candidates, fraction, chunk_size)
+        evaluated.update(candidates)
+        budget.append(len(candidates))
+        print(f"rung {rung}: {len(candidates)} candidates on {fraction:.1%} of the history")
+        if fraction >= 1.0:
+            return pd.DataFrame(results), budget
+        order = rank(results, metric, min_trades * fraction)
+        keep = [candidates[i] for i in order[:max(1, math.ceil(len(candidates) / eta))]]
+        if sample < 1:
+            # focus the next rung around the survivors: their grid neighbours not tried yet
+            extra = []
+            for params in keep:
+                extra.extend(n for n in neighbours(params, values) if n in in_grid and n not in evaluated)
+            extra = list(dict.fromkeys(extra))
+            if extra:
+                extra_results = evaluate(data, extra, fraction, chunk_size)
+                evaluated.update(extra)
+                budget[-1] += len(extra)
+                pool = keep + extra
+                pool_results = [results[i] for i in order[:len(keep)]] + extra_results
+                keep = [pool[i] for i in rank(pool_results, metric, min_trades * fraction)[:len(keep)]]
+        candidates = keep
+
+if __name__ == "__main__":
+    results_df, backtests = successive_halving(
+        symbol='BTC-USD',
+        short_window_range=range(4, 12),
+        long_window_range=range(14, 26),
+        rsi_window_range=range(7, 15),
+        rsi_buy_threshold_range=[35, 30, 40],
+        rsi_sell_threshold_range=[65, 60, 70],
+    )
+    print(f"backtests per rung: {backtests}")
+    results_df = results_df[(results_df['total_trades'] >= 10) & (results_df['total_return'] > 0)]
+    best_params_sharp = results_df.sort_values(by=['sharpe_ratio'], ascending=[False])
+    print(best_params_sharp.head(10))
+    os.makedirs('backtest_res', exist_ok=True)
+    best_params_sharp.to_csv(f'backtest_res/adaptive_search_freq_{FREQUENCY}_{pd.Timestamp.now():%Y%m%d_%H%M%S}.csv')
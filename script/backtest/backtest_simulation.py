@@ -1,26 +1,109 @@
 import vectorbt as vbt
+import numpy as np
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
 import datetime
+import hashlib
 import os
+import re
+import sys
 from multiprocessing import cpu_count, Pool
 
+# make utils importable when running this file directly from script/backtest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.candle_store import COLUMNS, CandleStore, timeframe_to_ms
+from utils.resampler import BASE_TIMEFRAME, resample
+from backtest.indicator_cache import IndicatorCache, dataset_key
+from backtest.shared_data import SharedSeries, attach
+from backtest.metrics import portfolio_stats
+from backtest.live_simulation import crossover_signals, live_rules, live_stats
+from backtest.result_store import ResultStore
+from backtest.heatmap_report import render_report
+
+# shared by every combination of a sweep, forked workers reuse the parent's entries and the disk layer
+INDICATOR_CACHE = IndicatorCache()
+
 FREQUENCY='1h'
+HISTORY_RANGES = {
+    '1d': ('2022-02-01', '2025-02-02'),
+    '1h': ('2023-06-02', '2025-02-02'),
+}
+
+def base_symbol(symbol):
+    """
+    Candle store symbol of the BASE_TIMEFRAME candles of a Yahoo symbol: backfill.py stores
+    exchange symbols, 'BTC-USD' -> 'BTC/USDT' (USDT perpetual prices, not the USD index).
+    Other symbols are used as is.
+    """
+    match = re.fullmatch(r'([A-Z0-9]+)-USD', symbol)
+    return f"{match.group(1)}/USDT" if match else symbol
+
+def fetch_historical_data(symbol='BTC-USD', store=None, timeframe=None):
+    """
+    Close price Series of fetch_historical_candles.
+    """
+    candles = fetch_historical_candles(symbol, store, timeframe)
+    return None if candles is None else candles['Close']
 
-def fetch_historical_data(symbol='BTC-USD'):
+def fetch_historical_candles(symbol='BTC-USD', store=None, timeframe=None):
     """
     Fetch historical OHLCV data using vectorbt's Yahoo Finance integration.
+    Candles are kept in the local candle store, Yahoo is only asked for the part of the
+    range that is not stored yet, so a warm store needs no download at all.
+    When the store holds 1m candles of base_symbol(symbol) covering the range (backfill.py),
+    the bars are resampled from them instead (utils.resampler), any timeframe without a download.
+    timeframe: defaults to FREQUENCY, its range is HISTORY_RANGES[timeframe] (FREQUENCY's when absent)
+    Returns a DataFrame with Open, High, Low, Close, Volume columns.
     """
-    if FREQUENCY=='1d':
-        data = vbt.YFData.download(symbol, start='2022-02-01', end='2025-02-02', interval=FREQUENCY).get('Close')
-    elif FREQUENCY=='1h':
-        data = vbt.YFData.download(symbol, start='2023-06-02', end='2025-02-02', interval=FREQUENCY).get('Close')
-    else:
+    timeframe = timeframe or FREQUENCY
+    history_range = HISTORY_RANGES.get(timeframe, HISTORY_RANGES.get(FREQUENCY))
+    if history_range is None:
         return None
+    store = store if store is not None else CandleStore()
+    start, end = (pd.Timestamp(date, tz='UTC') for date in history_range)
+    start_ms, end_ms = start.value // 10**6, end.value // 10**6
+    base = base_symbol(symbol)
+    base_first = store.first_timestamp(base, BASE_TIMEFRAME)
+    # up to the last base candle of the range, the last bar would be cut short otherwise
+    if base_first is not None and base_first <= start_ms and store.last_timestamp(base, BASE_TIMEFRAME) >= end_ms - timeframe_to_ms(BASE_TIMEFRAME):
+        candles = resample(store.read(base, BASE_TIMEFRAME, start=start_ms, end=end_ms), timeframe)
+    elif timeframe not in HISTORY_RANGES:
+        print(f"No {BASE_TIMEFRAME} candles of {base} in the store to resample to {timeframe} (see backfill.py)")
+        return None
+    else:
+        candles = download_history(symbol, timeframe, start, end, store)
+    index = pd.DatetimeIndex(pd.to_datetime(candles['timestamp'], unit='ms', utc=True), name='Date')
+    data = pd.DataFrame({column.capitalize(): np.array(candles[column]) for column in COLUMNS[1:]}, index=index)
     print("date range: ", data.index.min()," to " , data.index.max())
     return data
 
+def download_history(symbol, timeframe, start, end, store):
+    """
+    Candles of symbol / timeframe in [start, end) from the candle store, the part of the
+    range not stored yet is downloaded from Yahoo first.
+    """
+    start_ms, end_ms = start.value // 10**6, end.value // 10**6
+    first_timestamp = store.first_timestamp(symbol, timeframe)
+    last_timestamp = store.last_timestamp(symbol, timeframe)
+    if first_timestamp is None or first_timestamp > start_ms:
+        download_start = start
+    elif last_timestamp < end_ms - timeframe_to_ms(timeframe):
+        download_start = pd.Timestamp(last_timestamp, unit='ms', tz='UTC')
+    else:
+        download_start = None
+    if download_start is not None:
+        ohlcv = vbt.YFData.download(symbol, start=download_start, end=end, interval=timeframe).get()
+        store.write(symbol, timeframe, {
+            'timestamp': ohlcv.index.tz_convert('UTC').as_unit('ms').asi8,
+            'open': ohlcv['Open'].values,
+            'high': ohlcv['High'].values,
+            'low': ohlcv['Low'].values,
+            'close': ohlcv['Close'].values,
+            'volume': ohlcv['Volume'].values,
+        })
+    return store.read(symbol, timeframe, start=start_ms, end=end_ms)
+
 def generate_signals(
     data,
     short_window=5,
@@ -29,7 +112,8 @@ def generate_signals(
     rsi_buy_threshold=30,
     rsi_sell_threshold=70,
     short_type='SMA',
-    long_type='SMA'):
+    long_type='SMA',
+    cache=INDICATOR_CACHE):
     """
     Generate trading signals based on moving average crossover and an RSI filter.
     
@@ -40,22 +124,50 @@ def generate_signals(
     For a SELL signal:
       - The short-term MA is below the long-term MA (indicating downward momentum)
       - AND RSI is above the sell threshold (e.g., 70), suggesting the asset may be overbought.
+
+    Moving averages and RSI come from the indicator cache, so only the threshold
+    comparisons are computed per parameter tuple.
     """
-    if short_type == 'EMA':
-        ma_short = data.ewm(span=short_window, adjust=False).mean()
-    else:
-        ma_short = data.rolling(short_window).mean()
-    if long_type == 'EMA':
-        ma_long = data.ewm(span=long_window, adjust=False).mean()
-    else:
-        ma_long = data.rolling(long_window).mean()
-    # Calculate RSI
-    rsi = vbt.RSI.run(data, window=rsi_window).rsi
+    ma_short = cache.moving_average(data, short_window, short_type)
+    ma_long = cache.moving_average(data, long_window, long_type)
+    rsi = cache.rsi(data, rsi_window)
     # Generate entries and exits using MA crossover, MACD, and RSI filters
-    entries = (ma_short > ma_long) & (rsi < rsi_buy_threshold)
-    exits   = (ma_short < ma_long) & (rsi > rsi_sell_threshold)
+    entries = pd.Series((ma_short > ma_long) & (rsi < rsi_buy_threshold), index=data.index)
+    exits   = pd.Series((ma_short < ma_long) & (rsi > rsi_sell_threshold), index=data.index)
     return entries, exits
 
+RESULT_STATS = {
+    'total_return': 'Total Return [%]',
+    'win_rate_ratio': 'Win Rate [%]',
+    'profit_factor': 'Profit Factor',
+    'sharpe_ratio': 'Sharpe Ratio',
+    'calmar_ratio': 'Calmar Ratio',
+    'total_trades': 'Total Trades',
+    'avg_win_trade_duration': 'Avg Winning Trade Duration',
+    'avg_win_trade': 'Avg Winning Trade [%]',
+    'avg_lose_trade': 'Avg Losing Trade [%]',
+    'sortino_ratio': 'Sortino Ratio',
+    'omega_ratio': 'Omega Ratio',
+}
+
+def backtest_result(params, stats):
+    """
+    Build one grid search result row from a parameter tuple and its portfolio stats.
+    """
+    short_window, long_window, rsi_window, rsi_buy_threshold, rsi_sell_threshold, short_type, long_type = params
+    result = {
+        'short_window': short_window,
+        'long_window': long_window,
+        'rsi_window': rsi_window,
+        'rsi_buy_threshold': rsi_buy_threshold,
+        'rsi_sell_threshold': rsi_sell_threshold,
+        'short_type': short_type,
+        'long_type' : long_type,
+    }
+    for column, stat in RESULT_STATS.items():
+        result[column] = stats.get(stat, None)
+    return result
+
 def run_backtest(args):
     """
     Run a backtest using vectorbt.
@@ -89,35 +201,177 @@ def run_backtest(args):
     print(f"current cross:{short_window} {long_window} {rsi_window} {rsi_buy_threshold} {rsi_sell_threshold} {short_type} {long_type}")
 
 
-    # Analyze performance
-    stats = portfolio.stats()
+    # Analyze performance (only the RESULT_STATS metrics, same definitions as portfolio.stats())
+    stats = portfolio_stats(portfolio).iloc[0]
     # print(stats)
 
-    return {
-            'short_window': short_window,
-            'long_window': long_window,
-            'rsi_window': rsi_window,
-            'rsi_buy_threshold': rsi_buy_threshold,
-            'rsi_sell_threshold': rsi_sell_threshold,
-            'short_type': short_type,
-            'long_type' : long_type,
-            'total_return': stats.get('Total Return [%]', None),
-            'win_rate_ratio' : stats.get('Win Rate [%]', None),
-            'profit_factor' : stats.get('Profit Factor', None),
-            'sharpe_ratio': stats.get('Sharpe Ratio', None),
-            'calmar_ratio': stats.get('Calmar Ratio', None),
-            'total_trades': stats.get('Total Trades', None),
-            'avg_win_trade_duration' : stats.get('Avg Winning Trade Duration', None),
-            'avg_win_trade': stats.get('Avg Winning Trade [%]', None),
-            'avg_lose_trade': stats.get('Avg Losing Trade [%]', None),
-            'sortino_ratio': stats.get('Sortino Ratio', None),
-            'omega_ratio': stats.get('Omega Ratio', None)
-        }
+    return backtest_result(params, stats)
 
     # Plot the equity curve
     # portfolio.value().vbt.plot(title='Equity Curve')
     # portfolio.plots().show()
 
+def indicators_batch(data, param_combinations, cache=INDICATOR_CACHE):
+    """
+    2-D short MA, long MA and RSI arrays with one column per parameter tuple, each distinct
+    window from the indicator cache, and the RSI buy / sell thresholds of the tuples.
+    """
+    params = list(zip(*param_combinations))
+    short_windows, long_windows, rsi_windows, rsi_buy, rsi_sell, short_types, long_types = params
+    ma_keys = sorted(set(zip(short_types, short_windows)) | set(zip(long_types, long_windows)))
+    ma_columns = {key: i for i, key in enumerate(ma_keys)}
+    ma = np.column_stack([cache.moving_average(data, window, ma_type) for ma_type, window in ma_keys])
+    rsi_keys = sorted(set(rsi_windows))
+    rsi_columns = {window: i for i, window in enumerate(rsi_keys)}
+    rsi = np.column_stack([cache.rsi(data, window) for window in rsi_keys])
+
+    ma_short = ma[:, [ma_columns[key] for key in zip(short_types, short_windows)]]
+    ma_long = ma[:, [ma_columns[key] for key in zip(long_types, long_windows)]]
+    rsi = rsi[:, [rsi_columns[window] for window in rsi_windows]]
+    return ma_short, ma_long, rsi, np.asarray(rsi_buy), np.asarray(rsi_sell)
+
+def generate_signals_batch(data, param_combinations, cache=INDICATOR_CACHE):
+    """
+    Same signals as generate_signals for many parameter tuples at once, as 2-D boolean
+    entries and exits with one column per parameter tuple.
+    """
+    ma_short, ma_long, rsi, rsi_buy, rsi_sell = indicators_batch(data, param_combinations, cache)
+    entries = (ma_short > ma_long) & (rsi < rsi_buy)
+    exits = (ma_short < ma_long) & (rsi > rsi_sell)
+    return entries, exits
+
+def crossover_signals_batch(data, param_combinations, cache=INDICATOR_CACHE):
+    """
+    BUY / SELL arrays of the live engine (utils.signals.crossover_signal) for many parameter
+    tuples at once: on the crossing candles only, with the RSI filter on that candle.
+    """
+    return crossover_signals(*indicators_batch(data, param_combinations, cache))
+
+_WORKER_DATA = None
+
+def attach_worker_data(descriptor):
+    """
+    Pool initializer: attach the worker to the shared price Series once.
+    """
+    global _WORKER_DATA
+    _WORKER_DATA = attach(descriptor)
+
+def run_backtest_chunk(param_chunk):
+    """
+    Run the backtests of a chunk of parameter tuples on the worker's shared price Series.
+    Returns compact rows (stat values only, in RESULT_STATS order), the caller adds the parameters back.
+    """
+    data, _ = _WORKER_DATA
+    rows = []
+    for params in param_chunk:
+        result = run_backtest((data, params))
+        rows.append(tuple(result[column] for column in RESULT_STATS))
+    return rows
+
+def prefetch_indicators(data, param_combinations, cache=INDICATOR_CACHE):
+    """
+    Compute every distinct indicator series of a sweep once, before the workers start.
+    """
+    for short_window, long_window, rsi_window, _, _, short_type, long_type in param_combinations:
+        cache.moving_average(data, short_window, short_type)
+        cache.moving_average(data, long_window, long_type)
+        cache.rsi(data, rsi_window)
+
+def simulate_batch(data, entries, exits):
+    """
+    One vectorized portfolio simulation of 2-D entries / exits (one column per parameter tuple).
+    Returns the portfolio stats, one row per column.
+    """
+    # vectorbt iterates tz-aware indexes as Timestamp objects, the stats do not depend on the tz
+    if getattr(data.index, 'tz', None) is not None:
+        data = data.tz_localize(None)
+    columns = pd.RangeIndex(entries.shape[1])
+    portfolio = vbt.Portfolio.from_signals(
+        data,
+        entries=pd.DataFrame(entries, index=data.index, columns=columns),
+        exits=pd.DataFrame(exits, index=data.index, columns=columns),
+        size=1.0,
+        fees=0.001,
+        freq='1h'
+    )
+    return portfolio_stats(portfolio)
+
+def run_backtest_batch(data, param_combinations, chunk_size=512, on_chunk=None):
+    """
+    Backtest many parameter tuples with one vectorized portfolio simulation per chunk of
+    `chunk_size` tuples (one column per tuple) instead of one Portfolio per tuple.
+    on_chunk(rows) is called with the rows of every chunk as soon as it is done.
+    Returns the same result rows as run_backtest, in the order of param_combinations.
+    """
+    results = []
+    for start in range(0, len(param_combinations), chunk_size):
+        chunk = param_combinations[start:start + chunk_size]
+        entries, exits = generate_signals_batch(data, chunk)
+        stats = simulate_batch(data, entries, exits)
+        print(f"backtested {start + len(chunk)}/{len(param_combinations)} combinations")
+        rows = [backtest_result(params, stats.iloc[i]) for i, params in enumerate(chunk)]
+        if on_chunk is not None:
+            on_chunk(rows)
+        results.extend(rows)
+    return results
+
+def run_live_batch(candles, param_combinations, chunk_size=512, on_chunk=None, **rules):
+    """
+    Backtest the parameter tuples with the live trading rules (backtest/live_simulation.py:
+    risk sizing, stop-loss / take-profit hit intrabar, long / short flipping), one simulation
+    per chunk of `chunk_size` tuples (one column per tuple).
+    candles: DataFrame with Open, High, Low, Close columns (fetch_historical_candles)
+    rules: risk_percentage, stop_loss_pct, take_profit_pct, fee, leverage of simulate_live
+    The signals are the live engine's (crossover_signals_batch): a BUY / SELL only on the
+    candle the MAs cross, when the RSI filter holds on it.
+    Returns the same result rows as run_backtest_batch.
+    """
+    data = candles['Close']
+    results = []
+    for start in range(0, len(param_combinations), chunk_size):
+        chunk = param_combinations[start:start + chunk_size]
+        buy, sell = crossover_signals_batch(data, chunk)
+        stats = live_stats(candles, buy, sell, freq=FREQUENCY, **rules)
+        print(f"backtested {start + len(chunk)}/{len(param_combinations)} combinations (live rules)")
+        rows = [backtest_result(params, stats.iloc[i]) for i, params in enumerate(chunk)]
+        if on_chunk is not None:
+            on_chunk(rows)
+        results.extend(rows)
+    return results
+
+def live_dataset_key(candles, rules=None):
+    """
+    Result store key of a live sweep: the live results depend on the open, high, low and
+    close of the candles and on the simulate_live rules (defaults included), not only on the closes.
+    """
+    ohlc = candles[['Open', 'High', 'Low', 'Close']]
+    digest = hashlib.sha1(''.join(dataset_key(ohlc[column]) for column in ohlc).encode())
+    digest.update(repr(sorted(live_rules(**(rules or {})).items())).encode())
+    return digest.hexdigest()[:16] + '-live'
+
+def param_grid(short_window_range=None,
+               long_window_range=None,
+               rsi_window_range=None,
+               rsi_buy_threshold_range=None,
+               rsi_sell_threshold_range=None,
+               ma_combinations=None):
+    """
+    Every parameter tuple of the grid (long window strictly above the short one).
+    """
+    return [
+        (short_window, long_window, rsi_window, rsi_buy_threshold, rsi_sell_threshold, short_type, long_type) # macd_signal, macd_short, macd_long,
+        for short_window in (short_window_range  if short_window_range is not None else [])
+        for long_window in (long_window_range if long_window_range is not None else [])
+        if long_window > short_window
+        # for macd_signal in (macd_window_range if macd_window_range is not None else [])
+        # for macd_short in (macd_short_window if macd_short_window is not None else [])
+        # for macd_long in (macd_long_window if macd_long_window is not None else [])
+        for rsi_window in (rsi_window_range if rsi_window_range is not None else [])
+        for rsi_buy_threshold in (rsi_buy_threshold_range if rsi_buy_threshold_range is not None else [])
+        for rsi_sell_threshold in (rsi_sell_threshold_range if rsi_sell_threshold_range is not None else [])
+        for short_type, long_type in (ma_combinations if ma_combinations is not None else [])
+    ]
+
 def grid_search(symbol='BTC-USD',
                 short_window_range=None,
                 long_window_range=None,
@@ -127,37 +381,90 @@ def grid_search(symbol='BTC-USD',
                 rsi_window_range=None,
                 rsi_buy_threshold_range=None,
                 rsi_sell_threshold_range=None,
-                ma_combinations=[('SMA', 'SMA'), ('EMA', 'EMA'), ('EMA', 'SMA'), ('SMA', 'EMA')]
+                ma_combinations=[('SMA', 'SMA'), ('EMA', 'EMA'), ('EMA', 'SMA'), ('SMA', 'EMA')],
+                batched=False,
+                chunk_size=512,
+                data=None,
+                store=None,
+                live=False,
+                rules=None
             ):
     """
     Perform a grid search over the specified parameter ranges.
+    batched: simulate chunks of `chunk_size` combinations as columns of one vectorized portfolio
+    instead of one run_backtest call per combination in a process pool.
+    In the process pool, workers read the price Series from shared memory and receive only
+    chunks of `chunk_size` parameter tuples.
+    data: price Series to use instead of the history of symbol (e.g. synthetic data for benchmarks).
+    store: ResultStore (backtest/result_store.py) the rows are written to as each chunk completes,
+    keyed by the dataset hash and the parameter tuple; the tuples it already holds for this
+    dataset are not backtested again, so an interrupted sweep resumes where it stopped.
+    live: simulate the live trading rules with run_live_batch instead of vectorbt's size=1
+    portfolio, data is then a candle DataFrame (Open, High, Low, Close).
+    rules: dict of simulate_live rules for live (risk_percentage, stop_loss_pct, take_profit_pct,
+    fee, leverage, init_cash), its defaults for the ones not given.
     Returns a DataFrame of performance statistics for each parameter combination.
     """
     # Fetch historical data once
-    data = fetch_historical_data(symbol)
-    param_combinations = [
-        (short_window, long_window, rsi_window, rsi_buy_threshold, rsi_sell_threshold, short_type, long_type) # macd_signal, macd_short, macd_long,
-        for short_window in (short_window_range  if short_window_range is not None else [])
-        for long_window in (long_window_range if long_window_range is not None else [])
-        if long_window > short_window
-        # for macd_signal in (macd_window_range if macd_window_range is not None else [])
-        # for macd_short in (macd_short_window if macd_short_window is not None else [])
-        # for macd_long in (macd_long_window if macd_long_window is not None else [])
-        for rsi_window in (rsi_window_range if rsi_window_range is not None else [])
-        for rsi_buy_threshold in (rsi_buy_threshold_range if rsi_buy_threshold_range is not None else [])
-        for rsi_sell_threshold in (rsi_sell_threshold_range if rsi_sell_threshold_range is not None else [])
-        for short_type, long_type in (ma_combinations if ma_combinations is not None else [])
-    ]
+    if data is None:
+        data = fetch_historical_candles(symbol) if live else fetch_historical_data(symbol)
+    candles = data if live else None
+    if live:
+        data = candles['Close']
+    param_combinations = param_grid(
+        short_window_range, long_window_range, rsi_window_range,
+        rsi_buy_threshold_range, rsi_sell_threshold_range, ma_combinations
+    )
+    on_chunk = None
+    todo = param_combinations
+    if store is not None:
+        # live results are not the vectorbt ones of the same prices
+        dataset = live_dataset_key(candles, rules) if live else dataset_key(data)
+        store.register_dataset(dataset, data, symbol, FREQUENCY)
+        todo = store.pending(dataset, param_combinations)
+        print(f"result store: {len(param_combinations) - len(todo)}/{len(param_combinations)} combinations already done")
+        on_chunk = lambda rows: store.write(dataset, rows)
 
-    with Pool(cpu_count()) as pool:
-        results = pool.map(run_backtest, [(data, params) for params in param_combinations])
+    if live:
+        results = run_live_batch(candles, todo, chunk_size=chunk_size, on_chunk=on_chunk, **(rules or {}))
+    elif batched:
+        results = run_backtest_batch(data, todo, chunk_size=chunk_size, on_chunk=on_chunk)
+    else:
+        results = run_backtest_pool(data, todo, chunk_size=chunk_size, on_chunk=on_chunk)
+    if store is not None:
+        return store.results_for(dataset, param_combinations)
     return pd.DataFrame(results)
 
+def run_backtest_pool(data, param_combinations, chunk_size=512, on_chunk=None):
+    """
+    Backtest the parameter tuples by chunks in a process pool (run_backtest per tuple).
+    on_chunk(rows) is called with the rows of every chunk as soon as it is done.
+    Returns the result rows, in the order of param_combinations.
+    """
+    if not param_combinations:
+        return []
+    prefetch_indicators(data, param_combinations)
+    chunk_size = max(1, min(chunk_size, -(-len(param_combinations) // cpu_count())))
+    chunks = [param_combinations[i:i + chunk_size] for i in range(0, len(param_combinations), chunk_size)]
+    results = []
+    with SharedSeries(data) as shared:
+        with Pool(cpu_count(), initializer=attach_worker_data, initargs=(shared.descriptor,)) as pool:
+            for chunk, rows in zip(chunks, pool.imap(run_backtest_chunk, chunks)):
+                rows = [{**backtest_result(params, {}), **dict(zip(RESULT_STATS, row))} for params, row in zip(chunk, rows)]
+                if on_chunk is not None:
+                    on_chunk(rows)
+                results.extend(rows)
+    return results
+
 def create_heatmaps(df, metrics, param1, param2, ma_methode):
+    """
+    Interactive heatmaps, one figure per metric (see backtest/heatmap_report.py for the
+    headless batch report).
+    """
     heatmaps = {}
     for metric in metrics:
         heatmap_data = df.pivot_table(index=param1, columns=param2, values=metric)
-        plt.figure(figsize=(10,6))
+        figure = plt.figure(figsize=(10,6))
         try:
             sns.heatmap(heatmap_data, annot=True, cmap='viridis', cbar_kws={'label': metric})
         except ValueError:
@@ -165,7 +472,7 @@ def create_heatmaps(df, metrics, param1, param2, ma_methode):
         plt.title(f'Heatmap of {metric} for {param1} vs {param2} ({ma_methode[0]}-{ma_methode[1]})')
         plt.xlabel(f'xlabel: {param1}')
         plt.ylabel(f'ylabel: {param2}')
-        heatmaps[metric] = plt
+        heatmaps[metric] = figure
     return heatmaps
 
 if __name__ == "__main__":
@@ -193,7 +500,10 @@ if __name__ == "__main__":
         rsi_window_range=rsi_window,
         rsi_buy_threshold_range=rsi_buy_threshold,
         rsi_sell_threshold_range=rsi_sell_threshold,
-        ma_combinations=ma_tuples
+        ma_combinations=ma_tuples,
+        batched=True,
+        # rows are checkpointed as they complete, a rerun only backtests what is missing
+        store=ResultStore()
     )
 
     results_df = results_df[(results_df['total_trades'] >= 10) & (results_df['total_return'] > 0) ]
@@ -204,25 +514,6 @@ if __name__ == "__main__":
     res = best_params_sharp.to_csv(full_path+'backtest_res/' + file_name + '.csv')
     best_params_win_ration.to_csv(full_path+'backtest_res/' + file_name+'_win_ratio.csv')
     print(best_params_sharp.head(10))
-    for ma_types in ma_tuples:
-        filtered_results = results_df[(results_df['short_type'] == ma_types[0]) & (results_df['long_type'] == ma_types[1])]
-        if filtered_results.empty:
-            continue
-        heatmap_window = create_heatmaps(results_df, tested_metrics, 'short_window', 'long_window', ma_types)
-        # heatmap_macd_short = create_heatmaps(results_df, tested_metrics, 'macd_window', 'macd_short', ma_types)
-        # heatmap_macd_long = create_heatmaps(results_df, tested_metrics, 'macd_window', 'macd_long', ma_types)
-        # heatmap_macd_window = create_heatmaps(results_df, tested_metrics, 'macd_short', 'macd_long', ma_types)
-        heatmap_rsi_buy = create_heatmaps(results_df, tested_metrics, 'rsi_window', 'rsi_buy_threshold', ma_types)
-        heatmap_rsi_sell = create_heatmaps(results_df, tested_metrics, 'rsi_window', 'rsi_sell_threshold', ma_types)
-        heatmap_rsi_buy_sell = create_heatmaps(results_df, tested_metrics, 'rsi_buy_threshold', 'rsi_sell_threshold', ma_types)
-        for metric, plt in heatmap_window.items():
-            plt.show()
-        """
-        for metric, plt in heatmap_macd_short.items():
-            plt.show()
-        for metric, plt in heatmap_macd_long.items():
-            plt.show()
-        for metric, plt in heatmap_macd_window.items():
-            plt.show()
-        """
- 
\ No newline at end of file
+    # every MA combination x parameter pair x metric heatmap, rendered headlessly with an index.html
+    report = render_report(results_df, full_path + 'backtest_res/' + file_name + '_heatmaps', metrics=tested_metrics, ma_combinations=ma_tuples)
+    print(f"heatmaps: {report}")
@@ -0,0 +1,184 @@
+"""
+headless heatmap report of a grid search
+
+renders every (MA combination, parameter pair, metric) heatmap of a results DataFrame to PNG
+files with the Agg renderer (no display needed) and writes one index.html linking them:
+  - the pivots are computed once per (MA combination, parameter pair) for all metrics
+  - the heatmaps are split across a process pool, every worker draws on one figure and, when
+    the pivot has the shape of the previous one, only updates its cells, color scale and labels
+    (no new figure, axes, colorbar or annotation artists per heatmap)
+usage: python script/backtest/heatmap_report.py RESULTS.csv [OUTPUT_DIR] [--processes N]
+"""
+import html
+import os
+import sys
+from multiprocessing import Pool, cpu_count
+
+from matplotlib.figure import Figure
+import numpy as np
+import pandas as pd
+
+METRICS = ['sharpe_ratio', 'calmar_ratio', 'total_trades', 'avg_win_trade', 'avg_lose_trade', 'sortino_ratio', 'omega_ratio', 'win_rate_ratio']
+PAIRS = [
+    ('short_window', 'long_window'),
+    ('rsi_window', 'rsi_buy_threshold'),
+    ('rsi_window', 'rsi_sell_threshold'),
+    ('rsi_buy_threshold', 'rsi_sell_threshold'),
+]
+MA_COMBINATIONS = [('SMA', 'SMA'), ('EMA', 'EMA'), ('EMA', 'SMA'), ('SMA', 'EMA')]
+
+def heatmap_jobs(df, metrics=METRICS, pairs=PAIRS, ma_combinations=MA_COMBINATIONS):
+    """
+    One (ma_types, param1, param2, metric, pivot) job per heatmap to draw,
+    pivots are the mean of the metric over the other parameters.
+    """
+    jobs = []
+    metrics = [metric for metric in metrics if metric in df.columns]
+    for ma_types in ma_combinations:
+        group = df[(df['short_type'] == ma_types[0]) & (df['long_type'] == ma_types[1])]
+        if group.empty:
+            continue
+        values = group[metrics].apply(pd.to_numeric, errors='coerce').replace([np.inf, -np.inf], np.nan)
+        for param1, param2 in pairs:
+            # one groupby for every metric of the pair
+            means = values.groupby([group[param1], group[param2]]).mean()
+            for metric in metrics:
+                pivot = means[metric].unstack(param2)
+                if pivot.notna().to_numpy().any():
+                    jobs.append((ma_types, param1, param2, metric, pivot))
+    return jobs
+
+def image_name(ma_types, param1, param2, metric):
+    """
+    File name of a heatmap image.
+    """
+    return f'{ma_types[0]}-{ma_types[1]}_{param1}_vs_{param2}_{metric}.png'
+
+def _text_color(mesh, value):
+    # dark text on light cells, light text on dark ones (as seaborn's annotations)
+    r, g, b, _ = mesh.cmap(mesh.norm(value))
+    return 'black' if 0.2126 * r + 0.7152 * g + 0.0722 * b > 0.408 else 'white'
+
+# per process: the figure and, for the last pivot shape drawn, its mesh / colorbar / annotations
+_CANVAS = {}
+
+def draw_heatmap(pivot, title, label):
+    """
+    Draw pivot as an annotated heatmap on the process' figure and return the figure.
+    The artists of the previous heatmap are updated in place when the pivot has the same shape.
+    """
+    if 'figure' not in _CANVAS:
+        # not a pyplot figure: rendered by Agg, no display and no global backend switch
+        _CANVAS['figure'] = Figure(figsize=(10, 6))
+    figure = _CANVAS['figure']
+    values = pivot.to_numpy(dtype=float)
+    masked = np.ma.masked_invalid(values)
+    if _CANVAS.get('shape') != values.shape:
+        figure.clear()
+        ax = figure.add_subplot()
+        mesh = ax.pcolormesh(masked, cmap='viridis')
+        colorbar = figure.colorbar(mesh, ax=ax)
+        ax.set_xticks(np.arange(values.shape[1]) + 0.5)
+        ax.set_yticks(np.arange(values.shape[0]) + 0.5)
+        # first row on top, as in seaborn
+        ax.invert_yaxis()
+        texts = [[ax.text(j + 0.5, i + 0.5, '', ha='center', va='center') for j in range(values.shape[1])]
+                 for i in range(values.shape[0])]
+        _CANVAS.update(shape=values.shape, ax=ax, mesh=mesh, colorbar=colorbar, texts=texts)
+    ax, mesh, colorbar, texts = (_CANVAS[key] for key in ('ax', 'mesh', 'colorbar', 'texts'))
+    mesh.set_array(masked)
+    mesh.set_clim(masked.min(), masked.max())
+    colorbar.set_label(label)
+    for i, row in enumerate(values):
+        for j, value in enumerate(row):
+            if np.isnan(value):
+                texts[i][j].set_text('')
+            else:
+                texts[i][j].set_text(f'{value:.2f}')
+                texts[i][j].set_color(_text_color(mesh, value))
+    ax.set_xticklabels(pivot.columns)
+    ax.set_yticklabels(pivot.index)
+    ax.set_xlabel(pivot.columns.name)
+    ax.set_ylabel(pivot.index.name)
+    ax.set_title(title)
+    return figure
+
+def render_jobs(jobs, directory, dpi=80):
+    """
+    Draw jobs to PNG files in directory, returns the file names.
+    """
+    names = []
+    for ma_types, param1, param2, metric, pivot in jobs:
+        figure = draw_heatmap(pivot, f'Heatmap of {metric} for {param1} vs {param2} ({ma_types[0]}-{ma_types[1]})', metric)
+        name = image_name(ma_types, param1, param2, metric)
+        figure.savefig(os.path.join(directory, name), dpi=dpi)
+        names.append(name)
+    return names
+
+def _render_chunk(args):
+    return render_jobs(*args)
+
+def write_index(jobs, directory, title='grid search heatmaps'):
+    """
+    Write index.html showing the images of jobs, one section per MA combination and parameter pair.
+    Returns its path.
+    """
+    sections = {}
+    for ma_types, param1, param2, metric, _ in jobs:
+        sections.setdefault((ma_types, param1, param2), []).append(metric)
+    lines = [
+        '<!DOCTYPE html>', '<html><head><meta charset="utf-8">', f'<title>{html.escape(title)}</title>',
+        '<style>body{font-family:sans-serif} .grid{display:flex;flex-wrap:wrap;gap:8px} '
+        '.grid img{width:480px} nav a{margin-right:12px}</style>',
+        '</head><body>', f'<h1>{html.escape(title)}</h1>', '<nav>',
+    ]
+    anchors = {ma_types: f'{ma_types[0]}-{ma_types[1]}' for ma_types, _, _ in sections}
+    lines.extend(f'<a href="#{anchor}">{anchor}</a>' for anchor in anchors.values())
+    lines.append('</nav>')
+    current = None
+    for (ma_types, param1, param2), metrics in sections.items():
+        if ma_types != current:
+            current = ma_types
+            lines.append(f'<h2 id="{anchors[ma_types]}">{anchors[ma_types]}</h2>')
+        lines.append(f'<h3>{html.escape(param1)} vs {html.escape(param2)}</h3>')
+        lines.append('<div class="grid">')
+        for metric in metrics:
+            name = html.escape(image_name(ma_types, param1, param2, metric))
+            lines.append(f'<a href="{name}"><img src="{name}" alt="{html.escape(metric)}" loading="lazy"></a>')
+        lines.append('</div>')
+    lines.append('</body></html>')
+    path = os.path.join(directory, 'index.html')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines))
+    return path
+
+def render_report(df, directory, metrics=METRICS, pairs=PAIRS, ma_combinations=MA_COMBINATIONS,
+                  processes=None, dpi=80, title='grid search heatmaps'):
+    """
+    Render every heatmap of the grid search results df to directory and write its index.html.
+    Returns the path of index.html.
+    """
+    os.makedirs(directory, exist_ok=True)
+    jobs = heatmap_jobs(df, metrics, pairs, ma_combinations)
+    processes = max(1, min(processes or cpu_count(), len(jobs)))
+    if processes == 1:
+        render_jobs(jobs, directory, dpi)
+    else:
+        # interleaved so every worker gets a mix of small and large pivots
+        chunks = [(jobs[i::processes], directory, dpi) for i in range(processes)]
+        with Pool(processes) as pool:
+            pool.map(_render_chunk, chunks)
+    return write_index(jobs, directory, title)
+
+if __name__ == "__main__":
+    ARGS = sys.argv[1:]
+    PROCESSES = None
+    if '--processes' in ARGS:
+        PROCESSES = int(ARGS.pop(ARGS.index('--processes') + 1))
+        ARGS.remove('--processes')
+    if not ARGS:
+        print(__doc__)
+        sys.exit(1)
+    RESULTS = ARGS[0]
+    OUTPUT = ARGS[1] if len(ARGS) > 1 else os.path.splitext(RESULTS)[0] + '_heatmaps'
+    print(f"report written to {render_report(pd.read_csv(RESULTS), OUTPUT, processes=PROCESSES)}")
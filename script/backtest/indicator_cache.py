@@ -0,0 +1,165 @@
+"""
+indicator cache for the grid search
+
+every moving average / RSI series is computed once per dataset and keyed by
+(dataset hash, indicator, window, type). Two layers:
+  - in-process LRU bounded by `max_bytes`
+  - on-disk .npy files shared by the worker processes (read back memory-mapped,
+    so the OS page cache holds one copy for all workers), bounded by `max_disk_bytes`
+    with least recently used files evicted first
+"""
+import hashlib
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import vectorbt as vbt
+
+DEFAULT_CACHE_DIR = os.getenv(
+    'INDICATOR_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'indicators')
+)
+
+def dataset_key(data):
+    """
+    Stable hash of a price Series (values and index) used to key its indicators.
+    """
+    digest = hashlib.sha1(np.ascontiguousarray(data.values, dtype=np.float64).tobytes())
+    index = data.index
+    if isinstance(index, pd.DatetimeIndex):
+        digest.update(np.ascontiguousarray(index.asi8).tobytes())
+    else:
+        # RangeIndex, integer or any other index: hashed by value, its dtype kept apart
+        digest.update(str(index.dtype).encode())
+        digest.update(pd.util.hash_pandas_object(index, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+def compute_indicator(data, indicator, window, ma_type=None):
+    """
+    Compute one indicator series as a float64 array, same formulas as generate_signals.
+    indicator: 'MA' (ma_type 'SMA' or 'EMA') or 'RSI'
+    """
+    if indicator == 'RSI':
+        return vbt.RSI.run(data, window=window).rsi.values
+    if indicator == 'MA':
+        if ma_type == 'EMA':
+            return data.ewm(span=window, adjust=False).mean().values
+        return data.rolling(window).mean().values
+    raise ValueError(f"Invalid indicator: {indicator}")
+
+class IndicatorCache:
+    """
+    memoized indicator series keyed by (dataset, indicator, window, type)
+    """
+    def __init__(self, max_bytes=256 * 1024 * 1024, directory=DEFAULT_CACHE_DIR, max_disk_bytes=1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._last_dataset = (None, None)
+
+    def _dataset_key(self, data):
+        # hashing is skipped when the same Series object is passed again
+        if self._last_dataset[0] is data:
+            return self._last_dataset[1]
+        key = dataset_key(data)
+        self._last_dataset = (data, key)
+        return key
+
+    def _path(self, key):
+        return os.path.join(self.directory, '_'.join(str(part) for part in key) + '.npy')
+
+    def get(self, data, indicator, window, ma_type=None):
+        """
+        Return the indicator series for data as a read-only numpy array.
+        """
+        if indicator == 'RSI':
+            ma_type = None
+        key = (self._dataset_key(data), indicator, window, ma_type or '')
+        values = self.entries.get(key)
+        if values is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return values
+        self.misses += 1
+        values = self._load(key)
+        if values is None:
+            values = compute_indicator(data, indicator, window, ma_type)
+            self._store(key, values)
+        values.flags.writeable = False
+        self._remember(key, values)
+        return values
+
+    def moving_average(self, data, window, ma_type='SMA'):
+        """
+        Cached SMA / EMA of data.
+        """
+        return self.get(data, 'MA', window, ma_type)
+
+    def rsi(self, data, window):
+        """
+        Cached RSI of data.
+        """
+        return self.get(data, 'RSI', window)
+
+    def _remember(self, key, values):
+        self.entries[key] = values
+        self.nbytes += values.nbytes
+        while self.nbytes > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+
+    def _load(self, key):
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            values = np.load(path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        # touch so the disk eviction keeps recently used files
+        os.utime(path)
+        return values
+
+    def _store(self, key, values):
+        if self.directory is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        # unique temp name so concurrent workers never read a half written file
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, values)
+        os.replace(tmp_path, path)
+        self._evict_disk()
+
+    def _evict_disk(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.npy'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in files)
+        for _, size, name in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        """
+        Drop the in-process entries (files on disk are kept).
+        """
+        self.entries.clear()
+        self.nbytes = 0
@@ -0,0 +1,178 @@
+"""
+intrabar simulation of the live trading rules
+
+run_backtest trades a fixed size of 1 on signal entries and exits. simulate_live replays what
+main.handle_signal and the exchange (utils.simulator.SimulatedExchange rules) do instead:
+  - a signal cancels the resting stop-loss / take-profit, sizes the order with
+    calculate_position_size on the free balance (risk_percentage of it over the stop-loss
+    distance), closes the opposite side and opens (or adds to) the signal's side at the close,
+    then places new closePosition brackets at calculate_stop_loss_take_profit of that close
+  - brackets trigger on the high / low of the following candles, filled at their price (at the
+    open when the candle gaps through it), the one closest to the open first when both trigger
+  - taker fee on every fill, margin of entry notional / leverage, an entry costing more than
+    the free balance (wallet + unrealized loss - margin) is rejected, as on the exchange
+A BUY signal wins over a SELL on the same candle, as in generate_signals.
+Every column is one simulation (one parameter tuple), all columns advance together candle by
+candle. The equity curve and trade records feed backtest.metrics.compute_metrics.
+"""
+import inspect
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backtest.metrics import compute_metrics
+from utils.risk_management import calculate_stop_loss_take_profit_batch, calculate_position_size_batch
+
+# same fields as the vectorbt trade records backtest.metrics reads
+TRADE_DTYPE = np.dtype([
+    ('col', np.int64), ('size', np.float64), ('entry_idx', np.int64), ('entry_price', np.float64),
+    ('exit_idx', np.int64), ('exit_price', np.float64), ('pnl', np.float64), ('return', np.float64),
+    ('direction', np.int64), ('status', np.int64),
+])
+TRADE_STATUS_OPEN = 0
+TRADE_STATUS_CLOSED = 1
+
+def crossover_signals(ma_short, ma_long, rsi, rsi_buy_threshold, rsi_sell_threshold):
+    """
+    BUY and SELL arrays of utils.signals.crossover_signal at every candle of 2-D indicator arrays
+    (candles x columns, thresholds scalars or one per column): a BUY on the candle where the
+    short MA crosses above the long one with the RSI below rsi_buy_threshold on that candle,
+    a SELL on the cross below with the RSI above rsi_sell_threshold. NaN gives no signal.
+    """
+    ma_short, ma_long, rsi = (np.asarray(a, dtype=np.float64) for a in (ma_short, ma_long, rsi))
+    prev_short = np.vstack([np.full((1, ma_short.shape[1]), np.nan), ma_short[:-1]])
+    prev_long = np.vstack([np.full((1, ma_long.shape[1]), np.nan), ma_long[:-1]])
+    buy = (prev_short < prev_long) & (ma_short > ma_long) & (rsi < np.asarray(rsi_buy_threshold))
+    sell = (prev_short > prev_long) & (ma_short < ma_long) & (rsi > np.asarray(rsi_sell_threshold))
+    return buy, sell
+
+def _per_column(value, ncols):
+    # scalar or one value per column -> writable float array of ncols
+    return np.broadcast_to(np.asarray(value, dtype=np.float64), (ncols,)).copy()
+
+def simulate_live(open_, high, low, close, buy, sell, init_cash=10000.0, risk_percentage=3,
+                  stop_loss_pct=7, take_profit_pct=5, fee=0.0004, leverage=20):
+    """
+    open_, high, low, close: 1-D candle arrays
+    buy, sell: 2-D signal arrays (candles x columns), True = handle_signal('BUY' / 'SELL') at the close
+    init_cash, risk_percentage, stop_loss_pct, take_profit_pct: scalars or one value per column
+    Returns (value, trades): the 2-D equity curve at every close and the trade records
+    (a trade lasts from the first fill of a side until it is flat again).
+    """
+    open_, high, low, close = (np.asarray(a, dtype=np.float64) for a in (open_, high, low, close))
+    buy = np.asarray(buy, dtype=bool)
+    sell = np.asarray(sell, dtype=bool) & ~buy
+    n, ncols = buy.shape
+    wallet = _per_column(init_cash, ncols)
+    risk = _per_column(risk_percentage, ncols)
+    sl_pct, tp_pct = _per_column(stop_loss_pct, ncols), _per_column(take_profit_pct, ncols)
+    side = np.zeros(ncols, dtype=np.int64)
+    size = np.zeros(ncols)
+    entry = np.zeros(ncols)
+    stop_loss = np.full(ncols, np.nan)
+    take_profit = np.full(ncols, np.nan)
+    entry_idx = np.zeros(ncols, dtype=np.int64)
+    trade_fees = np.zeros(ncols)
+    value = np.empty((n, ncols))
+    records = []
+    signaled = (buy | sell).any(axis=1)
+
+    def close_position(cols, price, t, status=TRADE_STATUS_CLOSED):
+        # close the whole position of cols at price (scalar or per col), record the trade
+        price = np.broadcast_to(price, cols.shape)
+        exit_fee = price * size[cols] * fee if status == TRADE_STATUS_CLOSED else 0.0
+        gross = (price - entry[cols]) * size[cols] * side[cols]
+        pnl = gross - trade_fees[cols] - exit_fee
+        trades = np.empty(len(cols), dtype=TRADE_DTYPE)
+        trades['col'], trades['size'], trades['direction'], trades['status'] = cols, size[cols], (side[cols] < 0), status
+        trades['entry_idx'], trades['entry_price'] = entry_idx[cols], entry[cols]
+        trades['exit_idx'], trades['exit_price'] = t, price
+        trades['pnl'] = pnl
+        trades['return'] = pnl / (entry[cols] * size[cols])
+        records.append(trades)
+        if status == TRADE_STATUS_CLOSED:
+            wallet[cols] += gross - exit_fee
+            side[cols], size[cols], entry[cols], trade_fees[cols] = 0, 0.0, 0.0, 0.0
+            stop_loss[cols], take_profit[cols] = np.nan, np.nan
+
+    def free(price):
+        unrealized = (price - entry) * size * side
+        return wallet + np.minimum(unrealized, 0.0) - entry * size / leverage
+
+    for t in range(n):
+        # resting brackets against the candle
+        if t > 0:
+            protected = np.flatnonzero((side != 0) & ~(np.isnan(stop_loss) & np.isnan(take_profit)))
+            if len(protected):
+                direction = side[protected]
+                sl, tp = stop_loss[protected], take_profit[protected]
+                sl_hit = np.where(direction > 0, low[t] <= sl, high[t] >= sl)
+                tp_hit = np.where(direction > 0, high[t] >= tp, low[t] <= tp)
+                # the one closest to the open fills first (the stop-loss on a tie, it is placed first)
+                sl_first = sl_hit & (~tp_hit | (np.abs(sl - open_[t]) <= np.abs(tp - open_[t])))
+                tp_first = tp_hit & ~sl_first
+                # gapped through: filled at the open
+                sl_price = np.where(direction > 0, np.minimum(open_[t], sl), np.maximum(open_[t], sl))
+                tp_price = np.where(direction > 0, np.maximum(open_[t], tp), np.minimum(open_[t], tp))
+                hit = sl_first | tp_first
+                if hit.any():
+                    close_position(protected[hit], np.where(sl_first, sl_price, tp_price)[hit], t)
+        # signals at the close
+        if signaled[t]:
+            price = close[t]
+            for signal, direction in ((buy[t], 1), (sell[t], -1)):
+                cols = np.flatnonzero(signal)
+                if not len(cols):
+                    continue
+                # sized before the opposite side is closed, on the free balance of the ledger,
+                # with the LONG stop-loss distance for both sides as handle_signal does
+                sizing_stop, _ = calculate_stop_loss_take_profit_batch(price, sl_pct[cols], tp_pct[cols])
+                amount = calculate_position_size_batch(free(price)[cols], risk[cols], price, sizing_stop)
+                # cancel_pending_orders
+                stop_loss[cols], take_profit[cols] = np.nan, np.nan
+                opposite = cols[side[cols] == -direction]
+                if len(opposite):
+                    close_position(opposite, price, t)
+                cost = price * amount / leverage + price * amount * fee
+                accepted = (amount > 0) & (cost <= free(price)[cols])
+                cols, amount = cols[accepted], amount[accepted]
+                if not len(cols):
+                    continue
+                opening = side[cols] == 0
+                entry_idx[cols[opening]] = t
+                side[cols] = direction
+                entry[cols] = (entry[cols] * size[cols] + price * amount) / (size[cols] + amount)
+                size[cols] += amount
+                wallet[cols] -= price * amount * fee
+                trade_fees[cols] += price * amount * fee
+                stop_loss[cols], take_profit[cols] = calculate_stop_loss_take_profit_batch(price, sl_pct[cols], tp_pct[cols], direction)
+        value[t] = wallet + (close[t] - entry) * size * side
+    still_open = np.flatnonzero(side != 0)
+    if len(still_open):
+        close_position(still_open, close[-1], n - 1, TRADE_STATUS_OPEN)
+    trades = np.concatenate(records) if records else np.empty(0, dtype=TRADE_DTYPE)
+    return value, trades[np.lexsort((trades['entry_idx'], trades['col']))]
+
+def live_rules(**rules):
+    """
+    The rules of simulate_live (init_cash, risk_percentage, stop_loss_pct, take_profit_pct, fee,
+    leverage) with the defaults of the ones not given.
+    """
+    defaults = {name: parameter.default for name, parameter in inspect.signature(simulate_live).parameters.items()
+                if parameter.default is not inspect.Parameter.empty}
+    unknown = set(rules) - set(defaults)
+    if unknown:
+        raise TypeError(f"Invalid live rules: {', '.join(sorted(unknown))}")
+    return {**defaults, **rules}
+
+def live_stats(candles, buy, sell, freq='1h', init_cash=10000.0, **rules):
+    """
+    simulate_live on a candle DataFrame (open, high, low, close columns, any case) and the
+    RESULT_STATS metrics, one row per column.
+    rules: risk_percentage, stop_loss_pct, take_profit_pct, fee, leverage of simulate_live
+    """
+    ohlc = [candles[column] if column in candles else candles[column.capitalize()] for column in ('open', 'high', 'low', 'close')]
+    value, trades = simulate_live(*(np.asarray(column) for column in ohlc), buy, sell, init_cash=init_cash, **rules)
+    return compute_metrics(value, np.broadcast_to(np.asarray(init_cash, dtype=np.float64), (value.shape[1],)), trades, freq=freq)
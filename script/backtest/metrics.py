@@ -0,0 +1,123 @@
+"""
+lean metrics kernel for the grid search
+
+computes only the statistics kept in the results (see backtest_simulation.RESULT_STATS)
+straight from the equity curve and the trade records, for all portfolio columns at once,
+with the same definitions as vectorbt's Portfolio.stats():
+  - trade statistics use closed trades, Total Trades also counts the open one
+  - return ratios use the returns of the portfolio value (first one against the initial cash)
+"""
+import numpy as np
+import pandas as pd
+
+TRADE_STATUS_CLOSED = 1
+
+def _per_column(values, cols, ncols):
+    return np.bincount(cols, weights=values, minlength=ncols)
+
+def _returns(value, init_cash):
+    prev_value = np.vstack([init_cash[np.newaxis, :], value[:-1]])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = (value - prev_value) / prev_value
+    returns[prev_value < 0] *= -1
+    zero = prev_value == 0
+    returns[zero] = np.where(value[zero] == 0, 0.0, np.inf * np.sign(value[zero]))
+    return returns
+
+def return_metrics(returns, ann_factor):
+    """
+    Sharpe, Sortino, Calmar and Omega ratios per column of a 2-D returns array.
+    """
+    n = returns.shape[0]
+    mean = np.nanmean(returns, axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        std = np.nanstd(returns, axis=0, ddof=1)
+        sharpe = np.where(std == 0, np.inf, mean / std * np.sqrt(ann_factor))
+
+        downside = np.minimum(np.nan_to_num(returns, nan=0.0), 0.0)
+        downside[np.isnan(returns)] = np.nan
+        downside_risk = np.sqrt(np.nanmean(downside ** 2, axis=0)) * np.sqrt(ann_factor)
+        sortino = np.where(downside_risk == 0, np.inf, mean * ann_factor / downside_risk)
+
+        cumulative = np.cumprod(1 + np.nan_to_num(returns, nan=0.0), axis=0)
+        drawdown = cumulative / np.maximum.accumulate(cumulative, axis=0) - 1
+        max_drawdown = drawdown.min(axis=0)
+        annualized_return = np.nanprod(returns + 1, axis=0) ** (ann_factor / n) - 1
+        calmar = np.where(max_drawdown == 0, np.nan, annualized_return / np.abs(max_drawdown))
+
+        gains = np.where(returns > 0, returns, 0.0).sum(axis=0)
+        losses = -np.where(returns < 0, returns, 0.0).sum(axis=0)
+        omega = np.where(losses == 0, np.inf, gains / losses)
+    if n < 2:
+        sharpe[:] = np.nan
+        sortino[:] = np.nan
+    return sharpe, sortino, calmar, omega
+
+def trade_metrics(trades, ncols):
+    """
+    Trade statistics per column from vectorbt trade records.
+    """
+    cols = trades['col']
+    closed = trades['status'] == TRADE_STATUS_CLOSED
+    pnl = trades['pnl']
+    winning = closed & (pnl > 0)
+    losing = closed & (pnl < 0)
+
+    total_trades = np.bincount(cols, minlength=ncols)
+    closed_count = np.bincount(cols[closed], minlength=ncols)
+    win_count = np.bincount(cols[winning], minlength=ncols)
+    lose_count = np.bincount(cols[losing], minlength=ncols)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        win_rate = win_count / closed_count * 100
+
+        total_win = _per_column(pnl[winning], cols[winning], ncols)
+        total_loss = _per_column(pnl[losing], cols[losing], ncols)
+        profit_factor = total_win / np.abs(total_loss)
+        profit_factor[closed_count == 0] = np.nan
+
+        avg_win_trade = _per_column(trades['return'][winning], cols[winning], ncols) / win_count * 100
+        avg_lose_trade = _per_column(trades['return'][losing], cols[losing], ncols) / lose_count * 100
+        duration = (trades['exit_idx'] - trades['entry_idx']).astype(np.float64)
+        avg_win_duration = _per_column(duration[winning], cols[winning], ncols) / win_count
+    return total_trades, win_rate, profit_factor, avg_win_trade, avg_lose_trade, avg_win_duration
+
+def compute_metrics(value, init_cash, trades, freq='1h', year_freq='365 days'):
+    """
+    value: 2-D equity curve (rows x columns), init_cash: per column initial cash
+    trades: vectorbt trade records (portfolio.trades.values)
+    Returns a DataFrame with one row per column and the vectorbt stats titles as columns.
+    """
+    value = np.asarray(value, dtype=np.float64)
+    if value.ndim == 1:
+        value = value[:, np.newaxis]
+    ncols = value.shape[1]
+    init_cash = np.broadcast_to(np.asarray(init_cash, dtype=np.float64), (ncols,))
+    freq = pd.Timedelta(freq)
+    ann_factor = pd.Timedelta(year_freq) / freq
+
+    sharpe, sortino, calmar, omega = return_metrics(_returns(value, init_cash), ann_factor)
+    total_trades, win_rate, profit_factor, avg_win_trade, avg_lose_trade, avg_win_duration = trade_metrics(trades, ncols)
+    return pd.DataFrame({
+        'Total Return [%]': (value[-1] - init_cash) / init_cash * 100,
+        'Total Trades': total_trades,
+        'Win Rate [%]': win_rate,
+        'Avg Winning Trade [%]': avg_win_trade,
+        'Avg Losing Trade [%]': avg_lose_trade,
+        'Avg Winning Trade Duration': pd.to_timedelta(avg_win_duration * freq.value, unit='ns'),
+        'Profit Factor': profit_factor,
+        'Sharpe Ratio': sharpe,
+        'Calmar Ratio': calmar,
+        'Omega Ratio': omega,
+        'Sortino Ratio': sortino,
+    })
+
+def portfolio_stats(portfolio, freq='1h'):
+    """
+    compute_metrics for a vectorbt Portfolio (one row per portfolio column).
+    """
+    return compute_metrics(
+        portfolio.value().values,
+        portfolio.init_cash.values if hasattr(portfolio.init_cash, 'values') else portfolio.init_cash,
+        portfolio.trades.values,
+        freq=freq
+    )
@@ -0,0 +1,151 @@
+"""
+grid search result store (SQLite)
+
+every backtest row is written as soon as its chunk completes, keyed by the dataset hash
+(indicator_cache.dataset_key) plus the parameter tuple, so:
+  - an interrupted sweep keeps everything computed so far
+  - a rerun (or an extended range) only backtests the tuples missing for that dataset
+  - past sweeps are queried with SQL (indexed by dataset and by the usual ranking metrics)
+The database is in WAL mode, readers do not block the sweep writing to it.
+"""
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+PARAM_COLUMNS = ('short_window', 'long_window', 'rsi_window', 'rsi_buy_threshold', 'rsi_sell_threshold', 'short_type', 'long_type')
+STAT_COLUMNS = (
+    'total_return', 'win_rate_ratio', 'profit_factor', 'sharpe_ratio', 'calmar_ratio', 'total_trades',
+    'avg_win_trade_duration', 'avg_win_trade', 'avg_lose_trade', 'sortino_ratio', 'omega_ratio',
+)
+INTEGER_COLUMNS = ('total_trades',)
+# Timedelta columns, stored as nanoseconds
+DURATION_COLUMNS = ('avg_win_trade_duration',)
+
+DEFAULT_PATH = os.getenv(
+    'RESULT_STORE_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'results', 'grid_search.sqlite')
+)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS datasets (
+    dataset TEXT PRIMARY KEY,
+    symbol TEXT,
+    frequency TEXT,
+    start TEXT,
+    end TEXT,
+    rows INTEGER,
+    created_at REAL
+);
+CREATE TABLE IF NOT EXISTS results (
+    dataset TEXT NOT NULL,
+    {', '.join(f'{column} {"TEXT" if column.endswith("_type") else "NUMERIC"} NOT NULL' for column in PARAM_COLUMNS)},
+    {', '.join(f'{column} {"INTEGER" if column in INTEGER_COLUMNS else "REAL"}' for column in STAT_COLUMNS)},
+    created_at REAL,
+    PRIMARY KEY (dataset, {', '.join(PARAM_COLUMNS)})
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_sharpe ON results (dataset, sharpe_ratio);
+CREATE INDEX IF NOT EXISTS results_return ON results (dataset, total_return);
+"""
+
+def _sql_value(value):
+    # nan / NaT / None are stored as NULL, Timedelta as nanoseconds
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, pd.Timedelta):
+        return value.value
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+class ResultStore:
+    """
+    backtest rows keyed by (dataset, parameter tuple)
+    """
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+
+    def register_dataset(self, dataset, data, symbol=None, frequency=None):
+        """
+        Remember what a dataset hash stands for (first registration wins).
+        """
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR IGNORE INTO datasets VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (dataset, symbol, frequency, str(data.index[0]), str(data.index[-1]), len(data), time.time())
+            )
+
+    def done(self, dataset):
+        """
+        Set of the parameter tuples already stored for dataset.
+        """
+        cursor = self.connection.execute(f'SELECT {", ".join(PARAM_COLUMNS)} FROM results WHERE dataset = ?', (dataset,))
+        return set(cursor.fetchall())
+
+    def pending(self, dataset, param_combinations):
+        """
+        The parameter tuples of param_combinations not stored yet for dataset (order kept).
+        """
+        done = self.done(dataset)
+        return [params for params in param_combinations if tuple(params) not in done]
+
+    def write(self, dataset, rows):
+        """
+        Insert (or replace) result rows (grid_search row dicts) in one transaction.
+        """
+        now = time.time()
+        columns = ('dataset',) + PARAM_COLUMNS + STAT_COLUMNS + ('created_at',)
+        values = [
+            (dataset, *(_sql_value(row.get(column)) for column in PARAM_COLUMNS + STAT_COLUMNS), now)
+            for row in rows
+        ]
+        with self.connection:
+            self.connection.executemany(
+                f'INSERT OR REPLACE INTO results ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})', values
+            )
+
+    def load(self, dataset=None, where=None, params=(), order_by=None, limit=None):
+        """
+        Stored rows as a DataFrame with the grid_search columns (plus dataset).
+        where / params: extra SQL filter, e.g. where='total_trades >= ?', params=(10,)
+        """
+        clauses, args = [], []
+        if dataset is not None:
+            clauses.append('dataset = ?')
+            args.append(dataset)
+        if where:
+            clauses.append(f'({where})')
+            args.extend(params)
+        query = f'SELECT dataset, {", ".join(PARAM_COLUMNS + STAT_COLUMNS)} FROM results'
+        if clauses:
+            query += ' WHERE ' + ' AND '.join(clauses)
+        if order_by:
+            query += f' ORDER BY {order_by}'
+        if limit:
+            query += f' LIMIT {int(limit)}'
+        df = pd.read_sql_query(query, self.connection, params=args)
+        for column in DURATION_COLUMNS:
+            df[column] = pd.to_timedelta(df[column], unit='ns')
+        return df
+
+    def results_for(self, dataset, param_combinations):
+        """
+        Stored rows of dataset for exactly these parameter tuples, in their order.
+        """
+        wanted = pd.DataFrame(param_combinations, columns=list(PARAM_COLUMNS))
+        stored = self.load(dataset).drop(columns='dataset')
+        return wanted.merge(stored, on=list(PARAM_COLUMNS), how='inner')
+
+    def close(self):
+        """
+        Close the database connection.
+        """
+        self.connection.close()
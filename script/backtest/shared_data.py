@@ -0,0 +1,60 @@
+"""
+zero-copy price Series handoff to the grid search workers
+
+the parent copies the values and the index of the Series once into a SharedMemory block,
+workers attach to it by name and rebuild a read-only Series over the same buffer.
+Only the small descriptor is pickled to the workers.
+"""
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+class SharedSeries:
+    """
+    owner of a shared memory copy of a price Series, use as a context manager
+    """
+    def __init__(self, data):
+        values = np.ascontiguousarray(data.values, dtype=np.float64)
+        index_values = np.ascontiguousarray(data.index.values)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes + index_values.nbytes, 1))
+        np.ndarray(values.shape, dtype=values.dtype, buffer=self.shm.buf)[:] = values
+        np.ndarray(index_values.shape, dtype=index_values.dtype, buffer=self.shm.buf, offset=values.nbytes)[:] = index_values
+        tz = getattr(data.index, 'tz', None)
+        self.descriptor = {
+            'shm_name': self.shm.name,
+            'length': len(values),
+            'index_dtype': index_values.dtype.str,
+            'tz': str(tz) if tz is not None else None,
+            'index_name': data.index.name,
+            'name': data.name,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        Release and remove the shared memory block.
+        """
+        self.shm.close()
+        self.shm.unlink()
+
+def attach(descriptor):
+    """
+    Attach to a SharedSeries from another process.
+    Returns (Series, SharedMemory), keep the SharedMemory referenced as long as the Series is used.
+    """
+    shm = shared_memory.SharedMemory(name=descriptor['shm_name'])
+    length = descriptor['length']
+    values = np.ndarray((length,), dtype=np.float64, buffer=shm.buf)
+    index_values = np.ndarray((length,), dtype=np.dtype(descriptor['index_dtype']), buffer=shm.buf, offset=values.nbytes)
+    values.flags.writeable = False
+    index_values.flags.writeable = False
+    index = pd.Index(index_values, name=descriptor['index_name'], copy=False)
+    if descriptor['tz'] is not None:
+        index = pd.DatetimeIndex(index).tz_localize('UTC').tz_convert(descriptor['tz'])
+    return pd.Series(values, index=index, name=descriptor['name'], copy=False), shm
@@ -0,0 +1,191 @@
+"""
+walk-forward optimization
+
+the history is split into rolling folds: the grid is fitted on each train window and the best
+parameter tuple (selection metric, minimum trade count) is then backtested on the test window
+that follows it, so every reported metric is out of sample.
+
+Indicators are computed once on the whole history (indicator cache, prefetched before the
+workers fork) and every window is a slice of them, so the moving averages / RSI of a test
+window are warmed up by the candles before it, as they are live.
+Work is split by chunks of parameter tuples: a worker builds the signals of its chunk once and
+simulates them on the train window of every fold (one vectorized portfolio per fold).
+"""
+import os
+import sys
+from multiprocessing import Pool, cpu_count
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backtest.backtest_simulation import (
+    RESULT_STATS, FREQUENCY, fetch_historical_data, generate_signals_batch, simulate_batch,
+    backtest_result, param_grid, prefetch_indicators
+)
+from backtest.shared_data import SharedSeries, attach
+
+PARAM_COLUMNS = ['short_window', 'long_window', 'rsi_window', 'rsi_buy_threshold', 'rsi_sell_threshold', 'short_type', 'long_type']
+
+def walk_forward_folds(index, train='180D', test='30D', step=None, anchored=False):
+    """
+    Rolling (train, test) windows over a DatetimeIndex as row positions:
+    [(train_start, train_end, test_end), ...], train rows are [train_start, train_end),
+    test rows [train_end, test_end). step defaults to the test length.
+    anchored: every train window starts at the beginning of the history.
+    """
+    train, test = pd.Timedelta(train), pd.Timedelta(test)
+    step = pd.Timedelta(step) if step is not None else test
+    folds = []
+    offset = pd.Timedelta(0)
+    # the last window may end on the last candle
+    history_end = index[-1] + (index[-1] - index[-2])
+    while True:
+        train_start = index[0] if anchored else index[0] + offset
+        train_end = index[0] + offset + train
+        test_end = train_end + test
+        if test_end > history_end:
+            break
+        folds.append(tuple(int(i) for i in index.searchsorted([train_start, train_end, test_end])))
+        offset += step
+    return folds
+
+_WORKER = {}
+
+def attach_fold_worker(descriptor, folds):
+    """
+    Pool initializer: attach the shared price Series and remember the folds.
+    """
+    _WORKER['data'] = attach(descriptor)
+    _WORKER['folds'] = folds
+
+def train_chunk(param_chunk, data=None, folds=None):
+    """
+    Stats of a chunk of parameter tuples on the train window of every fold.
+    Returns one array (tuples x RESULT_STATS) per fold.
+    """
+    if data is None:
+        data, _ = _WORKER['data']
+        folds = _WORKER['folds']
+    entries, exits = generate_signals_batch(data, param_chunk)
+    stats = []
+    for train_start, train_end, _ in folds:
+        rows = slice(train_start, train_end)
+        fold_stats = simulate_batch(data.iloc[rows], entries[rows], exits[rows])
+        stats.append(fold_stats[list(RESULT_STATS.values())].to_numpy(dtype=object))
+    return stats
+
+def best_params(train_results, metric='sharpe_ratio', min_trades=10):
+    """
+    Row of train_results with the highest metric among the tuples with at least min_trades trades
+    (all tuples when none has that many).
+    """
+    candidates = train_results[train_results['total_trades'] >= min_trades]
+    if candidates.empty:
+        candidates = train_results
+    scores = pd.to_numeric(candidates[metric], errors='coerce').replace([np.inf, -np.inf], np.nan)
+    if scores.notna().any():
+        return candidates.loc[scores.idxmax()]
+    return candidates.iloc[0]
+
+def walk_forward(symbol='BTC-USD',
+                 data=None,
+                 train='180D',
+                 test='30D',
+                 step=None,
+                 anchored=False,
+                 metric='sharpe_ratio',
+                 min_trades=10,
+                 processes=None,
+                 chunk_size=512,
+                 **grid):
+    """
+    Walk-forward optimization of the grid (same keyword ranges as grid_search).
+    Returns (folds DataFrame, train results) :
+      - folds: one row per fold with its dates, the selected parameters, their train metric
+        and the out-of-sample metrics (RESULT_STATS columns) on the test window
+      - train results: every tuple on every train window (param columns, fold, RESULT_STATS columns)
+    """
+    if data is None:
+        data = fetch_historical_data(symbol)
+    grid.setdefault('ma_combinations', [('SMA', 'SMA'), ('EMA', 'EMA'), ('EMA', 'SMA'), ('SMA', 'EMA')])
+    param_combinations = param_grid(**grid)
+    folds = walk_forward_folds(data.index, train, test, step, anchored)
+    if not folds or not param_combinations:
+        return pd.DataFrame(), pd.DataFrame()
+    print(f"walk-forward: {len(folds)} folds x {len(param_combinations)} combinations")
+
+    processes = processes or cpu_count()
+    chunk_size = max(1, min(chunk_size, -(-len(param_combinations) // processes)))
+    chunks = [param_combinations[i:i + chunk_size] for i in range(0, len(param_combinations), chunk_size)]
+    per_fold = [[] for _ in folds]
+    prefetch_indicators(data, param_combinations)
+    if processes == 1:
+        chunk_stats = (train_chunk(chunk, data, folds) for chunk in chunks)
+        for stats in chunk_stats:
+            for fold, fold_stats in enumerate(stats):
+                per_fold[fold].append(fold_stats)
+    else:
+        with SharedSeries(data) as shared:
+            with Pool(processes, initializer=attach_fold_worker, initargs=(shared.descriptor, folds)) as pool:
+                for done, stats in enumerate(pool.imap(train_chunk, chunks), 1):
+                    for fold, fold_stats in enumerate(stats):
+                        per_fold[fold].append(fold_stats)
+                    print(f"trained {min(done * chunk_size, len(param_combinations))}/{len(param_combinations)} combinations")
+
+    params = pd.DataFrame(param_combinations, columns=PARAM_COLUMNS)
+    train_results = []
+    fold_rows = []
+    for fold, (train_start, train_end, test_end) in enumerate(folds):
+        fold_results = pd.concat([params, pd.DataFrame(np.vstack(per_fold[fold]), columns=list(RESULT_STATS)).infer_objects()], axis=1)
+        fold_results.insert(0, 'fold', fold)
+        train_results.append(fold_results)
+        best = best_params(fold_results, metric, min_trades)
+        best_tuple = tuple(best[column] for column in PARAM_COLUMNS)
+
+        # out of sample: signals from the whole history (warm indicators), simulated on the test rows only
+        entries, exits = generate_signals_batch(data, [best_tuple])
+        rows = slice(train_end, test_end)
+        test_stats = simulate_batch(data.iloc[rows], entries[rows], exits[rows]).iloc[0]
+        fold_rows.append({
+            'fold': fold,
+            'train_start': data.index[train_start],
+            'train_end': data.index[train_end - 1],
+            'test_start': data.index[train_end],
+            'test_end': data.index[test_end - 1],
+            f'train_{metric}': best[metric],
+            **backtest_result(best_tuple, test_stats),
+        })
+    folds_df = pd.DataFrame(fold_rows)
+    return folds_df, pd.concat(train_results, ignore_index=True)
+
+def summarize(folds_df):
+    """
+    Out-of-sample summary over the folds: compounded return, mean / median Sharpe, share of profitable folds.
+    """
+    returns = pd.to_numeric(folds_df['total_return'], errors='coerce').fillna(0) / 100
+    sharpe = pd.to_numeric(folds_df['sharpe_ratio'], errors='coerce').replace([np.inf, -np.inf], np.nan)
+    return {
+        'folds': len(folds_df),
+        'oos_compounded_return': ((1 + returns).prod() - 1) * 100,
+        'oos_mean_sharpe': sharpe.mean(),
+        'oos_median_sharpe': sharpe.median(),
+        'profitable_folds': (returns > 0).mean() * 100,
+    }
+
+if __name__ == "__main__":
+    folds_result, _ = walk_forward(
+        symbol='BTC-USD',
+        train='180D',
+        test='30D',
+        short_window_range=range(4, 12),
+        long_window_range=range(14, 26),
+        rsi_window_range=range(7, 15),
+        rsi_buy_threshold_range=[35, 30, 40],
+        rsi_sell_threshold_range=[65, 60, 70],
+    )
+    pd.set_option('display.width', 200)
+    print(folds_result[['fold', 'test_start', 'test_end', *PARAM_COLUMNS, 'total_return', 'sharpe_ratio', 'total_trades']])
+    print(summarize(folds_result))
+    os.makedirs('backtest_res', exist_ok=True)
+    folds_result.to_csv(f'backtest_res/walk_forward_freq_{FREQUENCY}_{pd.Timestamp.now():%Y%m%d_%H%M%S}.csv', index=False)
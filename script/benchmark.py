@@ -0,0 +1,279 @@
+"""
+benchmark suite of the hot paths
+
+times the signal, backtest and risk functions on seeded synthetic OHLCV (utils.simulator.synthetic_ohlcv)
+at several sizes and writes the results to json (one file per commit) so a change can be
+measured against a baseline:
+  - signals.generate_signals: live full recompute (rolling MAs + vbt RSI) over `size` candles
+  - signals.generate_signals[engine]: live incremental path, one 50 candle window update
+  - backtest.generate_signals[cold|warm]: backtest signals with an empty / a filled indicator cache
+  - backtest.run_backtest: one parameter tuple, signals + portfolio + metrics
+  - backtest.grid_search[batched|pool]: a 64 combination grid
+  - risk.*: calculate_stop_loss_take_profit / calculate_position_size, `size` calls
+  - risk.*[batch]: their array versions, one call on `size` prices
+
+Every case is run once untimed (numba compilation, caches), then timed `repeat` times within
+a time budget; min / median / mean / stdev are kept.
+Indicator cache files of the run go to a temporary directory.
+
+usage: python script/benchmark.py [--sizes 50,1000,100000,1000000] [--only NAME] [--repeat N]
+                                  [--output PATH] [--compare BASELINE.json] [--threshold 0.1]
+"""
+import contextlib
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# must be set before backtest.indicator_cache is imported: benchmarks do not touch the live cache
+os.environ.setdefault('INDICATOR_CACHE_DIR', tempfile.mkdtemp(prefix='btc-bot-bench-'))
+
+import numpy as np
+import pandas as pd
+
+from utils.indicators import SignalEngine
+from utils.risk_management import (
+    calculate_stop_loss_take_profit, calculate_position_size,
+    calculate_stop_loss_take_profit_batch, calculate_position_size_batch
+)
+from utils.signals import generate_signals
+from utils.simulator import synthetic_ohlcv
+from backtest import backtest_simulation as backtest
+from backtest.indicator_cache import IndicatorCache
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(SCRIPT_DIR, 'data', 'benchmarks')
+DEFAULT_SIZES = (50, 1000, 100_000, 1_000_000)
+SEED = 42
+# seconds of timed runs per case (at least one run)
+TIME_BUDGET = 2.0
+
+GRID = {
+    'short_window_range': [5, 8],
+    'long_window_range': [14, 21],
+    'rsi_window_range': [14],
+    'rsi_buy_threshold_range': [30, 35],
+    'rsi_sell_threshold_range': [65, 70],
+}
+
+BENCHMARKS = {}
+
+def benchmark(name, max_size=None, sizes=None):
+    """
+    Register a case: func(size) does the setup and returns (callable to time, calls per run).
+    max_size / sizes restrict the sizes the case runs at.
+    """
+    def decorator(func):
+        BENCHMARKS[name] = (func, max_size, sizes)
+        return func
+    return decorator
+
+_datasets = {}
+
+def synthetic_data(size):
+    """
+    (ohlcv DataFrame like utils.api.fetch_ohlcv, close Series like backtest fetch_historical_data) of size candles.
+    """
+    if size not in _datasets:
+        ohlcv = synthetic_ohlcv(size, timeframe='1h', seed=SEED)
+        df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        df['timestamp'] = pd.to_datetime(df['timestamp'].astype(np.int64), unit='ms')
+        close = pd.Series(df['close'].values, index=pd.DatetimeIndex(df['timestamp'], tz='UTC', name='Date'), name='Close')
+        _datasets[size] = (df, close)
+    return _datasets[size]
+
+@benchmark('signals.generate_signals')
+def bench_live_signals(size):
+    df, _ = synthetic_data(size)
+    return lambda: generate_signals(df.copy()), 1
+
+@benchmark('signals.generate_signals[engine]', sizes=(50,))
+def bench_live_signals_engine(size):
+    df, _ = synthetic_data(size)
+    engine = SignalEngine()
+    generate_signals(df, engine=engine)
+    # steady state of the live loop: the last candle comes again and is re-applied
+    def run():
+        for _ in range(1000):
+            generate_signals(df, engine=engine)
+    return run, 1000
+
+@benchmark('backtest.generate_signals[cold]')
+def bench_backtest_signals_cold(size):
+    _, close = synthetic_data(size)
+    return lambda: backtest.generate_signals(close, cache=IndicatorCache(directory=None)), 1
+
+@benchmark('backtest.generate_signals[warm]')
+def bench_backtest_signals_warm(size):
+    _, close = synthetic_data(size)
+    cache = IndicatorCache(directory=None)
+    return lambda: backtest.generate_signals(close, cache=cache), 1
+
+@benchmark('backtest.run_backtest')
+def bench_run_backtest(size):
+    _, close = synthetic_data(size)
+    params = (5, 15, 14, 30, 70, 'SMA', 'SMA')
+    return lambda: backtest.run_backtest((close, params)), 1
+
+@benchmark('backtest.grid_search[batched]', max_size=100_000)
+def bench_grid_search_batched(size):
+    _, close = synthetic_data(size)
+    return lambda: backtest.grid_search(data=close, batched=True, **GRID), 1
+
+@benchmark('backtest.grid_search[pool]', max_size=10_000)
+def bench_grid_search_pool(size):
+    _, close = synthetic_data(size)
+    return lambda: backtest.grid_search(data=close, **GRID), 1
+
+@benchmark('risk.calculate_stop_loss_take_profit')
+def bench_stop_loss_take_profit(size):
+    prices = synthetic_data(size)[0]['close'].tolist()
+    def run():
+        for price in prices:
+            calculate_stop_loss_take_profit(price)
+            calculate_stop_loss_take_profit(price, position_side='SHORT')
+    return run, 2 * size
+
+@benchmark('risk.calculate_position_size')
+def bench_position_size(size):
+    prices = synthetic_data(size)[0]['close'].tolist()
+    def run():
+        for price in prices:
+            calculate_position_size(10000, 3, price, price * 0.93)
+    return run, size
+
+@benchmark('risk.calculate_stop_loss_take_profit[batch]')
+def bench_stop_loss_take_profit_batch(size):
+    prices = synthetic_data(size)[0]['close'].values
+    sides = np.where(np.arange(size) % 2, 'SHORT', 'LONG')
+    return lambda: calculate_stop_loss_take_profit_batch(prices, position_sides=sides), size
+
+@benchmark('risk.calculate_position_size[batch]')
+def bench_position_size_batch(size):
+    prices = synthetic_data(size)[0]['close'].values
+    return lambda: calculate_position_size_batch(10000, 3, prices, prices * 0.93), size
+
+def time_case(func, calls, repeat, budget=TIME_BUDGET):
+    """
+    One untimed warm-up run then up to `repeat` timed runs within `budget` seconds
+    (the first timed run sets how many fit). Returns the per-call timings in seconds.
+    """
+    func()
+    timings = []
+    while True:
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        timings.append(elapsed / calls)
+        if len(timings) >= repeat or elapsed * (len(timings) + 1) > budget:
+            return timings
+
+def run(sizes=DEFAULT_SIZES, only=None, repeat=5, budget=TIME_BUDGET):
+    """
+    Run the registered cases, returns the result records.
+    """
+    results = []
+    for name, (setup, max_size, case_sizes) in BENCHMARKS.items():
+        if only and only not in name:
+            continue
+        for size in (case_sizes or sizes):
+            if max_size is not None and size > max_size:
+                continue
+            func, calls = setup(size)
+            # the backtest functions print progress for every tuple / chunk
+            with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+                timings = time_case(func, calls, repeat, budget)
+            record = {
+                'name': name, 'size': size, 'calls': calls, 'runs': len(timings),
+                'min_s': min(timings), 'median_s': statistics.median(timings),
+                'mean_s': statistics.fmean(timings), 'stdev_s': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+            }
+            results.append(record)
+            print(f"{name:<40} size {size:>9}  median {record['median_s'] * 1e3:12.4f} ms  (min {record['min_s'] * 1e3:.4f} ms, {len(timings)} runs)")
+    return results
+
+def git_commit():
+    """
+    Short hash of HEAD, '-dirty' appended when the tree has local changes.
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=SCRIPT_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f'{commit}-dirty' if dirty else commit
+
+def metadata():
+    """
+    What the results depend on: commit, versions, machine.
+    """
+    import vectorbt as vbt
+    return {
+        'commit': git_commit(),
+        'date': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'vectorbt': vbt.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'seed': SEED,
+    }
+
+def save(results, path=None):
+    """
+    Write {meta, results} to path (default data/benchmarks/<commit>.json), returns the path.
+    """
+    meta = metadata()
+    path = path or os.path.join(RESULTS_DIR, f"{meta['commit']}.json")
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'meta': meta, 'results': results}, f, indent=2)
+    return path
+
+def compare(baseline, results, threshold=0.1):
+    """
+    Print the median ratio against a baseline file, returns the cases slower by more than threshold.
+    """
+    with open(baseline, encoding='utf-8') as f:
+        old = {(r['name'], r['size']): r for r in json.load(f)['results']}
+    regressions = []
+    print(f"\ncompared to {baseline}:")
+    for record in results:
+        before = old.get((record['name'], record['size']))
+        if before is None:
+            continue
+        ratio = record['median_s'] / before['median_s']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = 'REGRESSION'
+            regressions.append(record)
+        elif ratio < 1 - threshold:
+            flag = 'faster'
+        print(f"{record['name']:<40} size {record['size']:>9}  {ratio:6.2f}x  {flag}")
+    return regressions
+
+def option(argv, flag, default):
+    """
+    Value following flag on the command line.
+    """
+    if flag in argv and argv.index(flag) + 1 < len(argv):
+        return argv[argv.index(flag) + 1]
+    return default
+
+if __name__ == "__main__":
+    ARGS = sys.argv[1:]
+    SIZES = tuple(int(size) for size in option(ARGS, '--sizes', ','.join(map(str, DEFAULT_SIZES))).split(','))
+    RESULTS = run(SIZES, only=option(ARGS, '--only', None), repeat=int(option(ARGS, '--repeat', 5)))
+    print(f"results written to {save(RESULTS, option(ARGS, '--output', None))}")
+    BASELINE = option(ARGS, '--compare', None)
+    if BASELINE and compare(BASELINE, RESULTS, float(option(ARGS, '--threshold', 0.1))):
+        sys.exit(1)
@@ -0,0 +1,179 @@
+"""
+long-running trading daemon
+
+wakes up right after every `timeframe` boundary (exchange clock) and runs the same
+fetch -> generate_signals -> handle_signal cycle as main.py. The exchange client,
+the candle store and the indicator engine stay warm between cycles.
+SIGINT / SIGTERM stop the daemon after the cycle in progress, never in the middle of one.
+A cycle raising an error is logged and the ledger invalidated, the daemon waits for the next one.
+
+Per-stage latencies (utils.tracing) are dumped to logs/latency.json after every cycle and
+served on http://127.0.0.1:$METRICS_PORT/metrics when METRICS_PORT is set.
+With --async the orders go through handle_signal_async (concurrent exchange calls).
+The local ledger (utils.ledger) is reconciled with the exchange off the candle close -> orders
+path: RECONCILE_LEAD_MS before every boundary when it would be due by the cycle, and after a
+cycle when it is stale (orders of the cycle), so signals are sized from memory.
+Another cycle (e.g. the multi-symbol scanner, see scanner.py) can be scheduled with `cycle`.
+
+usage: python script/daemon.py [--prod] [--async]
+"""
+import asyncio
+import logging
+import os
+import signal
+import sys
+import time
+
+import ccxt
+
+from main import SYMBOL, TIMEFRAME, get_engine_path, run_cycle, run_cycle_async
+from utils.api import binance_futures_testnet
+from utils.async_api import close_async_client, get_async_client
+from utils.candle_store import timeframe_to_ms
+from utils.indicators import SignalEngine
+from utils.ledger import ledger
+from utils.logging import latency_path
+from utils.tracing import dump, record, serve_metrics
+
+# wait a little after the boundary so the exchange has rolled the candle
+SETTLE_DELAY_MS = 1000
+# re-sync the local clock with the exchange every N cycles
+CLOCK_SYNC_CYCLES = 24
+# reconcile the ledger this long before a candle boundary, the signal of the cycle is expected
+# within as long after it
+RECONCILE_LEAD_MS = 30000
+
+class TradingDaemon:
+    """
+    runs one cycle per candle of `timeframe` until stop() is called
+    """
+    def __init__(self, mode, symbol=SYMBOL, timeframe=TIMEFRAME, settle_delay_ms=SETTLE_DELAY_MS, use_async=False, cycle=None):
+        """
+        cycle: optional coroutine function run instead of run_cycle (it owns its own state)
+        """
+        self.mode = mode
+        self.use_async = use_async
+        self.cycle = cycle
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.timeframe_ms = timeframe_to_ms(timeframe)
+        self.settle_delay_ms = settle_delay_ms
+        self.engine = None if cycle is not None else SignalEngine.load(get_engine_path(symbol, timeframe))
+        self.clock_offset_ms = 0
+        self.stop_event = None
+
+    def sync_clock(self):
+        """
+        Measure the offset between the exchange clock and the local clock.
+        """
+        try:
+            before = time.time() * 1000
+            server_time = binance_futures_testnet.fetch_time()
+            after = time.time() * 1000
+            self.clock_offset_ms = server_time - (before + after) / 2
+        except ccxt.BaseError as e:
+            # keep the previous offset, the daemon must not die on a clock sync
+            print(f"Error syncing clock with the exchange: {e}")
+
+    def now_ms(self):
+        """
+        Current exchange time in ms.
+        """
+        return time.time() * 1000 + self.clock_offset_ms
+
+    def next_boundary_ms(self):
+        """
+        Open time of the next candle.
+        """
+        return (int(self.now_ms()) // self.timeframe_ms + 1) * self.timeframe_ms
+
+    def reconcile_horizon(self):
+        """
+        Seconds from RECONCILE_LEAD_MS before a boundary to the signal of its cycle.
+        """
+        return (2 * RECONCILE_LEAD_MS + self.settle_delay_ms) / 1000
+
+    async def reconcile_ledger(self, within=0):
+        """
+        Reload the ledger when it is stale or due within `within` seconds, so the next signal
+        is sized from memory.
+        """
+        if not ledger.needs_reconcile(within=within):
+            return
+        try:
+            if self.use_async:
+                await ledger.reconcile_async(get_async_client())
+            else:
+                await asyncio.to_thread(ledger.reconcile, binance_futures_testnet)
+        except ccxt.BaseError as e:
+            # the next handle_signal reconciles again
+            print(f"Error reconciling the ledger with the exchange: {e}")
+
+    async def sleep_until(self, time_ms):
+        """
+        Wait until the exchange time time_ms, returns True when stopped meanwhile.
+        """
+        try:
+            await asyncio.wait_for(self.stop_event.wait(), timeout=max((time_ms - self.now_ms()) / 1000, 0))
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def stop(self):
+        """
+        Ask the daemon to exit after the current cycle.
+        """
+        print("Stop requested, exiting after the current cycle.")
+        self.stop_event.set()
+
+    async def run(self):
+        """
+        Main loop.
+        """
+        self.stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.stop)
+        if os.getenv('METRICS_PORT'):
+            serve_metrics(int(os.getenv('METRICS_PORT')))
+        await asyncio.to_thread(self.sync_clock)
+        cycles = 0
+        while not self.stop_event.is_set():
+            boundary = self.next_boundary_ms()
+            if await self.sleep_until(boundary - RECONCILE_LEAD_MS):
+                break
+            await self.reconcile_ledger(within=self.reconcile_horizon())
+            if await self.sleep_until(boundary + self.settle_delay_ms):
+                break
+            # the cycle is never cancelled halfway (sync ccxt calls run in a worker thread)
+            try:
+                if self.cycle is not None:
+                    await self.cycle()
+                elif self.use_async:
+                    await run_cycle_async(self.mode, self.symbol, self.timeframe, self.engine)
+                else:
+                    await asyncio.to_thread(run_cycle, self.mode, self.symbol, self.timeframe, self.engine)
+            except Exception:
+                # one failed cycle (exchange error, ...) must not stop the daemon, the orders it
+                # may have left half done are only known to the exchange: reconcile everything
+                logging.exception("cycle %s %s candle %s failed", self.symbol, self.timeframe, boundary)
+                print(f"Cycle for candle {boundary} failed, see the log")
+                ledger.invalidate()
+            latency = self.now_ms() - boundary
+            print(f"Cycle for candle {boundary} done {latency:.0f} ms after candle close")
+            logging.info("cycle %s %s candle %s latency_ms %.0f", self.symbol, self.timeframe, boundary, latency)
+            # candle close -> end of cycle, next to the per-stage histograms
+            record('candle_close_to_done', int(latency * 1e6))
+            dump(latency_path())
+            cycles += 1
+            await self.reconcile_ledger()
+            if cycles % CLOCK_SYNC_CYCLES == 0:
+                await asyncio.to_thread(self.sync_clock)
+        if self.engine is not None:
+            self.engine.save(get_engine_path(self.symbol, self.timeframe))
+        await close_async_client()
+        print("Daemon stopped.")
+
+if __name__ == "__main__":
+    MODE = 'prod' if '--prod' in sys.argv[1:] else 'debug'
+    asyncio.run(TradingDaemon(MODE, use_async='--async' in sys.argv[1:]).run())
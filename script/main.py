@@ -1,15 +1,33 @@
 """
 main method to init progrmm
 """
+import asyncio
+import os
 import sys
-from utils.api import fetch_ohlcv, place_market_order, cancel_pending_orders, binance_futures_testnet
+import threading
+import time
+
+import ccxt
+from utils.startup import StartupTimer, ensure_markets
+
+# per-phase startup timings, reported at the end of a one-shot run
+startup = StartupTimer()
+
+from utils.api import fetch_candles, place_market_order, place_bracket_order, cancel_pending_orders, binance_futures_testnet
+from utils.ledger import ledger
 from utils.signals import generate_signals
+from utils.indicators import SignalEngine
+from utils.candle_store import DEFAULT_ROOT
 from utils.risk_management import calculate_stop_loss_take_profit, calculate_position_size
-from utils.logging import setup_logger
+from utils.logging import setup_logger, latency_path
+from utils.tracing import traced, dump
+from utils.async_api import get_async_client, cancel_pending_orders_async, place_market_order_async, place_bracket_order_async
 
 # init logger
 setup_logger()
+startup.mark('imports')
 
+@traced('handle_signal')
 def handle_signal(signal, symbol, risk_percentage=3):
     """
     signal: 'BUY' or 'SELL' from crossover strategy
@@ -22,22 +40,14 @@ def handle_signal(signal, symbol, risk_percentage=3):
     ticker = binance_futures_testnet.fetch_ticker(symbol)
     latest_price = ticker['last']
     stop_loss_price, take_profit_price = calculate_stop_loss_take_profit(latest_price)
+    # balance and positions from the local ledger, reloaded from the exchange when stale or due
+    ledger.ensure_fresh(binance_futures_testnet, symbol)
     # Check current balance in USDT and determine position_size
-    balance = binance_futures_testnet.fetch_balance()
-    available_balance = balance['USDT']['free']
+    available_balance = ledger.free('USDT')
     position_size = calculate_position_size(available_balance, risk_percentage, latest_price, stop_loss_price)
 
     # Check current positions (both LONG and SHORT) on this symbol
-    positions = binance_futures_testnet.fetch_positions()
-    current_long_qty = 0
-    current_short_qty = 0
-    for pos in positions:
-        if symbol in pos['symbol']:
-            # positionSide might be 'LONG' or 'SHORT'
-            if pos['side'].upper() == 'LONG':
-                current_long_qty = float(pos['contracts']) if pos['contracts'] else 0
-            elif pos['side'].upper() == 'SHORT':
-                current_short_qty = float(pos['contracts']) if pos['contracts'] else 0
+    current_long_qty, current_short_qty = ledger.position_quantities(symbol)
 
     # If signal == 'BUY', we want to:
     #    - close any short, then open (or add to) a long
@@ -48,7 +58,7 @@ def handle_signal(signal, symbol, risk_percentage=3):
             place_market_order(symbol, 'BUY', current_short_qty, 'SHORT')
         # Open or add to long
         print("Opening/adding LONG position")
-        place_market_order(symbol, 'BUY', position_size, 'LONG', stop_loss_price, take_profit_price)
+        place_bracket_order(symbol, 'BUY', position_size, 'LONG', stop_loss_price, take_profit_price)
 
     # If signal == 'SELL', we want to:
     #    - close any long, then open (or add to) a short
@@ -60,35 +70,143 @@ def handle_signal(signal, symbol, risk_percentage=3):
         # Open or add to short
         print("Opening/adding SHORT position")
         stop_loss_price, take_profit_price = calculate_stop_loss_take_profit(latest_price, position_side='SHORT')
-        place_market_order(symbol, 'SELL', position_size, 'SHORT', stop_loss_price, take_profit_price)
+        place_bracket_order(symbol, 'SELL', position_size, 'SHORT', stop_loss_price, take_profit_price)
 
-def main(mode):
+@traced('handle_signal_async')
+async def handle_signal_async(signal, symbol, risk_percentage=3):
+    """
+    Same decisions as handle_signal on the async client.
+    The cancels, the ticker and the ledger reconcile (when due) are requested concurrently,
+    only the orders keep their order: close the opposite side, then open (SL/TP concurrently).
     """
-    docstring
-    """
-    symbol = 'BTC/USDT'
-    timeframe = '1h'
-    df = fetch_ohlcv(symbol, timeframe=timeframe, limit=50)
-    if df is not None and not df.empty:
-        df, signal = generate_signals(df)
-        if mode == 'prod':
-            if signal in ["BUY", "SELL"]:
-                handle_signal(signal, symbol)
-            else:
-                print("No crossover signal. Doing nothing.")
+    client = get_async_client()
+    start = time.perf_counter()
+    _, ticker, _ = await asyncio.gather(
+        cancel_pending_orders_async(symbol),
+        client.fetch_ticker(symbol),
+        ledger.ensure_fresh_async(client, symbol)
+    )
+    latest_price = ticker['last']
+    position_side = 'LONG' if signal == 'BUY' else 'SHORT'
+    stop_loss_price, take_profit_price = calculate_stop_loss_take_profit(latest_price)
+    available_balance = ledger.free('USDT')
+    position_size = calculate_position_size(available_balance, risk_percentage, latest_price, stop_loss_price)
+    current_long_qty, current_short_qty = ledger.position_quantities(symbol)
+
+    if signal in ('BUY', 'SELL'):
+        opposite_side, opposite_qty = ('SHORT', current_short_qty) if signal == 'BUY' else ('LONG', current_long_qty)
+        if opposite_qty > 0:
+            print(f"Closing {opposite_side} position")
+            await place_market_order_async(symbol, signal, opposite_qty, opposite_side)
+        print(f"Opening/adding {position_side} position")
+        stop_loss_price, take_profit_price = calculate_stop_loss_take_profit(latest_price, position_side=position_side)
+        await place_bracket_order_async(symbol, signal, position_size, position_side, stop_loss_price, take_profit_price)
+    print(f"handle_signal_async done in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+SYMBOL = 'BTC/USDT'
+TIMEFRAME = '1h'
+
+def get_engine_path(symbol, timeframe):
+    """
+    json file holding the SignalEngine state of symbol/timeframe
+    """
+    return os.path.join(os.path.dirname(DEFAULT_ROOT), 'engine', f"{symbol.replace('/', '_').replace(':', '_')}_{timeframe}.json")
+
+def compute_signal(symbol, timeframe, engine):
+    """
+    fetch candles -> generate_signals
+    engine: SignalEngine of symbol/timeframe, its state is saved after the new candles are fed
+    The candles are kept in the symbol's CandleRing (fetch_candles), no DataFrame per cycle.
+    Returns (has_data, signal).
+    """
+    df = fetch_candles(symbol, timeframe=timeframe, limit=50)
+    if df is None or df.empty:
+        print("No OHLCV data fetched.")
+        return False, None
+    # resting SL / TP touched by these candles may have filled: the ledger reconciles first
+    ledger.observe_candles(symbol, df)
+    df, signal = generate_signals(df, engine=engine)
+    engine.save(get_engine_path(symbol, timeframe))
+    return True, signal
+
+@traced('run_cycle')
+def run_cycle(mode, symbol, timeframe, engine, timer=None):
+    """
+    fetch candles -> generate_signals -> handle_signal, once
+    timer: optional StartupTimer, marks the 'fetch + signal' and 'orders' phases
+    """
+    has_data, signal = compute_signal(symbol, timeframe, engine)
+    if timer is not None:
+        timer.mark('fetch + signal')
+    if not has_data:
+        return
+    if mode == 'prod':
+        if signal in ["BUY", "SELL"]:
+            handle_signal(signal, symbol)
         else:
-            positions = binance_futures_testnet.fetch_positions()
-            for pos in positions:
-                print(pos)
-            handle_signal('SELL', symbol)
-            # place_market_order(symbol, 'BUY', 0.02, 'LONG', 100000, 200000)
-            """
-            place_market_order(symbol, 'SELL', 0.02, 'SHORT', 100000, 200000)
-            place_market_order(symbol, 'BUY', 0.02, 'SHORT', 100000, 200000)
-            place_market_order(symbol, 'SELL', 0.02, 'LONG', 100000, 200000)
-            """
+            print("No crossover signal. Doing nothing.")
     else:
-        print("No OHLCV data fetched.")
+        positions = binance_futures_testnet.fetch_positions()
+        for pos in positions:
+            print(pos)
+        handle_signal('SELL', symbol)
+        # place_market_order(symbol, 'BUY', 0.02, 'LONG', 100000, 200000)
+        """
+        place_market_order(symbol, 'SELL', 0.02, 'SHORT', 100000, 200000)
+        place_market_order(symbol, 'BUY', 0.02, 'SHORT', 100000, 200000)
+        place_market_order(symbol, 'SELL', 0.02, 'LONG', 100000, 200000)
+        """
+    if timer is not None:
+        timer.mark('orders')
+
+@traced('run_cycle_async')
+async def run_cycle_async(mode, symbol, timeframe, engine):
+    """
+    run_cycle with the orders going through handle_signal_async
+    """
+    has_data, signal = await asyncio.to_thread(compute_signal, symbol, timeframe, engine)
+    if not has_data:
+        return
+    if mode == 'prod':
+        if signal in ["BUY", "SELL"]:
+            await handle_signal_async(signal, symbol)
+        else:
+            print("No crossover signal. Doing nothing.")
+    else:
+        positions = await get_async_client().fetch_positions()
+        for pos in positions:
+            print(pos)
+        await handle_signal_async('SELL', symbol)
+
+def prefetch_ledger():
+    """
+    Reconcile the ledger in a background thread (a one-shot run starts with an empty one) while
+    the candles are fetched: handle_signal waits for it instead of reconciling again.
+    """
+    def reconcile():
+        try:
+            ledger.ensure_fresh(binance_futures_testnet)
+        except ccxt.BaseError as e:
+            # handle_signal reconciles again
+            print(f"Error reconciling the ledger with the exchange: {e}")
+    thread = threading.Thread(target=reconcile, daemon=True)
+    thread.start()
+    return thread
+
+@traced('main')
+def main(mode):
+    """
+    one-shot run: a single cycle on SYMBOL/TIMEFRAME
+    """
+    # indicator state survives restarts so each run only feeds the new candles
+    engine = SignalEngine.load(get_engine_path(SYMBOL, TIMEFRAME))
+    startup.mark('engine state')
+    # markets / precisions from the local cache when fresh (no load_markets() before the first order)
+    ensure_markets(binance_futures_testnet)
+    startup.mark('client + markets')
+    prefetch_ledger()
+    run_cycle(mode, SYMBOL, TIMEFRAME, engine, timer=startup)
+    startup.report()
 
 if __name__ == "__main__":
     MODE = 'debug'
@@ -96,3 +214,5 @@ if __name__ == "__main__":
         if sys.argv[1] == '--prod':
             MODE = 'prod'
     main(MODE)
+    # per-stage latencies of this run (main included)
+    dump(latency_path())
@@ -0,0 +1,150 @@
+"""
+multi-symbol scanner
+
+fetches the candles and evaluates generate_signals for N symbols concurrently on the async
+client. Every candle request goes through a WeightScheduler so the scan stays inside the
+exchange weight budget whatever the number of symbols. The symbols that fire are then handled
+one after the other through handle_signal (they share the same balance), with --async through
+handle_signal_async.
+In debug mode the signals are only printed, no order is sent.
+
+usage: python script/scanner.py [--prod] [--async] [--daemon] [--symbols BTC/USDT,ETH/USDT | --top N]
+"""
+import asyncio
+import logging
+import sys
+import time
+
+import ccxt
+
+from daemon import TradingDaemon
+from main import TIMEFRAME, get_engine_path, handle_signal, handle_signal_async
+from utils.async_api import get_async_client, close_async_client, fetch_candles_async
+from utils.indicators import SignalEngine
+from utils.ledger import ledger
+from utils.rate_limit import WeightScheduler, klines_weight
+from utils.signals import generate_signals
+from utils.startup import save_markets
+
+# weight reserved for one handle_signal (ticker 1 + open orders / cancels, + balance 5 + positions 5 when the ledger reconciles)
+HANDLE_SIGNAL_WEIGHT = 20
+# GET /fapi/v1/ticker/24hr without symbol
+TICKERS_WEIGHT = 40
+
+async def top_symbols(count, scheduler=None):
+    """
+    The `count` active USDT-margined perpetuals with the highest 24h quote volume.
+    """
+    client = get_async_client()
+    if not client.markets:
+        await client.load_markets()
+        save_markets(client)
+    scheduler = scheduler or WeightScheduler()
+    async with scheduler.request(TICKERS_WEIGHT):
+        tickers = await client.fetch_tickers()
+    symbols = [
+        symbol for symbol, market in client.markets.items()
+        if market.get('swap') and market.get('linear') and market.get('quote') == 'USDT' and market.get('active', True)
+    ]
+    symbols.sort(key=lambda symbol: (tickers.get(symbol) or {}).get('quoteVolume') or 0, reverse=True)
+    return symbols[:count]
+
+class SymbolScanner:
+    """
+    one SignalEngine per symbol, one scan per call of run_cycle()
+    """
+    def __init__(self, mode, symbols, timeframe=TIMEFRAME, limit=50, scheduler=None, use_async=False):
+        self.mode = mode
+        self.symbols = list(symbols)
+        self.timeframe = timeframe
+        self.limit = limit
+        self.use_async = use_async
+        self.scheduler = scheduler or WeightScheduler()
+        self.engines = {symbol: SignalEngine.load(get_engine_path(symbol, timeframe)) for symbol in self.symbols}
+
+    async def evaluate(self, symbol):
+        """
+        fetch candles -> generate_signals for one symbol, returns the signal (or None)
+        """
+        async with self.scheduler.request(klines_weight(self.limit)):
+            df = await fetch_candles_async(symbol, timeframe=self.timeframe, limit=self.limit)
+        self.scheduler.observe(get_async_client().last_response_headers)
+        if df is None or df.empty:
+            print(f"No OHLCV data fetched for {symbol}.")
+            return None
+        ledger.observe_candles(symbol, df)
+        engine = self.engines[symbol]
+        df, signal = generate_signals(df, engine=engine)
+        engine.save(get_engine_path(symbol, self.timeframe))
+        return signal
+
+    async def scan(self):
+        """
+        Evaluate every symbol concurrently, returns {symbol: signal} for the symbols that fired.
+        """
+        results = await asyncio.gather(*(self.evaluate(symbol) for symbol in self.symbols), return_exceptions=True)
+        signals = {}
+        for symbol, result in zip(self.symbols, results):
+            if isinstance(result, BaseException):
+                if not isinstance(result, Exception):
+                    raise result
+                print(f"Error scanning {symbol}: {result}")
+                logging.error("scan %s failed: %s", symbol, result)
+            elif result in ('BUY', 'SELL'):
+                signals[symbol] = result
+        return signals
+
+    async def run_cycle(self):
+        """
+        scan -> handle_signal for each symbol that fired
+        """
+        start = time.perf_counter()
+        signals = await self.scan()
+        scan_ms = (time.perf_counter() - start) * 1000
+        print(f"Scanned {len(self.symbols)} symbols in {scan_ms:.0f} ms, {len(signals)} signal(s): {signals}")
+        logging.info("scan %d symbols %s scan_ms %.0f signals %s", len(self.symbols), self.timeframe, scan_ms, signals)
+        if self.mode != 'prod':
+            return signals
+        for symbol, signal in signals.items():
+            try:
+                async with self.scheduler.request(HANDLE_SIGNAL_WEIGHT):
+                    if self.use_async:
+                        await handle_signal_async(signal, symbol)
+                    else:
+                        await asyncio.to_thread(handle_signal, signal, symbol)
+            except ccxt.BaseError as e:
+                print(f"Error handling {signal} signal for {symbol}: {e}")
+        return signals
+
+def parse_symbols(argv):
+    """
+    --symbols A,B,... or --top N from the command line, None when absent.
+    """
+    for flag in ('--symbols', '--top'):
+        if flag in argv and argv.index(flag) + 1 < len(argv):
+            value = argv[argv.index(flag) + 1]
+            return value.split(',') if flag == '--symbols' else int(value)
+    return None
+
+async def run(mode, argv):
+    """
+    build the scanner from the command line, scan once or as a daemon
+    """
+    symbols = parse_symbols(argv)
+    scheduler = WeightScheduler()
+    if symbols is None:
+        symbols = 20
+    if isinstance(symbols, int):
+        symbols = await top_symbols(symbols, scheduler)
+    scanner = SymbolScanner(mode, symbols, scheduler=scheduler, use_async='--async' in argv)
+    if '--daemon' in argv:
+        await TradingDaemon(mode, timeframe=scanner.timeframe, cycle=scanner.run_cycle).run()
+        return
+    try:
+        await scanner.run_cycle()
+    finally:
+        await close_async_client()
+
+if __name__ == "__main__":
+    MODE = 'prod' if '--prod' in sys.argv[1:] else 'debug'
+    asyncio.run(run(MODE, sys.argv[1:]))
@@ -0,0 +1,114 @@
+"""
+offline replay of the live path against the local exchange simulator
+
+every cycle makes the next candle visible on a utils.simulator.SimulatedExchange (resting
+SL / TP orders are matched against it) then runs the same run_cycle as main.py / daemon.py:
+fetch_candles -> generate_signals -> handle_signal. Reports the throughput and the final account.
+Candles are seeded synthetic ones, or the candles of the local candle store with --store.
+The candle store, the engine state and the order journal of the replay live in a temporary
+directory (CANDLE_STORE_DIR when set), never in the live ones.
+
+usage: python script/simulate.py [--candles N] [--store] [--async] [--verbose] [--serve PORT]
+  --serve PORT: only serve the simulator over HTTP, bots started with
+                EXCHANGE_SIMULATOR_URL=http://127.0.0.1:PORT trade against it
+"""
+import asyncio
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+# must be set before utils.candle_store is imported: the replay writes its own candles / engine state
+SIM_DIR = tempfile.mkdtemp(prefix='btc-bot-sim-')
+LIVE_CANDLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'candles')
+os.environ.setdefault('CANDLE_STORE_DIR', os.path.join(SIM_DIR, 'candles'))
+
+from main import SYMBOL, TIMEFRAME, run_cycle, run_cycle_async
+from utils.api import BinanceClient
+from utils.async_api import close_async_client
+from utils.candle_store import CandleStore
+from utils.indicators import SignalEngine
+from utils.journal import EventJournal
+from utils.logging import set_journal
+from utils.simulator import SimulatedExchange, serve, synthetic_ohlcv
+from utils.tracing import snapshot
+
+# candles visible before the first cycle (the live path fetches 50)
+WARMUP_CANDLES = 50
+
+def build_exchange(symbol=SYMBOL, timeframe=TIMEFRAME, candles=10000, from_store=False, seed=0):
+    """
+    SimulatedExchange with the candles of symbol / timeframe, clock after the warm-up candles.
+    """
+    exchange = SimulatedExchange(timeframe=timeframe)
+    if from_store:
+        data = CandleStore(LIVE_CANDLES_DIR).read(symbol, timeframe)
+        ohlcv = list(zip(data['timestamp'], data['open'], data['high'], data['low'], data['close'], data['volume']))
+    else:
+        ohlcv = synthetic_ohlcv(candles, timeframe=timeframe, seed=seed)
+    exchange.add_candles(symbol, ohlcv)
+    first = exchange.candles[symbol.split(':')[0]]
+    exchange.seek(int(first[min(WARMUP_CANDLES, len(first)) - 1, 0]))
+    return exchange
+
+def replay(exchange, symbol=SYMBOL, timeframe=TIMEFRAME, use_async=False, verbose=False):
+    """
+    One prod cycle per candle until the feed is exhausted, returns (cycles, seconds).
+    """
+    engine = SignalEngine()
+    out = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(open(os.devnull, 'w', encoding='utf-8'))
+    cycles = 0
+    start = time.perf_counter()
+    with out:
+        if use_async:
+            async def run_all():
+                nonlocal cycles
+                while exchange.step():
+                    await run_cycle_async('prod', symbol, timeframe, engine)
+                    cycles += 1
+                await close_async_client()
+            asyncio.run(run_all())
+        else:
+            while exchange.step():
+                run_cycle('prod', symbol, timeframe, engine)
+                cycles += 1
+    return cycles, time.perf_counter() - start
+
+def report(exchange, cycles, seconds):
+    """
+    Print the throughput, the per-stage latencies and the final account.
+    """
+    balance = exchange.fetch_balance()[exchange.quote]
+    orders = exchange.orders.values()
+    filled = sum(1 for order in orders if order['status'] == 'closed')
+    print(f"{cycles} cycles in {seconds:.2f} s ({cycles / seconds:.0f} cycles/s)")
+    for stage, summary in snapshot().items():
+        if summary['count']:
+            print(f"  {stage:<32} n={summary['count']:<6} p50 {summary['p50_ms']:.3f} ms  p99 {summary['p99_ms']:.3f} ms")
+    print(f"orders: {len(exchange.orders)} placed, {filled} filled, {len(exchange.open_orders)} still open")
+    print(f"balance: total {balance['total']:.2f} free {balance['free']:.2f} {exchange.quote}")
+    for position in exchange.fetch_positions():
+        if position['contracts']:
+            print(f"position: {position['side']} {position['contracts']:.6f} @ {position['entryPrice']:.2f}")
+
+def option(argv, flag, default):
+    """
+    Value following flag on the command line.
+    """
+    if flag in argv and argv.index(flag) + 1 < len(argv):
+        return type(default)(argv[argv.index(flag) + 1])
+    return default
+
+if __name__ == "__main__":
+    ARGS = sys.argv[1:]
+    EXCHANGE = build_exchange(candles=option(ARGS, '--candles', 10000), from_store='--store' in ARGS)
+    if '--serve' in ARGS:
+        SERVER = serve(EXCHANGE, port=option(ARGS, '--serve', 8765))
+        print(f"Simulator listening on http://127.0.0.1:{SERVER.server_address[1]}")
+        SERVER.serve_forever()
+    else:
+        BinanceClient.use(EXCHANGE)
+        set_journal(EventJournal(os.path.join(SIM_DIR, 'orders_journal.jsonl'), fsync='never'))
+        CYCLES, SECONDS = replay(EXCHANGE, use_async='--async' in ARGS, verbose='--verbose' in ARGS)
+        report(EXCHANGE, CYCLES, SECONDS)
@@ -3,9 +3,41 @@ api module for binance
 """
 import os
 import ccxt
+import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
 from utils.logging import log_order
+from utils.ledger import ledger
+from utils.candle_store import CandleStore, timeframe_to_ms
+from utils.resampler import Resampler, TIMEFRAMES
+from utils.ring_buffer import CandleRing
+from utils.startup import load_cached_markets
+from utils.tracing import traced, trace_client
+
+def exchange_config():
+    """
+    ccxt config for Binance Futures Testnet (shared by the sync and the async client)
+    """
+    load_dotenv('PATH_TO_.ENV_FILE')
+    api_key = os.getenv("BINANCE_TESTNET_API_KEY")
+    api_secret = os.getenv("BINANCE_TESTNET_API_SECRET")
+    return {
+        'apiKey': api_key,
+        'secret': api_secret,
+        'enableRateLimit': True,
+        'options': {
+            'defaultType': 'future'
+        },
+        'urls': {
+            'api': {
+                'public': 'https://testnet.binancefuture.com/fapi/v1',
+                'private': 'https://testnet.binancefuture.com/fapi/v1'
+            }
+        }
+    }
+
+# url of a local exchange simulator (see utils.simulator.serve) to use instead of the testnet
+SIMULATOR_URL = os.getenv('EXCHANGE_SIMULATOR_URL')
 
 class BinanceClient:
     """
@@ -15,45 +47,224 @@ class BinanceClient:
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(BinanceClient, cls).__new__(cls)
-            load_dotenv('PATH_TO_.ENV_FILE')
-            api_key = os.getenv("BINANCE_TESTNET_API_KEY")
-            api_secret = os.getenv("BINANCE_TESTNET_API_SECRET")
+            if SIMULATOR_URL:
+                from utils.simulator import SimulatorHTTPClient
+                cls._instance.client = SimulatorHTTPClient(SIMULATOR_URL)
+                return cls._instance
             # Configure ccxt for Binance Futures Testnet
-            cls._instance.client = ccxt.binanceusdm({
-                'apiKey': api_key,
-                'secret': api_secret,
-                'enableRateLimit': True,
-                'options': {
-                    'defaultType': 'future'
-                },
-                'urls': {
-                    'api': {
-                        'public': 'https://testnet.binancefuture.com/fapi/v1',
-                        'private': 'https://testnet.binancefuture.com/fapi/v1'
-                    }
-                }
-            })
+            cls._instance.client = ccxt.binanceusdm(exchange_config())
             cls._instance.client.set_sandbox_mode(True)
+            # markets / precisions from the local cache when fresh, no load_markets() request
+            load_cached_markets(cls._instance.client)
         return cls._instance
-binance_futures_testnet = BinanceClient().client
+
+    @classmethod
+    def use(cls, client):
+        """
+        Swap the exchange client (e.g. a utils.simulator.SimulatedExchange) for every caller.
+        Returns the previous client (None when none was built yet).
+        """
+        previous = cls._instance.client if cls._instance is not None else None
+        if cls._instance is None:
+            cls._instance = super(BinanceClient, cls).__new__(cls)
+        cls._instance.client = client
+        return previous
+
+def simulated_client():
+    """
+    The swapped-in simulator client, None when trading against the exchange.
+    """
+    if BinanceClient._instance is None and not SIMULATOR_URL:
+        return None
+    client = BinanceClient().client
+    return client if getattr(client, 'simulated', False) else None
+
+class LazyClient:
+    """
+    proxy to BinanceClient().client, the ccxt client is only built on first use
+    so importing this module stays cheap. Exchange calls are traced (utils.tracing).
+    """
+    def __init__(self):
+        self._traced = (None, None)
+
+    def __getattr__(self, name):
+        client = BinanceClient().client
+        if self._traced[0] is not client:
+            self._traced = (client, trace_client(client))
+        return getattr(self._traced[1], name)
+
+binance_futures_testnet = LazyClient()
 # balance = binance_futures_testnet.fetch_balance()
 # print(balance)
 
+candle_store = CandleStore()
+
+def record_order(order):
+    """
+    Journal an acknowledged order and apply it to the local ledger (utils.ledger).
+    """
+    log_order(order)
+    ledger.apply_order(order)
+
+def ohlcv_since(symbol, timeframe, limit, now_ms):
+    """
+    `since` for the next candle request of symbol/timeframe: the last stored candle
+    (it may still have been open when stored), or None to fetch a full window of `limit`
+    candles when the store is empty or holds fewer recent ones.
+    A store `limit` or more candles behind is caught up from its last candle too, page by
+    page (ingest_ohlcv): a window fetched after it would leave a hole in the store.
+    """
+    last_timestamp = candle_store.last_timestamp(symbol, timeframe)
+    if last_timestamp is None:
+        return None
+    behind = (now_ms - last_timestamp) // timeframe_to_ms(timeframe)
+    if behind < limit and candle_store.count(symbol, timeframe) < limit:
+        return None
+    return last_timestamp
+
+def ingest_ohlcv(symbol, timeframe, ohlcv, since, limit):
+    """
+    Write a page of candles fetched from `since` (limit per request) to the candle store.
+    Returns the `since` of the next page, None when the page was the last one.
+    """
+    candle_store.write(symbol, timeframe, ohlcv)
+    if since is None or len(ohlcv) < limit:
+        return None
+    return int(ohlcv[-1][0]) + 1
+
+# build every timeframe from one feed of these candles (e.g. OHLCV_BASE_TIMEFRAME=1m, see
+# utils.resampler) instead of one exchange request per timeframe
+OHLCV_BASE_TIMEFRAME = os.getenv('OHLCV_BASE_TIMEFRAME')
+# candles per request of the base feed
+BASE_PAGE_LIMIT = 1000
+# symbol -> {'resampler', 'history_ms', 'start', 'synced'}
+_base_feeds = {}
+
+def base_feed(symbol, timeframe, limit, now_ms):
+    """
+    Base candle feed of symbol able to serve `limit` bars of timeframe, (re)built from the
+    candle store when it cannot yet (new timeframe, longer history).
+    Returns (feed, since): since is the open time to request base candles from, None when
+    the feed was already synced during the current base candle (no request needed).
+    """
+    base_ms = timeframe_to_ms(OHLCV_BASE_TIMEFRAME)
+    day_ms = timeframe_to_ms('1d')
+    feed = _base_feeds.get(symbol)
+    history_ms = (limit + 1) * timeframe_to_ms(timeframe)
+    first_timestamp = candle_store.first_timestamp(symbol, OHLCV_BASE_TIMEFRAME)
+    last_timestamp = candle_store.last_timestamp(symbol, OHLCV_BASE_TIMEFRAME)
+    if feed is None or timeframe not in feed['resampler'].timeframe_ms or history_ms > feed['history_ms']:
+        timeframes = {timeframe, *TIMEFRAMES}
+        if feed is not None:
+            history_ms = max(history_ms, feed['history_ms'])
+            timeframes.update(feed['resampler'].timeframe_ms)
+        # from a day boundary, so every bar of the window is complete
+        start = (now_ms - history_ms) // day_ms * day_ms
+        resampler = Resampler(sorted(timeframes, key=timeframe_to_ms), base=OHLCV_BASE_TIMEFRAME)
+        feed = _base_feeds[symbol] = {'resampler': resampler, 'history_ms': history_ms, 'start': start, 'synced': None}
+        if last_timestamp is None or first_timestamp > start or last_timestamp < start:
+            # the store does not cover the window: every base candle of it is requested
+            return feed, start
+        resampler.update(candle_store.read(symbol, OHLCV_BASE_TIMEFRAME, start=start))
+    if feed['synced'] is not None and feed['synced'] // base_ms == now_ms // base_ms:
+        return feed, None
+    return feed, last_timestamp
+
+def ingest_base_candles(symbol, feed, ohlcv):
+    """
+    Write a page of base candles to the candle store and the feed's resampler.
+    Returns the `since` of the next page, None when the page was the last one.
+    """
+    candle_store.write(symbol, OHLCV_BASE_TIMEFRAME, ohlcv)
+    feed['resampler'].update(ohlcv)
+    if len(ohlcv) < BASE_PAGE_LIMIT:
+        return None
+    return int(ohlcv[-1][0]) + 1
+
+def resampled_feed(symbol='BTC/USDT', timeframe='1h', limit=50):
+    """
+    Sync the OHLCV_BASE_TIMEFRAME feed of symbol: only the base candles since the last stored
+    one are requested (none when already synced during this base candle).
+    Returns its Resampler, every timeframe is resampled in memory.
+    """
+    now_ms = binance_futures_testnet.milliseconds()
+    feed, since = base_feed(symbol, timeframe, limit, now_ms)
+    while since is not None:
+        ohlcv = binance_futures_testnet.fetch_ohlcv(symbol, timeframe=OHLCV_BASE_TIMEFRAME, since=since, limit=BASE_PAGE_LIMIT)
+        since = ingest_base_candles(symbol, feed, ohlcv)
+    feed['synced'] = now_ms
+    return feed['resampler']
+
+def fetch_resampled_ohlcv(symbol='BTC/USDT', timeframe='1h', limit=50):
+    """
+    fetch_ohlcv built from the OHLCV_BASE_TIMEFRAME feed (resampled_feed).
+    """
+    return resampled_feed(symbol, timeframe, limit).to_frame(timeframe, limit)
+
+@traced('fetch_ohlcv')
 def fetch_ohlcv(symbol='BTC/USDT', timeframe='1h', limit=50):
     """
     Fetch historical candlestick data for the given symbol.
+    Candles are kept in the local candle store, only the ones from the last stored candle
+    onwards are requested (the last stored one may still have been open when stored), in pages
+    of `limit` when the store is that far behind.
+    A full window of `limit` candles is fetched when the store is empty.
+    With OHLCV_BASE_TIMEFRAME set, the candles are resampled from that feed (fetch_resampled_ohlcv).
     Returns a Pandas DataFrame with columns: [timestamp, open, high, low, close, volume].
     """
     try:
-        ohlcv = binance_futures_testnet.fetch_ohlcv(symbol, timeframe=timeframe, limit=limit)
-        df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        return df
+        if OHLCV_BASE_TIMEFRAME and timeframe != OHLCV_BASE_TIMEFRAME:
+            return fetch_resampled_ohlcv(symbol, timeframe, limit)
+        since = ohlcv_since(symbol, timeframe, limit, binance_futures_testnet.milliseconds())
+        while True:
+            ohlcv = binance_futures_testnet.fetch_ohlcv(symbol, timeframe=timeframe, since=since, limit=limit)
+            since = ingest_ohlcv(symbol, timeframe, ohlcv, since, limit)
+            if since is None:
+                return candle_store.to_frame(symbol, timeframe, limit=limit)
+    except ccxt.BaseError as e:
+        print(f"Error fetching OHLCV data: {e}")
+        return None
+
+# fixed-capacity candle buffers of fetch_candles, per (symbol, timeframe)
+candle_rings = {}
+# 'float32' halves the memory of the candle rings (prices, volumes and indicators)
+CANDLE_RING_DTYPE = np.dtype(os.getenv('CANDLE_RING_DTYPE', 'float64'))
+
+def candle_ring(symbol, timeframe, capacity):
+    """
+    CandleRing of symbol/timeframe holding `capacity` candles, created (or grown) from the candle store.
+    """
+    ring = candle_rings.get((symbol, timeframe))
+    if ring is None or ring.capacity < capacity:
+        ring = candle_rings[(symbol, timeframe)] = CandleRing(capacity, dtype=CANDLE_RING_DTYPE)
+        ring.update(candle_store.read(symbol, timeframe, limit=capacity))
+    return ring
+
+@traced('fetch_candles')
+def fetch_candles(symbol='BTC/USDT', timeframe='1h', limit=50):
+    """
+    Same requests as fetch_ohlcv, but the candles go to the CandleRing of symbol/timeframe
+    (utils.ring_buffer) instead of a new DataFrame: memory and allocations stay constant per cycle.
+    Returns the ring (its last `limit` candles are the fetch_ohlcv ones), None on errors.
+    """
+    try:
+        ring = candle_ring(symbol, timeframe, limit)
+        if OHLCV_BASE_TIMEFRAME and timeframe != OHLCV_BASE_TIMEFRAME:
+            ring.update(resampled_feed(symbol, timeframe, limit).read(timeframe, limit))
+            return ring
+        since = ohlcv_since(symbol, timeframe, limit, binance_futures_testnet.milliseconds())
+        while True:
+            ohlcv = binance_futures_testnet.fetch_ohlcv(symbol, timeframe=timeframe, since=since, limit=limit)
+            ring.update(ohlcv)
+            since = ingest_ohlcv(symbol, timeframe, ohlcv, since, limit)
+            if since is None:
+                return ring
     except ccxt.BaseError as e:
         print(f"Error fetching OHLCV data: {e}")
         return None
 
 # Place an order on Binance Futures Testnet
+@traced('place_market_order')
 def place_market_order(symbol, side, amount, position_side, stop_loss_price=None, take_profit_price=None):
     """
     Places a market order on the Binance Futures Testnet.
@@ -71,11 +282,13 @@ def place_market_order(symbol, side, amount, position_side, stop_loss_price=None
             side=side,
             amount=amount,
             params={
-                "positionSide" : position_side
+                "positionSide" : position_side,
+                # acknowledged with its fill (price, quantity) for the ledger
+                "newOrderRespType": "RESULT"
             }
         )
         print(f"{side} {position_side} order placed for {symbol} (amount: {amount})")
-        log_order(order)
+        record_order(order)
 
         # stop_loss order if provided
         if stop_loss_price:
@@ -93,7 +306,7 @@ def place_market_order(symbol, side, amount, position_side, stop_loss_price=None
                 }
             )
             print(f"Stop-loss order placed at {stop_loss_price}")
-            log_order(stop_order)
+            record_order(stop_order)
 
         # take-profit order if provided
         if take_profit_price:
@@ -111,18 +324,148 @@ def place_market_order(symbol, side, amount, position_side, stop_loss_price=None
                 }
             )
             print(f"Take-profit order placed at {take_profit_price}")
-            log_order(take_profit_order)
+            record_order(take_profit_order)
     except ccxt.BaseError as e:
         print(f'Error placing {side} order: {e}')
+        ledger.invalidate(symbol)
 
+def bracket_order_requests(symbol, side, amount, position_side, stop_loss_price=None, take_profit_price=None):
+    """
+    ccxt create_orders() requests for a market entry and its optional stop-loss / take-profit
+    (same orders as place_market_order).
+    """
+    requests = [{
+        'symbol': symbol,
+        'type': 'MARKET',
+        'side': side,
+        'amount': amount,
+        'params': {"positionSide": position_side, "newOrderRespType": "RESULT"}
+    }]
+    close_side = 'BUY' if position_side == 'SHORT' else 'SELL'  # Opposite side for sl / tp
+    for order_type, stop_price in (('STOP_MARKET', stop_loss_price), ('TAKE_PROFIT_MARKET', take_profit_price)):
+        if stop_price:
+            requests.append({
+                'symbol': symbol,
+                'type': order_type,
+                'side': close_side,
+                'amount': amount,
+                'params': {
+                    "positionSide": position_side,
+                    "stopPrice": stop_price,
+                    "closePosition": True  # Close the entire position
+                }
+            })
+    return requests
+
+# set to False once the exchange refused a batch, next brackets go straight to the fallback
+_batch_orders = {'supported': True}
+
+def batch_orders_supported(client):
+    """
+    Whether entry + sl + tp can be sent in one create_orders() request.
+    """
+    return _batch_orders['supported'] and bool(client.has.get('createOrders'))
+
+def disable_batch_orders():
+    """
+    Send the next brackets one order at a time.
+    """
+    _batch_orders['supported'] = False
+
+@traced('place_bracket_order')
+def place_bracket_order(symbol, side, amount, position_side, stop_loss_price=None, take_profit_price=None):
+    """
+    Places the market order and its stop-loss / take-profit in one batch-orders request.
+    Orders of the batch rejected by the exchange are sent again one by one, the protective
+    orders of a rejected entry are canceled.
+    Falls back to place_market_order (one request per order) when batching is unavailable.
+    Returns the orders created by the batch (None when placed one by one or on error).
+    """
+    requests = bracket_order_requests(symbol, side, amount, position_side, stop_loss_price, take_profit_price)
+    if len(requests) == 1 or not batch_orders_supported(binance_futures_testnet):
+        return place_market_order(symbol, side, amount, position_side, stop_loss_price, take_profit_price)
+    try:
+        orders = binance_futures_testnet.create_orders(requests)
+    except ccxt.NotSupported as e:
+        # raised before anything is sent
+        print(f"Batch orders not supported ({e}), placing orders one by one")
+        disable_batch_orders()
+        return place_market_order(symbol, side, amount, position_side, stop_loss_price, take_profit_price)
+    except ccxt.BaseError as e:
+        print(f'Error placing {side} bracket order: {e}')
+        ledger.invalidate(symbol)
+        return None
+    print(f"{side} {position_side} bracket order placed for {symbol} (amount: {amount}, sl: {stop_loss_price}, tp: {take_profit_price})")
+    entry_placed = bool(orders[0].get('id'))
+    for i, (request, order) in enumerate(zip(requests, orders)):
+        if order.get('id'):
+            record_order(order)
+            continue
+        print(f"{request['type']} order rejected in batch: {order.get('info')}")
+        if i == 0 or not entry_placed:
+            # no entry, no protective orders to retry
+            continue
+        try:
+            orders[i] = binance_futures_testnet.create_order(**request)
+            record_order(orders[i])
+        except ccxt.BaseError as e:
+            print(f"Error placing {request['type']} order: {e}")
+            ledger.invalidate(symbol)
+    if not entry_placed:
+        cancel_orphaned_orders(symbol, orders[1:])
+    return orders
+
+def cancel_orphaned_orders(symbol, orders):
+    """
+    Cancels the protective orders a batch accepted while rejecting their entry
+    (closePosition orders left resting would close the position of the next entry).
+    """
+    order_ids = [order['id'] for order in orders if order.get('id')]
+    for order_id in order_ids:
+        try:
+            binance_futures_testnet.cancel_order(order_id, symbol)
+            print(f"Canceled order without entry: {order_id}")
+        except ccxt.BaseError as e:
+            print(f"Error canceling order {order_id} for {symbol}: {e}")
+    ledger.cancel_orders(symbol, order_ids)
+    # an order that could not be canceled is still on the exchange: reloaded
+    ledger.invalidate(symbol)
+
+@traced('cancel_pending_orders')
 def cancel_pending_orders(symbol):
     """
     Cancels all open orders for a given symbol.
+    One cancel-all request when the exchange supports it, else one cancel per open order.
     """
     try:
+        if binance_futures_testnet.has.get('cancelAllOrders'):
+            try:
+                binance_futures_testnet.cancel_all_orders(symbol)
+                ledger.cancel_orders(symbol)
+                print(f"Canceled all open orders for {symbol}")
+                return
+            except ccxt.NotSupported:
+                pass
         orders = binance_futures_testnet.fetch_open_orders(symbol)
         for order in orders:
             binance_futures_testnet.cancel_order(order['id'], symbol)
+            ledger.cancel_orders(symbol, [order['id']])
             print(f"Canceled order: {order['id']}")
     except ccxt.BaseError as e:
         print(f"Error canceling orders for {symbol}: {e}")
+        ledger.invalidate(symbol)
+
+def position_quantities(positions, symbol):
+    """
+    Current LONG and SHORT contracts on symbol from a ccxt fetch_positions() result.
+    """
+    current_long_qty = 0
+    current_short_qty = 0
+    for pos in positions:
+        if symbol in pos['symbol']:
+            # positionSide might be 'LONG' or 'SHORT'
+            if pos['side'].upper() == 'LONG':
+                current_long_qty = float(pos['contracts']) if pos['contracts'] else 0
+            elif pos['side'].upper() == 'SHORT':
+                current_short_qty = float(pos['contracts']) if pos['contracts'] else 0
+    return current_long_qty, current_short_qty
@@ -0,0 +1,256 @@
+"""
+async api module for binance (ccxt.async_support)
+
+same calls as utils.api but independent requests run concurrently:
+the cancels of the open orders, and the stop-loss / take-profit orders once the entry is filled.
+Brackets go out as one batch-orders request and open orders are removed with one cancel-all
+request when the exchange supports them.
+"""
+import asyncio
+
+import ccxt
+
+from utils.api import (
+    exchange_config, simulated_client, bracket_order_requests, batch_orders_supported, disable_batch_orders, ohlcv_since, ingest_ohlcv, record_order,
+    OHLCV_BASE_TIMEFRAME, BASE_PAGE_LIMIT, base_feed, ingest_base_candles, candle_ring, candle_store
+)
+from utils.ledger import ledger
+from utils.startup import load_cached_markets
+from utils.tracing import traced, trace_client
+
+_async_client = None
+
+def get_async_client():
+    """
+    Shared async client, created on first use (must be called with an event loop running).
+    Wraps the simulator when one is swapped in utils.api.BinanceClient.
+    """
+    global _async_client
+    if _async_client is None and simulated_client() is not None:
+        from utils.simulator import AsyncSimulatedExchange
+        _async_client = trace_client(AsyncSimulatedExchange(simulated_client()))
+    if _async_client is None:
+        # imported here, ccxt.async_support is only needed by the async path
+        import ccxt.async_support as ccxt_async
+        client = ccxt_async.binanceusdm(exchange_config())
+        client.set_sandbox_mode(True)
+        load_cached_markets(client)
+        _async_client = trace_client(client)
+    return _async_client
+
+async def close_async_client():
+    """
+    Close the aiohttp session of the shared async client.
+    """
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+
+async def resampled_feed_async(client, symbol, timeframe, limit):
+    """
+    utils.api.resampled_feed on the async client.
+    """
+    now_ms = client.milliseconds()
+    feed, since = base_feed(symbol, timeframe, limit, now_ms)
+    while since is not None:
+        ohlcv = await client.fetch_ohlcv(symbol, timeframe=OHLCV_BASE_TIMEFRAME, since=since, limit=BASE_PAGE_LIMIT)
+        since = ingest_base_candles(symbol, feed, ohlcv)
+    feed['synced'] = now_ms
+    return feed['resampler']
+
+@traced('fetch_ohlcv_async')
+async def fetch_ohlcv_async(symbol='BTC/USDT', timeframe='1h', limit=50):
+    """
+    Same as utils.api.fetch_ohlcv on the async client (candle store delta sync and
+    OHLCV_BASE_TIMEFRAME resampling included).
+    """
+    client = get_async_client()
+    try:
+        if OHLCV_BASE_TIMEFRAME and timeframe != OHLCV_BASE_TIMEFRAME:
+            return (await resampled_feed_async(client, symbol, timeframe, limit)).to_frame(timeframe, limit)
+        since = ohlcv_since(symbol, timeframe, limit, client.milliseconds())
+        while True:
+            ohlcv = await client.fetch_ohlcv(symbol, timeframe=timeframe, since=since, limit=limit)
+            since = ingest_ohlcv(symbol, timeframe, ohlcv, since, limit)
+            if since is None:
+                return candle_store.to_frame(symbol, timeframe, limit=limit)
+    except ccxt.BaseError as e:
+        print(f"Error fetching OHLCV data for {symbol}: {e}")
+        return None
+
+@traced('fetch_candles_async')
+async def fetch_candles_async(symbol='BTC/USDT', timeframe='1h', limit=50):
+    """
+    utils.api.fetch_candles on the async client: the candles go to the CandleRing of symbol/timeframe.
+    """
+    client = get_async_client()
+    try:
+        ring = candle_ring(symbol, timeframe, limit)
+        if OHLCV_BASE_TIMEFRAME and timeframe != OHLCV_BASE_TIMEFRAME:
+            ring.update((await resampled_feed_async(client, symbol, timeframe, limit)).read(timeframe, limit))
+            return ring
+        since = ohlcv_since(symbol, timeframe, limit, client.milliseconds())
+        while True:
+            ohlcv = await client.fetch_ohlcv(symbol, timeframe=timeframe, since=since, limit=limit)
+            ring.update(ohlcv)
+            since = ingest_ohlcv(symbol, timeframe, ohlcv, since, limit)
+            if since is None:
+                return ring
+    except ccxt.BaseError as e:
+        print(f"Error fetching OHLCV data for {symbol}: {e}")
+        return None
+
+@traced('cancel_pending_orders_async')
+async def cancel_pending_orders_async(symbol):
+    """
+    Cancels all open orders for a given symbol: one cancel-all request when supported,
+    else the cancels are sent concurrently.
+    """
+    client = get_async_client()
+    try:
+        if client.has.get('cancelAllOrders'):
+            try:
+                await client.cancel_all_orders(symbol)
+                ledger.cancel_orders(symbol)
+                print(f"Canceled all open orders for {symbol}")
+                return
+            except ccxt.NotSupported:
+                pass
+        orders = await client.fetch_open_orders(symbol)
+        results = await asyncio.gather(
+            *(client.cancel_order(order['id'], symbol) for order in orders),
+            return_exceptions=True
+        )
+        for order, result in zip(orders, results):
+            if isinstance(result, ccxt.BaseError):
+                print(f"Error canceling order {order['id']} for {symbol}: {result}")
+                ledger.invalidate(symbol)
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                ledger.cancel_orders(symbol, [order['id']])
+                print(f"Canceled order: {order['id']}")
+    except ccxt.BaseError as e:
+        print(f"Error canceling orders for {symbol}: {e}")
+        ledger.invalidate(symbol)
+
+async def cancel_orphaned_orders_async(client, symbol, orders):
+    """
+    Same as utils.api.cancel_orphaned_orders, the cancels are sent concurrently.
+    """
+    order_ids = [order['id'] for order in orders if order.get('id')]
+    results = await asyncio.gather(*(client.cancel_order(order_id, symbol) for order_id in order_ids), return_exceptions=True)
+    for order_id, result in zip(order_ids, results):
+        if isinstance(result, ccxt.BaseError):
+            print(f"Error canceling order {order_id} for {symbol}: {result}")
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            print(f"Canceled order without entry: {order_id}")
+    ledger.cancel_orders(symbol, order_ids)
+    ledger.invalidate(symbol)
+
+async def _create_protective_order(client, symbol, order_type, side, amount, position_side, stop_price):
+    order = await client.create_order(
+        symbol=symbol,
+        type=order_type,
+        side=side,
+        amount=amount,
+        params={
+            "positionSide": position_side,
+            "stopPrice": stop_price,
+            "closePosition": True  # Close the entire position
+        }
+    )
+    print(f"{order_type} order placed at {stop_price}")
+    record_order(order)
+    return order
+
+@traced('place_market_order_async')
+async def place_market_order_async(symbol, side, amount, position_side, stop_loss_price=None, take_profit_price=None):
+    """
+    Same as utils.api.place_market_order, the stop-loss and take-profit orders are sent
+    concurrently once the market order is acknowledged.
+    """
+    client = get_async_client()
+    try:
+        order = await client.create_order(
+            symbol=symbol,
+            type='MARKET',
+            side=side,
+            amount=amount,
+            params={
+                "positionSide" : position_side,
+                # acknowledged with its fill (price, quantity) for the ledger
+                "newOrderRespType": "RESULT"
+            }
+        )
+        print(f"{side} {position_side} order placed for {symbol} (amount: {amount})")
+        record_order(order)
+
+        close_side = 'BUY' if position_side == 'SHORT' else 'SELL'
+        protective_orders = []
+        if stop_loss_price:
+            print(f"Placing STOP-LOSS order for {position_side} position: {close_side} {amount} {symbol} at {stop_loss_price}")
+            protective_orders.append(_create_protective_order(
+                client, symbol, 'STOP_MARKET', close_side, amount, position_side, stop_loss_price))
+        if take_profit_price:
+            print(f"Placing TAKE-PROFIT order for {position_side} position: {close_side} {amount} {symbol} at {take_profit_price}")
+            protective_orders.append(_create_protective_order(
+                client, symbol, 'TAKE_PROFIT_MARKET', close_side, amount, position_side, take_profit_price))
+        results = await asyncio.gather(*protective_orders, return_exceptions=True)
+        for result in results:
+            if isinstance(result, ccxt.BaseError):
+                print(f'Error placing protective order for {side} order: {result}')
+                ledger.invalidate(symbol)
+            elif isinstance(result, BaseException):
+                raise result
+        return order
+    except ccxt.BaseError as e:
+        print(f'Error placing {side} order: {e}')
+        ledger.invalidate(symbol)
+        return None
+
+@traced('place_bracket_order_async')
+async def place_bracket_order_async(symbol, side, amount, position_side, stop_loss_price=None, take_profit_price=None):
+    """
+    Same as utils.api.place_bracket_order on the async client, the fallback is
+    place_market_order_async (sl / tp concurrently after the entry), the protective orders
+    of a rejected entry are canceled concurrently.
+    """
+    client = get_async_client()
+    requests = bracket_order_requests(symbol, side, amount, position_side, stop_loss_price, take_profit_price)
+    if len(requests) > 1 and batch_orders_supported(client):
+        try:
+            orders = await client.create_orders(requests)
+        except ccxt.NotSupported as e:
+            # raised before anything is sent
+            print(f"Batch orders not supported ({e}), placing orders one by one")
+            disable_batch_orders()
+        except ccxt.BaseError as e:
+            print(f'Error placing {side} bracket order: {e}')
+            ledger.invalidate(symbol)
+            return None
+        else:
+            print(f"{side} {position_side} bracket order placed for {symbol} (amount: {amount}, sl: {stop_loss_price}, tp: {take_profit_price})")
+            entry_placed = bool(orders[0].get('id'))
+            retries = []
+            for i, (request, order) in enumerate(zip(requests, orders)):
+                if order.get('id'):
+                    record_order(order)
+                    continue
+                print(f"{request['type']} order rejected in batch: {order.get('info')}")
+                if i > 0 and entry_placed:
+                    retries.append(_create_protective_order(
+                        client, symbol, request['type'], request['side'], amount, position_side, request['params']['stopPrice']))
+            for result in await asyncio.gather(*retries, return_exceptions=True):
+                if isinstance(result, ccxt.BaseError):
+                    print(f'Error placing protective order for {side} order: {result}')
+                    ledger.invalidate(symbol)
+                elif isinstance(result, BaseException):
+                    raise result
+            if not entry_placed:
+                await cancel_orphaned_orders_async(client, symbol, orders[1:])
+            return orders
+    return await place_market_order_async(symbol, side, amount, position_side, stop_loss_price, take_profit_price)
@@ -0,0 +1,195 @@
+"""
+local columnar candle store
+
+one directory per (symbol, timeframe) and one append-only binary file per column
+(timestamp, open, high, low, close, volume). Columns are read back with numpy memmap
+so loading a full history costs no parsing and no download.
+"""
+import os
+import re
+import shutil
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+DTYPES = {
+    'timestamp': np.dtype(np.int64),  # candle open time in ms (UTC)
+    'open': np.dtype(np.float64),
+    'high': np.dtype(np.float64),
+    'low': np.dtype(np.float64),
+    'close': np.dtype(np.float64),
+    'volume': np.dtype(np.float64),
+}
+DEFAULT_ROOT = os.getenv(
+    'CANDLE_STORE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'candles')
+)
+
+_TIMEFRAME_UNITS_MS = {
+    's': 1000,
+    'm': 60 * 1000,
+    'h': 60 * 60 * 1000,
+    'd': 24 * 60 * 60 * 1000,
+    'w': 7 * 24 * 60 * 60 * 1000,
+    'M': 30 * 24 * 60 * 60 * 1000,
+}
+
+def timeframe_to_ms(timeframe):
+    """
+    Convert a ccxt style timeframe ('1m', '1h', '1d', ...) to milliseconds.
+    """
+    match = re.fullmatch(r'(\d+)([smhdwM])', timeframe)
+    if match is None:
+        raise ValueError(f"Invalid timeframe: {timeframe}")
+    return int(match.group(1)) * _TIMEFRAME_UNITS_MS[match.group(2)]
+
+class CandleStore:
+    """
+    candle store keyed by symbol and timeframe
+    """
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = root
+
+    def _key_dir(self, symbol, timeframe):
+        # 'BTC/USDT:USDT' -> 'BTC_USDT_USDT', 'BTC-USD' stays as is
+        return os.path.join(self.root, re.sub(r'[^A-Za-z0-9_-]', '_', symbol), timeframe)
+
+    def _column_path(self, symbol, timeframe, column):
+        return os.path.join(self._key_dir(symbol, timeframe), column + '.bin')
+
+    def count(self, symbol, timeframe):
+        """
+        Number of complete candles stored (a column cut short by a crash is ignored).
+        """
+        sizes = []
+        for column in COLUMNS:
+            path = self._column_path(symbol, timeframe, column)
+            if not os.path.isfile(path):
+                return 0
+            sizes.append(os.path.getsize(path) // DTYPES[column].itemsize)
+        return min(sizes)
+
+    def _column(self, symbol, timeframe, column, n):
+        if n == 0:
+            return np.empty(0, dtype=DTYPES[column])
+        return np.memmap(self._column_path(symbol, timeframe, column), dtype=DTYPES[column], mode='r', shape=(n,))
+
+    def _timestamp_at(self, symbol, timeframe, index):
+        with open(self._column_path(symbol, timeframe, 'timestamp'), 'rb') as f:
+            f.seek(index * DTYPES['timestamp'].itemsize)
+            return int(np.frombuffer(f.read(DTYPES['timestamp'].itemsize), dtype=DTYPES['timestamp'])[0])
+
+    def first_timestamp(self, symbol, timeframe):
+        """
+        Open time (ms) of the oldest stored candle, None if nothing is stored.
+        """
+        if self.count(symbol, timeframe) == 0:
+            return None
+        return self._timestamp_at(symbol, timeframe, 0)
+
+    def last_timestamp(self, symbol, timeframe):
+        """
+        Open time (ms) of the newest stored candle, None if nothing is stored.
+        """
+        n = self.count(symbol, timeframe)
+        if n == 0:
+            return None
+        return self._timestamp_at(symbol, timeframe, n - 1)
+
+    def read(self, symbol, timeframe, start=None, end=None, limit=None):
+        """
+        Return a dict of column -> numpy array (memory-mapped, read-only).
+        start: first open time to include (ms), end: open time to stop before (ms)
+        limit: keep only the last `limit` candles of the selected range
+        """
+        n = self.count(symbol, timeframe)
+        timestamps = self._column(symbol, timeframe, 'timestamp', n)
+        lo = int(np.searchsorted(timestamps, start, side='left')) if start is not None else 0
+        hi = int(np.searchsorted(timestamps, end, side='left')) if end is not None else n
+        if limit is not None:
+            lo = max(lo, hi - limit)
+        return {column: self._column(symbol, timeframe, column, n)[lo:hi] for column in COLUMNS}
+
+    def to_frame(self, symbol, timeframe, start=None, end=None, limit=None):
+        """
+        Same as read() but as a DataFrame with columns: [timestamp, open, high, low, close, volume].
+        timestamp is converted to datetime like utils.api.fetch_ohlcv does.
+        """
+        columns = self.read(symbol, timeframe, start=start, end=end, limit=limit)
+        df = pd.DataFrame({column: np.array(values) for column, values in columns.items()})
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+        return df
+
+    def write(self, symbol, timeframe, rows):
+        """
+        Insert or update candles.
+        rows: ccxt style list of [timestamp, open, high, low, close, volume] or a dict of columns.
+        Stored candles with the same timestamp are overwritten (the last candle of a previous
+        sync may still have been open). Candles newer than the stored ones are a plain append.
+        Returns the number of candles stored afterwards.
+        """
+        new = as_columns(rows)
+        n = self.count(symbol, timeframe)
+        if len(new['timestamp']) == 0:
+            return n
+        os.makedirs(self._key_dir(symbol, timeframe), exist_ok=True)
+
+        timestamps = self._column(symbol, timeframe, 'timestamp', n)
+        cut = int(np.searchsorted(timestamps, new['timestamp'][0], side='left'))
+        if cut < n:
+            # overlap with stored candles: merge the stored tail with the new rows, new ones win
+            tail = {column: np.array(self._column(symbol, timeframe, column, n)[cut:]) for column in COLUMNS}
+            new = _dedup({column: np.concatenate([tail[column], new[column]]) for column in COLUMNS})
+        del timestamps
+
+        for column in COLUMNS:
+            path = self._column_path(symbol, timeframe, column)
+            with open(path, 'ab') as f:
+                # also drops a partial write left by a crash
+                f.truncate(cut * DTYPES[column].itemsize)
+                f.write(np.ascontiguousarray(new[column], dtype=DTYPES[column]).tobytes())
+        return cut + len(new['timestamp'])
+
+    def replace(self, symbol, timeframe, source):
+        """
+        Replace the candles of symbol / timeframe with the ones of another CandleStore on the
+        same filesystem (directory renames, no copy, never a mix of old and new columns).
+        """
+        target = self._key_dir(symbol, timeframe)
+        previous = target + '.old'
+        shutil.rmtree(previous, ignore_errors=True)
+        if os.path.isdir(target):
+            os.replace(target, previous)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(source._key_dir(symbol, timeframe), target)
+        shutil.rmtree(previous, ignore_errors=True)
+
+    def clear(self, symbol, timeframe):
+        """
+        Remove all stored candles for symbol and timeframe.
+        """
+        for column in COLUMNS:
+            path = self._column_path(symbol, timeframe, column)
+            if os.path.isfile(path):
+                os.remove(path)
+
+def _dedup(columns):
+    # sort by timestamp, keep the last occurrence of each timestamp
+    if len(columns['timestamp']) == 0:
+        return columns
+    order = np.argsort(columns['timestamp'], kind='stable')
+    timestamps = columns['timestamp'][order]
+    keep = np.append(timestamps[1:] != timestamps[:-1], True)
+    return {column: values[order][keep] for column, values in columns.items()}
+
+def as_columns(rows):
+    """
+    Sorted, deduplicated dict of column -> numpy array from ccxt style rows or a dict of columns.
+    """
+    if isinstance(rows, dict):
+        columns = {column: np.asarray(rows[column], dtype=DTYPES[column]) for column in COLUMNS}
+    else:
+        array = np.asarray(rows, dtype=np.float64).reshape(-1, len(COLUMNS))
+        columns = {column: array[:, i].astype(DTYPES[column]) for i, column in enumerate(COLUMNS)}
+    return _dedup(columns)
@@ -0,0 +1,368 @@
+"""
+streaming indicators
+
+SMA, EMA and RSI updated in O(1) per candle from a small running state instead of
+recomputing the whole series. The arithmetic mirrors pandas rolling().mean(),
+pandas ewm(adjust=False).mean() and vbt.RSI so the values match them bit for bit
+when fed the same closes (checked by tests/test_indicators.py). SignalEngine combines
+them into the same BUY/SELL decision as utils.signals.generate_signals and can be saved
+to / loaded from json.
+"""
+import copy
+import json
+import math
+import os
+from collections import deque
+
+NAN = float('nan')
+
+class SMA:
+    """
+    simple moving average, same algorithm as pandas rolling(window).mean()
+    (Kahan compensated running sum, separate compensation for added and removed values)
+    """
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.nobs = 0
+        self.neg_ct = 0
+        self.sum_x = 0.0
+        self.compensation_add = 0.0
+        self.compensation_remove = 0.0
+        self.num_consecutive_same_value = 0
+        self.prev_value = None
+        self.value = NAN
+
+    def update(self, val):
+        """
+        Add a new value and return the moving average.
+        """
+        if self.prev_value is None:
+            self.prev_value = val
+        self.values.append(val)
+        if len(self.values) > self.window:
+            self._remove(self.values.popleft())
+        self._add(val)
+        self.value = self._mean()
+        return self.value
+
+    def _add(self, val):
+        if val != val:
+            return
+        self.nobs += 1
+        y = val - self.compensation_add
+        t = self.sum_x + y
+        self.compensation_add = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1.0, val) < 0:
+            self.neg_ct += 1
+        # pandas counts repeated values to return them as is (no float artifacts)
+        if val == self.prev_value:
+            self.num_consecutive_same_value += 1
+        else:
+            self.num_consecutive_same_value = 1
+        self.prev_value = val
+
+    def _remove(self, val):
+        if val != val:
+            return
+        self.nobs -= 1
+        y = -val - self.compensation_remove
+        t = self.sum_x + y
+        self.compensation_remove = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1.0, val) < 0:
+            self.neg_ct -= 1
+
+    def _mean(self):
+        if self.nobs < self.window or self.nobs == 0:
+            return NAN
+        result = self.sum_x / self.nobs
+        if self.num_consecutive_same_value >= self.nobs:
+            result = self.prev_value
+        elif self.neg_ct == 0 and result < 0:
+            result = 0.0
+        elif self.neg_ct == self.nobs and result > 0:
+            result = 0.0
+        return result
+
+    def to_dict(self):
+        """
+        Serializable state.
+        """
+        state = dict(self.__dict__)
+        state['values'] = list(self.values)
+        return state
+
+    @classmethod
+    def from_dict(cls, state):
+        """
+        Rebuild from to_dict() output.
+        """
+        indicator = cls(state['window'])
+        indicator.__dict__.update(state)
+        indicator.values = deque(state['values'])
+        return indicator
+
+class EMA:
+    """
+    exponential moving average, same algorithm as pandas ewm(span=window, adjust=False).mean()
+    """
+    def __init__(self, window):
+        self.window = window
+        com = (window - 1) / 2.0
+        self.alpha = 1.0 / (1.0 + com)
+        self.value = NAN
+
+    def update(self, val):
+        """
+        Add a new value and return the moving average.
+        """
+        if self.value != self.value:
+            self.value = val
+        elif val == val and self.value != val:
+            old_wt = 1.0 - self.alpha
+            self.value = (old_wt * self.value + self.alpha * val) / (old_wt + self.alpha)
+        return self.value
+
+    def to_dict(self):
+        """
+        Serializable state.
+        """
+        return {'window': self.window, 'value': self.value}
+
+    @classmethod
+    def from_dict(cls, state):
+        """
+        Rebuild from to_dict() output.
+        """
+        indicator = cls(state['window'])
+        indicator.value = state['value']
+        return indicator
+
+class RSI:
+    """
+    relative strength index
+    smoothing='sma': same as vbt.RSI.run(close, window) (simple rolling mean of gains and losses,
+    computed the way vectorbt does it: running cumsum minus the cumsum `window` values back)
+    smoothing='wilder': Wilder's smoothing, seeded with the simple mean of the first window
+    """
+    def __init__(self, window, smoothing='sma'):
+        if smoothing not in ('sma', 'wilder'):
+            raise ValueError("Invalid smoothing: must be 'sma' or 'wilder'")
+        self.window = window
+        self.smoothing = smoothing
+        self.prev_close = None
+        self.count = 0
+        # sma state: running cumsums of gains/losses and the last `window` of them
+        self.cumsum_up = 0.0
+        self.cumsum_down = 0.0
+        self.history = deque()
+        # wilder state
+        self.avg_up = NAN
+        self.avg_down = NAN
+        self.value = NAN
+
+    def update(self, close):
+        """
+        Add a new close and return the RSI.
+        """
+        if self.prev_close is None:
+            self.prev_close = close
+            self.count = 1
+            self.history.append((0.0, 0.0))
+            return self.value
+        delta = close - self.prev_close
+        self.prev_close = close
+        up = 0.0 if delta < 0 else delta
+        down = abs(0.0 if delta > 0 else delta)
+        self.count += 1
+        if self.smoothing == 'sma':
+            self.cumsum_up = self.cumsum_up + up
+            self.cumsum_down = self.cumsum_down + down
+            self.history.append((self.cumsum_up, self.cumsum_down))
+            if len(self.history) > self.window + 1:
+                self.history.popleft()
+            if self.count <= self.window:
+                return self.value
+            # the first close has no delta, so the first full window ends at index `window`
+            first_up, first_down = self.history[0]
+            roll_up = (self.cumsum_up - first_up) / self.window
+            roll_down = (self.cumsum_down - first_down) / self.window
+        else:
+            self.cumsum_up += up
+            self.cumsum_down += down
+            if self.count <= self.window:
+                return self.value
+            if self.count == self.window + 1:
+                self.avg_up = self.cumsum_up / self.window
+                self.avg_down = self.cumsum_down / self.window
+            else:
+                self.avg_up = (self.avg_up * (self.window - 1) + up) / self.window
+                self.avg_down = (self.avg_down * (self.window - 1) + down) / self.window
+            roll_up, roll_down = self.avg_up, self.avg_down
+        self.value = 100 - 100 / (1 + _divide(roll_up, roll_down))
+        return self.value
+
+    def to_dict(self):
+        """
+        Serializable state.
+        """
+        state = dict(self.__dict__)
+        state['history'] = [list(item) for item in self.history]
+        return state
+
+    @classmethod
+    def from_dict(cls, state):
+        """
+        Rebuild from to_dict() output.
+        """
+        indicator = cls(state['window'], state['smoothing'])
+        indicator.__dict__.update(state)
+        indicator.history = deque(tuple(item) for item in state['history'])
+        return indicator
+
+def _divide(a, b):
+    # numpy semantics: x/0 -> inf, 0/0 -> nan
+    if b == 0:
+        if a == 0 or a != a:
+            return NAN
+        return math.copysign(math.inf, a)
+    return a / b
+
+def _moving_average(ma_type, window):
+    if ma_type == 'EMA':
+        return EMA(window)
+    return SMA(window)
+
+def _moving_average_from_dict(ma_type, state):
+    if ma_type == 'EMA':
+        return EMA.from_dict(state)
+    return SMA.from_dict(state)
+
+class SignalEngine:
+    """
+    stateful MA crossover + RSI filter strategy
+    update() is called once per candle (or again with the same timestamp while the candle is still open)
+    and returns 'BUY', 'SELL' or None like utils.signals.generate_signals
+    """
+    def __init__(self, short_window=8, long_window=14, rsi_window=14, rsi_buy_threshold=35,
+                 rsi_sell_threshold=60, short_type='SMA', long_type='SMA', rsi_smoothing='sma'):
+        self.params = {
+            'short_window': short_window,
+            'long_window': long_window,
+            'rsi_window': rsi_window,
+            'rsi_buy_threshold': rsi_buy_threshold,
+            'rsi_sell_threshold': rsi_sell_threshold,
+            'short_type': short_type,
+            'long_type': long_type,
+            'rsi_smoothing': rsi_smoothing,
+        }
+        self.reset()
+
+    def reset(self):
+        """
+        Drop all indicator state (a warm-up is needed again).
+        """
+        short_type, long_type = self.params['short_type'], self.params['long_type']
+        self.ma_short = _moving_average(short_type, self.params['short_window'])
+        self.ma_long = _moving_average(long_type, self.params['long_window'])
+        self.rsi = RSI(self.params['rsi_window'], self.params['rsi_smoothing'])
+        self.last_timestamp = None
+        self.prev_short = NAN
+        self.prev_long = NAN
+        self.signal = None
+        # state before the last candle, to re-apply it when the open candle is updated
+        self._previous = None
+
+    def update(self, timestamp, close):
+        """
+        Feed one candle close. timestamp: candle open time (any comparable value, ms int for the live bot)
+        Returns 'BUY', 'SELL' or None for the latest candle.
+        """
+        if self.last_timestamp is not None and timestamp < self.last_timestamp:
+            return self.signal
+        if timestamp == self.last_timestamp and self._previous is not None:
+            self._restore(self._previous)
+        else:
+            self._previous = self._snapshot()
+        self.prev_short, self.prev_long = self.ma_short.value, self.ma_long.value
+        latest_short = self.ma_short.update(close)
+        latest_long = self.ma_long.update(close)
+        latest_rsi = self.rsi.update(close)
+        self.last_timestamp = timestamp
+        self.signal = self._decide(latest_short, latest_long, latest_rsi)
+        return self.signal
+
+    def _decide(self, latest_short, latest_long, latest_rsi):
+        if latest_short != latest_short or latest_long != latest_long or latest_rsi != latest_rsi:
+            return None
+        buy_condition = (self.prev_short < self.prev_long) and (latest_short > latest_long)
+        sell_condition = (self.prev_short > self.prev_long) and (latest_short < latest_long)
+        if buy_condition and latest_rsi < self.params['rsi_buy_threshold']:
+            return 'BUY'
+        if sell_condition and latest_rsi > self.params['rsi_sell_threshold']:
+            return 'SELL'
+        return None
+
+    def _snapshot(self):
+        return {
+            'ma_short': self.ma_short.to_dict(),
+            'ma_long': self.ma_long.to_dict(),
+            'rsi': self.rsi.to_dict(),
+            'last_timestamp': self.last_timestamp,
+            'prev_short': self.prev_short,
+            'prev_long': self.prev_long,
+            'signal': self.signal,
+        }
+
+    def _restore(self, state):
+        state = copy.deepcopy(state)
+        self.ma_short = _moving_average_from_dict(self.params['short_type'], state['ma_short'])
+        self.ma_long = _moving_average_from_dict(self.params['long_type'], state['ma_long'])
+        self.rsi = RSI.from_dict(state['rsi'])
+        self.last_timestamp = state['last_timestamp']
+        self.prev_short = state['prev_short']
+        self.prev_long = state['prev_long']
+        self.signal = state['signal']
+
+    def to_dict(self):
+        """
+        Serializable state (json compatible).
+        """
+        return {'params': self.params, 'state': self._snapshot(), 'previous': self._previous}
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Rebuild from to_dict() output.
+        """
+        engine = cls(**data['params'])
+        engine._restore(data['state'])
+        engine._previous = data['previous']
+        return engine
+
+    def save(self, path):
+        """
+        Write the engine state to a json file (atomic replace).
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, **params):
+        """
+        Load the engine saved at path. A new engine is returned when there is no file
+        or when it was saved with different strategy parameters.
+        """
+        engine = cls(**params)
+        if not os.path.isfile(path):
+            return engine
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data['params'] != engine.params:
+            return engine
+        return cls.from_dict(data)
@@ -0,0 +1,212 @@
+"""
+buffered order / event journal
+
+record() only puts the event on an in-memory queue, a background thread writes the
+queued events in batches to an append-only JSONL file (one json object per line).
+The file is rotated by size (journal.jsonl -> journal.jsonl.1 -> ...) and fsynced
+according to the `fsync` policy:
+  - 'batch': after every written batch (default)
+  - 'interval': at most every `fsync_interval` seconds, and once the queue is idle or closed
+  - 'never': leave it to the OS
+A failed write (full disk, permissions, ...) is logged and retried with the next batch, the
+batch is dropped after `write_retries` failures (counted in `dropped`): the writer thread
+never dies and flush() never waits for it forever.
+read_journal() loads the whole history (rotated files included) into a DataFrame.
+"""
+import atexit
+import io
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+_STOP = object()
+
+class EventJournal:
+    """
+    non-blocking JSONL journal with a background writer thread
+    """
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, backup_count=5, fsync='batch',
+                 fsync_interval=1.0, flush_interval=0.2, batch_size=256, write_retries=3):
+        if fsync not in ('batch', 'interval', 'never'):
+            raise ValueError("Invalid fsync: must be 'batch', 'interval' or 'never'")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.write_retries = write_retries
+        self.queue = queue.SimpleQueue()
+        self.thread = None
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._last_fsync = 0.0
+        # written since the last fsync ('interval')
+        self._unsynced = False
+
+    def record(self, event, **fields):
+        """
+        Queue one event, returns immediately.
+        """
+        self._start()
+        self.queue.put({'event': event, 'time_ms': int(time.time() * 1000), **fields})
+
+    def flush(self, timeout=None):
+        """
+        Block until everything queued so far is written (or its write failed).
+        Returns False on timeout or when the writer thread is gone.
+        """
+        thread = self.thread
+        if thread is None:
+            return True
+        done = threading.Event()
+        self.queue.put(done)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.flush_interval if deadline is None else min(self.flush_interval, deadline - time.monotonic())
+            if done.wait(max(wait, 0.0)):
+                return True
+            if not thread.is_alive() or (deadline is not None and time.monotonic() >= deadline):
+                return False
+
+    def close(self):
+        """
+        Write the pending events and stop the writer thread.
+        """
+        with self._lock:
+            if self.thread is None:
+                return
+            self.queue.put(_STOP)
+            self.thread.join()
+            self.thread = None
+
+    def _start(self):
+        if self.thread is not None:
+            return
+        with self._lock:
+            if self.thread is None:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                self.thread = threading.Thread(target=self._run, name='event-journal', daemon=True)
+                self.thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        stop = False
+        pending, failures = [], 0
+        while not stop:
+            batch, waiters = [], []
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+            while item is not None:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if stop or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            pending.extend(batch)
+            if pending:
+                try:
+                    self._write(pending)
+                    pending, failures = [], 0
+                except Exception:
+                    failures += 1
+                    logging.exception("event journal %s: write failed (%s/%s)", self.path, failures, self.write_retries)
+                    if failures >= self.write_retries:
+                        print(f"Event journal {self.path}: dropping {len(pending)} events after {failures} failed writes")
+                        self.dropped += len(pending)
+                        pending, failures = [], 0
+            if self._unsynced and (stop or not batch):
+                # idle or closing: the last batch written without fsync ('interval') is synced now
+                try:
+                    self._sync()
+                except OSError:
+                    logging.exception("event journal %s: fsync failed", self.path)
+                    self._unsynced = False
+            for waiter in waiters:
+                waiter.set()
+
+    def _write(self, batch):
+        data = ''.join(json.dumps(event, default=str) + '\n' for event in batch).encode('utf-8')
+        try:
+            size = os.path.getsize(self.path)
+            if size > 0 and size + len(data) > self.max_bytes:
+                self._rotate()
+        except FileNotFoundError:
+            pass
+        except OSError:
+            # the events still go to the current file
+            logging.exception("event journal %s: rotation failed", self.path)
+        with open(self.path, 'ab') as f:
+            f.write(data)
+            f.flush()
+            # written: a failed fsync must not write the batch twice
+            self._unsynced = self.fsync != 'never'
+            if self.fsync == 'batch' or (self.fsync == 'interval' and time.monotonic() - self._last_fsync >= self.fsync_interval):
+                try:
+                    self._sync(f)
+                except OSError:
+                    logging.exception("event journal %s: fsync failed", self.path)
+
+    def _sync(self, f=None):
+        if f is None:
+            with open(self.path, 'ab') as f:
+                os.fsync(f.fileno())
+        else:
+            os.fsync(f.fileno())
+        self._last_fsync = time.monotonic()
+        self._unsynced = False
+
+    def _rotate(self):
+        for i in range(self.backup_count - 1, 0, -1):
+            if os.path.isfile(f'{self.path}.{i}'):
+                os.replace(f'{self.path}.{i}', f'{self.path}.{i + 1}')
+        if self.backup_count > 0:
+            os.replace(self.path, f'{self.path}.1')
+        else:
+            os.remove(self.path)
+
+def journal_files(path):
+    """
+    Journal files of path, oldest first (rotated backups then the live file).
+    """
+    backups = []
+    i = 1
+    while os.path.isfile(f'{path}.{i}'):
+        backups.append(f'{path}.{i}')
+        i += 1
+    files = backups[::-1]
+    if os.path.isfile(path):
+        files.append(path)
+    return files
+
+def read_journal(path, event=None):
+    """
+    Load the whole journal history into a DataFrame (one column per field).
+    event: keep only the events of this type ('order', ...)
+    """
+    # only the reader needs pandas, the writer stays import-light
+    import pandas as pd
+    chunks = []
+    for file_path in journal_files(path):
+        with open(file_path, 'rb') as f:
+            chunks.append(f.read().decode('utf-8'))
+    text = ''.join(chunks)
+    if not text.strip():
+        return pd.DataFrame()
+    df = pd.read_json(io.StringIO(text), lines=True, dtype=False)
+    if event is not None and 'event' in df:
+        df = df[df['event'] == event].reset_index(drop=True)
+    return df
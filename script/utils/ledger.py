@@ -0,0 +1,289 @@
+"""
+local ledger of balances, positions and open orders
+
+handle_signal sizes and closes positions from this in-memory state instead of a full
+fetch_balance + fetch_positions (every symbol) per signal:
+  - order acknowledgements update it (utils.api.record_order): market fills move the position,
+    the margin and the realized pnl, protective orders are kept as open orders
+  - cancels remove the open orders
+  - every cycle the candles are checked against the resting stop-loss / take-profit prices,
+    a touched one may have filled on the exchange: the symbol is marked stale
+  - a stale symbol (touched trigger, order error, fill without price or leverage) and every
+    `reconcile_interval` seconds, balance and positions are reloaded from the exchange and
+    the drift from the local state is printed
+The reloads are meant to happen off the signal path: daemon.py reconciles ahead of every
+candle boundary when the interval would run out by the cycle, a one-shot main.py while it
+fetches the candles. Unrealized pnl is only refreshed by the reconciles.
+"""
+import asyncio
+import os
+import threading
+import time
+
+from utils.ring_buffer import candle_column
+
+# seconds between two reconciles with the exchange
+RECONCILE_INTERVAL = float(os.getenv('LEDGER_RECONCILE_SECONDS', '300'))
+# fee rate charged on fills whose acknowledgement carries no fee (Binance USD-M taker)
+TAKER_FEE = float(os.getenv('LEDGER_TAKER_FEE', '0.0004'))
+# contracts / quote differences below this are not reported as drift
+DRIFT_TOLERANCE = 1e-8
+
+def market(symbol):
+    """
+    'BTC/USDT' for 'BTC/USDT' and 'BTC/USDT:USDT' (the unified symbol of the perpetual).
+    """
+    return symbol.split(':')[0]
+
+def position_side(order):
+    """
+    'LONG' / 'SHORT' of a ccxt order (hedge mode), None when unknown.
+    """
+    side = (order.get('info') or {}).get('positionSide')
+    return side.upper() if side else None
+
+def trigger_direction(order_type, side):
+    """
+    'down' when a trigger order fires at or below its stop price, 'up' at or above.
+    """
+    stop = order_type.upper() in ('STOP_MARKET', 'STOP')
+    return 'down' if stop == (side.upper() == 'SELL') else 'up'
+
+class Ledger:
+    """
+    balances, positions and open orders mirrored from order acknowledgements
+    """
+    def __init__(self, quote='USDT', reconcile_interval=RECONCILE_INTERVAL, taker_fee=TAKER_FEE, clock=time.monotonic):
+        self.quote = quote
+        self.taker_fee = taker_fee
+        self.reconcile_interval = reconcile_interval
+        self.clock = clock
+        self.balance = None
+        # (market, 'LONG' | 'SHORT') -> {'contracts', 'entry_price', 'leverage'}
+        self.positions = {}
+        self.open_orders = {}
+        self.synced_at = None
+        self.stale = set()
+        self.reconciles = 0
+        self._lock = threading.RLock()
+        # one reconcile at a time, a caller arriving meanwhile uses its result
+        self._reconcile_lock = threading.Lock()
+
+    def needs_reconcile(self, symbol=None, within=0):
+        """
+        Whether the state must be reloaded before a decision on symbol (on any symbol when None).
+        within: seconds, also True when the reconcile interval runs out before then (a reconcile
+        ahead of the next decision).
+        """
+        with self._lock:
+            if self.synced_at is None or self.clock() + within - self.synced_at >= self.reconcile_interval:
+                return True
+            if symbol is None:
+                return bool(self.stale)
+            return '*' in self.stale or market(symbol) in self.stale
+
+    def invalidate(self, symbol=None):
+        """
+        Mark symbol (everything when None) stale: reloaded before the next decision.
+        """
+        with self._lock:
+            self.stale.add(market(symbol) if symbol else '*')
+
+    def load(self, balance, positions):
+        """
+        Replace the state with a ccxt fetch_balance() / fetch_positions() result.
+        Prints the drift of the local state when it was already synced.
+        """
+        with self._lock:
+            loaded = {}
+            for pos in positions:
+                side = (pos.get('side') or '').upper()
+                if side not in ('LONG', 'SHORT'):
+                    continue
+                loaded[(market(pos['symbol']), side)] = {
+                    'contracts': float(pos['contracts']) if pos['contracts'] else 0.0,
+                    'entry_price': float(pos['entryPrice']) if pos.get('entryPrice') else 0.0,
+                    'leverage': float(pos['leverage']) if pos.get('leverage') else None,
+                }
+            quote = balance.get(self.quote) or {}
+            loaded_balance = {key: float(quote.get(key) or 0.0) for key in ('free', 'used', 'total')}
+            if self.synced_at is not None:
+                for key in set(self.positions) | set(loaded):
+                    before = self.positions.get(key, {}).get('contracts', 0.0)
+                    after = loaded.get(key, {}).get('contracts', 0.0)
+                    if abs(before - after) > DRIFT_TOLERANCE:
+                        print(f"Ledger drift on {key[0]} {key[1]}: {before} -> {after} contracts")
+                if self.balance is not None and abs(self.balance['free'] - loaded_balance['free']) > DRIFT_TOLERANCE:
+                    print(f"Ledger drift on free {self.quote}: {self.balance['free']:.2f} -> {loaded_balance['free']:.2f}")
+            self.positions = loaded
+            self.balance = loaded_balance
+            self._expire_flat_orders()
+            self.stale.clear()
+            self.synced_at = self.clock()
+            self.reconciles += 1
+
+    def reconcile(self, client):
+        """
+        Reload balance and positions from the exchange.
+        """
+        self.load(client.fetch_balance(), client.fetch_positions())
+
+    async def reconcile_async(self, client):
+        """
+        reconcile() on an async client, both requests concurrently.
+        """
+        balance, positions = await asyncio.gather(client.fetch_balance(), client.fetch_positions())
+        self.load(balance, positions)
+
+    def ensure_fresh(self, client, symbol=None):
+        """
+        Reconcile when needed for symbol, returns whether the exchange was asked.
+        """
+        if not self.needs_reconcile(symbol):
+            return False
+        with self._reconcile_lock:
+            # reloaded meanwhile by a reconcile of another thread (e.g. main's startup prefetch)
+            if not self.needs_reconcile(symbol):
+                return False
+            self.reconcile(client)
+            return True
+
+    async def ensure_fresh_async(self, client, symbol=None):
+        """
+        ensure_fresh() on an async client.
+        """
+        if self.needs_reconcile(symbol):
+            await self.reconcile_async(client)
+            return True
+        return False
+
+    def free(self, currency=None):
+        """
+        Free balance of currency (the quote currency by default).
+        """
+        with self._lock:
+            if currency not in (None, self.quote) or self.balance is None:
+                return None
+            return self.balance['free']
+
+    def position_quantities(self, symbol):
+        """
+        Current LONG and SHORT contracts on symbol (same as utils.api.position_quantities).
+        """
+        with self._lock:
+            key = market(symbol)
+            return tuple(self.positions.get((key, side), {}).get('contracts', 0.0) for side in ('LONG', 'SHORT'))
+
+    def apply_order(self, order):
+        """
+        Apply an acknowledged ccxt order: a filled market order moves the position,
+        an open trigger order is kept until cancelled or touched.
+        """
+        if not order or not order.get('id'):
+            return
+        symbol = order.get('symbol') or ''
+        side = position_side(order)
+        order_type = (order.get('type') or '').upper()
+        if order_type != 'MARKET':
+            if order.get('status') == 'open':
+                with self._lock:
+                    self.open_orders[order['id']] = order
+            return
+        price = order.get('average') or order.get('price')
+        if not order.get('filled') or not price or side is None:
+            # acknowledged without its fill (or unknown side), only the exchange knows
+            self.invalidate(symbol)
+            return
+        fee = (order.get('fee') or {}).get('cost')
+        if fee is None:
+            fee = float(order['filled']) * float(price) * self.taker_fee
+        self.fill(symbol, order['side'], side, float(order['filled']), float(price), float(fee))
+
+    def fill(self, symbol, side, position_side, amount, price, fee=0.0):
+        """
+        Apply a fill of amount at price to the position_side position of symbol.
+        side BUY on LONG / SELL on SHORT opens, the opposite closes.
+        """
+        with self._lock:
+            key = (market(symbol), position_side)
+            position = self.positions.setdefault(key, {'contracts': 0.0, 'entry_price': 0.0, 'leverage': None})
+            leverage = position['leverage']
+            opening = (side.upper() == 'BUY') == (position_side == 'LONG')
+            if opening:
+                contracts = position['contracts'] + amount
+                position['entry_price'] = (position['entry_price'] * position['contracts'] + price * amount) / contracts
+                position['contracts'] = contracts
+                margin, pnl = (price * amount / leverage if leverage else 0.0), 0.0
+            else:
+                amount = min(amount, position['contracts'])
+                direction = 1 if position_side == 'LONG' else -1
+                pnl = (price - position['entry_price']) * amount * direction
+                margin = -(position['entry_price'] * amount / leverage if leverage else 0.0)
+                position['contracts'] -= amount
+                if position['contracts'] <= 1e-12:
+                    position['contracts'] = 0.0
+                    position['entry_price'] = 0.0
+                    self._expire_flat_orders()
+            if self.balance is not None:
+                self.balance['free'] += pnl - fee - margin
+                self.balance['used'] += margin
+                self.balance['total'] += pnl - fee
+            if not leverage:
+                # margin unknown without the leverage of the position
+                self.stale.add(key[0])
+
+    def _expire_flat_orders(self):
+        # closePosition orders of a flat position are expired by the exchange
+        for order_id, order in list(self.open_orders.items()):
+            key = (market(order.get('symbol') or ''), position_side(order))
+            if (order.get('info') or {}).get('closePosition') and not self.positions.get(key, {}).get('contracts'):
+                del self.open_orders[order_id]
+
+    def cancel_orders(self, symbol, order_ids=None):
+        """
+        Forget the open orders of symbol (only order_ids when given).
+        """
+        with self._lock:
+            key = market(symbol)
+            for order_id, order in list(self.open_orders.items()):
+                if market(order.get('symbol') or '') == key and (order_ids is None or order_id in order_ids):
+                    del self.open_orders[order_id]
+
+    def observe_candles(self, symbol, df):
+        """
+        Check the resting trigger orders of symbol against the candles placed after them
+        (the candle they were placed in included), symbol is marked stale when one was touched.
+        df: DataFrame of fetch_ohlcv (timestamp, open, high, low, close, volume) or CandleRing of fetch_candles.
+        Returns whether a trigger was touched.
+        """
+        with self._lock:
+            key = market(symbol)
+            resting = [o for o in self.open_orders.values() if market(o.get('symbol') or '') == key]
+            if not resting or df is None or df.empty:
+                return False
+            timestamps = candle_column(df, 'timestamp')
+            lows, highs = candle_column(df, 'low'), candle_column(df, 'high')
+            touched_any = False
+            step = int(timestamps[-1] - timestamps[-2]) if len(timestamps) > 1 else 0
+            for order in resting:
+                stop = order.get('stopPrice') or order.get('triggerPrice')
+                if stop is None:
+                    continue
+                # first candle closing after the order was placed
+                since = int(timestamps.searchsorted((order.get('timestamp') or 0) - step, side='right')) if step else 0
+                if since >= len(df):
+                    continue
+                if trigger_direction(order.get('type') or '', order.get('side') or '') == 'down':
+                    touched = lows[since:].min() <= stop
+                else:
+                    touched = highs[since:].max() >= stop
+                if touched:
+                    print(f"{order.get('type')} {order['id']} on {symbol} touched at {stop}, ledger will reconcile")
+                    # filled (or expired) on the exchange, the reconcile tells the resulting position
+                    del self.open_orders[order['id']]
+                    self.stale.add(key)
+                    touched_any = True
+            return touched_any
+
+# process wide ledger, used by utils.api / utils.async_api and main.handle_signal
+ledger = Ledger()
@@ -3,10 +3,11 @@ logging script
 """
 import logging
 
-import csv
 import os
 from datetime import datetime
 
+from utils.journal import EventJournal
+
 
 CUR_ENV = os.getenv('BOT_ENV', 'dev')
 
@@ -24,42 +25,59 @@ def setup_logger():
             format='%(asctime)s - %(message)s'
         )
 
-def log_order(order, log_filename="orders_log.csv"):
+def journal_path():
     """
-    Logs order information to a CSV file.
-    :param order: A dictionary returned by ccxt.create_order().
-    :param log_filename: The CSV file to store the logs.
+    Path of the order / event journal for the current environment.
     """
-    # Define the columns you want to record
-    fieldnames = ["timestamp", "order_id", "symbol", "side",
-                    "price", "amount", "status"]
-    # Convert timestamp to a human-readable string
-    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S") # current time
+    if CUR_ENV.lower() == 'production':
+        return 'btc-bot/script/logs/orders_journal.jsonl'
+    return 'script/logs/orders_journal.jsonl'
 
-    # Gather the relevant info from the 'order' dict
-    row = {
-        "timestamp": current_time,
-        "order_id": order.get("id", ""),        # ccxt typically has 'id' or 'orderId'
-        "symbol": order.get("symbol", ""),
-        "side": order.get("side", ""),
-        "price": order.get("price", ""),        # might be None for MARKET orders
-        "amount": order.get("amount", ""),      # how many contracts or coins
-        "status": order.get("status", "")
-    }
+def latency_path():
+    """
+    Path of the latency histograms dump (see utils.tracing) for the current environment.
+    """
     if CUR_ENV.lower() == 'production':
-        log_filename = 'btc-bot/script/logs/orders_log.csv'
-    else:
-        log_filename = 'script/logs/orders_log.csv'
-    file_exists = os.path.isfile(log_filename)
+        return 'btc-bot/script/logs/latency.json'
+    return 'script/logs/latency.json'
+
+_journal = {}
+
+def get_journal():
+    """
+    Process wide EventJournal (created on first use).
+    """
+    if 'journal' not in _journal:
+        _journal['journal'] = EventJournal(journal_path())
+    return _journal['journal']
+
+def set_journal(journal):
+    """
+    Replace the process wide journal (e.g. to keep simulated orders out of the live one).
+    """
+    previous = _journal.get('journal')
+    _journal['journal'] = journal
+    return previous
 
-    # Append to CSV
-    with open(log_filename, mode="a", newline="", encoding="utf-8") as csv_file:
-        writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-        # If this is a brand-new file, write the header first
-        if not file_exists:
-            writer.writeheader()
-        writer.writerow(row)
-        print(row)
+def log_order(order):
+    """
+    Logs order information to the order journal (JSONL, see utils.journal).
+    Only queues the record: the file is written by a background thread, so nothing
+    blocks between an entry order and its SL/TP orders.
+    :param order: A dictionary returned by ccxt.create_order().
+    """
+    # Gather the relevant info from the 'order' dict
+    get_journal().record(
+        'order',
+        timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S"), # current time
+        order_id=order.get("id", ""),        # ccxt typically has 'id' or 'orderId'
+        symbol=order.get("symbol", ""),
+        side=order.get("side", ""),
+        type=order.get("type", ""),
+        price=order.get("price", ""),        # might be None for MARKET orders
+        amount=order.get("amount", ""),      # how many contracts or coins
+        status=order.get("status", "")
+    )
 
 if __name__ == "__main__":
     test_current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
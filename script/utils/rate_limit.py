@@ -0,0 +1,93 @@
+"""
+request weight scheduler for the exchange rate limit
+
+Binance USDⓈ-M futures meters the REST API in request weight per minute (2400 by default,
+each endpoint costs a weight, klines depend on the limit). WeightScheduler is a token
+bucket over that budget shared by every coroutine of the process: a request waits until
+its weight is available, and at most `max_concurrency` requests are in flight.
+The bucket is corrected with the weight the exchange reports as used (x-mbx-used-weight-1m)
+so other processes on the same ip / account are accounted for.
+"""
+import asyncio
+import contextlib
+import time
+
+WEIGHT_PER_MINUTE = 2400
+USED_WEIGHT_HEADER = 'x-mbx-used-weight-1m'
+
+def klines_weight(limit):
+    """
+    Request weight of GET /fapi/v1/klines for `limit` candles.
+    """
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+def used_weight(headers):
+    """
+    Used weight of the current minute from the response headers, None when absent.
+    """
+    for key, value in (headers or {}).items():
+        if key.lower() == USED_WEIGHT_HEADER:
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                return None
+    return None
+
+class WeightScheduler:
+    """
+    token bucket of `weight_per_minute * safety` weight refilled continuously
+    """
+    def __init__(self, weight_per_minute=WEIGHT_PER_MINUTE, safety=0.8, max_concurrency=10):
+        self.capacity = weight_per_minute * safety
+        self.rate = self.capacity / 60
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.max_concurrency = max_concurrency
+        self._lock = None
+        self._semaphore = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, weight=1):
+        """
+        Wait until `weight` is available in the budget and take it (first come, first served).
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        weight = min(weight, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.tokens < weight:
+                await asyncio.sleep((weight - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= weight
+
+    @contextlib.asynccontextmanager
+    async def request(self, weight=1):
+        """
+        async with scheduler.request(weight): one exchange call, budget and concurrency checked.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        await self.acquire(weight)
+        async with self._semaphore:
+            yield
+
+    def observe(self, headers):
+        """
+        Align the budget with the weight the exchange reports as already used this minute.
+        """
+        used = used_weight(headers)
+        if used is None:
+            return
+        self._refill()
+        self.tokens = min(self.tokens, self.capacity - used)
@@ -0,0 +1,171 @@
+"""
+timeframe resampling of a 1 minute candle feed
+
+1m candles are ingested once and every higher timeframe (5m, 15m, 1h, 4h, 1d, ...) is built
+from them instead of being downloaded separately:
+  - resample(): one-shot, vectorized (np.*.reduceat), e.g. a backtest history from the candle store
+  - Resampler: incremental, in memory. Completed bars are kept per timeframe and only the bar
+    still forming is recomputed from its 1m candles on every update (the last 1m candle may be
+    sent again while it is still open, like utils.api.fetch_ohlcv does)
+Timeframes divide a day and bars are aligned on UTC epoch multiples of them (as the exchange
+candles), the last bar is the one still forming, as in an exchange fetch_ohlcv result.
+"""
+import numpy as np
+import pandas as pd
+
+from utils.candle_store import COLUMNS, DTYPES, as_columns, timeframe_to_ms
+
+BASE_TIMEFRAME = '1m'
+TIMEFRAMES = ('5m', '15m', '1h', '4h', '1d')
+
+def check_timeframe(timeframe, base=BASE_TIMEFRAME):
+    """
+    Length of timeframe in ms, ValueError when it cannot be built from base candles
+    (not a multiple of base, or not dividing a day: bars are aligned on UTC days).
+    """
+    timeframe_ms, base_ms = timeframe_to_ms(timeframe), timeframe_to_ms(base)
+    if timeframe_ms % base_ms or timeframe_to_ms('1d') % timeframe_ms:
+        raise ValueError(f"Cannot resample {base} candles to {timeframe}")
+    return timeframe_ms
+
+def _aggregate(columns, timeframe_ms):
+    # one bar per bucket of columns (sorted by timestamp)
+    timestamps = columns['timestamp']
+    if len(timestamps) == 0:
+        return {column: np.empty(0, dtype=DTYPES[column]) for column in COLUMNS}
+    buckets = timestamps // timeframe_ms * timeframe_ms
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(timestamps)] - 1
+    return {
+        'timestamp': buckets[starts],
+        'open': columns['open'][starts],
+        'high': np.maximum.reduceat(columns['high'], starts),
+        'low': np.minimum.reduceat(columns['low'], starts),
+        'close': columns['close'][ends],
+        'volume': np.add.reduceat(columns['volume'], starts),
+    }
+
+def resample(rows, timeframe, base=BASE_TIMEFRAME):
+    """
+    Bars of timeframe from base candles.
+    rows: ccxt style list of [timestamp, open, high, low, close, volume] or a dict of columns
+    (e.g. CandleStore.read()). Returns a dict of column -> numpy array.
+    """
+    return _aggregate(as_columns(rows), check_timeframe(timeframe, base))
+
+def to_frame(columns):
+    """
+    DataFrame with columns [timestamp, open, high, low, close, volume] like utils.api.fetch_ohlcv.
+    """
+    df = pd.DataFrame({column: np.asarray(columns[column]) for column in COLUMNS})
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    return df
+
+class Resampler:
+    """
+    incremental bars of several timeframes from one 1m candle feed
+    """
+    def __init__(self, timeframes=TIMEFRAMES, base=BASE_TIMEFRAME, capacity=1000):
+        """
+        capacity: completed bars kept per timeframe
+        """
+        self.base = base
+        self.capacity = capacity
+        self.timeframe_ms = {timeframe: check_timeframe(timeframe, base) for timeframe in timeframes}
+        self.candles = {column: np.empty(0, dtype=DTYPES[column]) for column in COLUMNS}
+        self.bars = {timeframe: {column: np.empty(0, dtype=DTYPES[column]) for column in COLUMNS} for timeframe in timeframes}
+
+    def add_timeframe(self, timeframe):
+        """
+        Start maintaining timeframe (its history starts at the 1m candles still in memory).
+        """
+        if timeframe not in self.timeframe_ms:
+            self.timeframe_ms[timeframe] = check_timeframe(timeframe, self.base)
+            self.bars[timeframe] = {column: np.empty(0, dtype=DTYPES[column]) for column in COLUMNS}
+            self._fold(timeframe)
+            self._trim()
+
+    def last_timestamp(self):
+        """
+        Open time (ms) of the newest 1m candle, None before the first update.
+        """
+        return int(self.candles['timestamp'][-1]) if len(self.candles['timestamp']) else None
+
+    def update(self, rows):
+        """
+        Ingest 1m candles (ccxt rows or dict of columns). Candles with the timestamp of one
+        already ingested replace it; bars they reach are rebuilt. Candles older than the
+        oldest one still in memory are ignored (their bars are already completed).
+        """
+        new = as_columns(rows)
+        if len(self.candles['timestamp']) and len(new['timestamp']):
+            old = int(np.searchsorted(new['timestamp'], self.candles['timestamp'][0], side='left'))
+            new = {column: values[old:] for column, values in new.items()}
+        if len(new['timestamp']) == 0:
+            return
+        cut = int(np.searchsorted(self.candles['timestamp'], new['timestamp'][0], side='left'))
+        self.candles = {column: np.concatenate([self.candles[column][:cut], new[column]]) for column in COLUMNS}
+        first = int(new['timestamp'][0])
+        for timeframe, timeframe_ms in self.timeframe_ms.items():
+            bars = self.bars[timeframe]
+            # completed bars reached by the new candles are rebuilt from the 1m candles
+            keep = int(np.searchsorted(bars['timestamp'], first // timeframe_ms * timeframe_ms, side='left'))
+            if keep < len(bars['timestamp']):
+                self.bars[timeframe] = {column: values[:keep] for column, values in bars.items()}
+            self._fold(timeframe)
+        self._trim()
+
+    def _forming_start(self, timeframe):
+        # index of the first 1m candle after the completed bars of timeframe
+        bars = self.bars[timeframe]
+        if len(bars['timestamp']) == 0:
+            return 0
+        return int(np.searchsorted(self.candles['timestamp'], bars['timestamp'][-1] + self.timeframe_ms[timeframe], side='left'))
+
+    def _fold(self, timeframe):
+        # move every bucket but the last (still forming) of the pending 1m candles to the completed bars
+        start = self._forming_start(timeframe)
+        timestamps = self.candles['timestamp'][start:]
+        if len(timestamps) == 0:
+            return
+        timeframe_ms = self.timeframe_ms[timeframe]
+        last_bucket = timestamps[-1] // timeframe_ms * timeframe_ms
+        stop = start + int(np.searchsorted(timestamps, last_bucket, side='left'))
+        if stop > start:
+            done = _aggregate({column: values[start:stop] for column, values in self.candles.items()}, timeframe_ms)
+            bars = self.bars[timeframe]
+            self.bars[timeframe] = {column: np.concatenate([bars[column], done[column]])[-self.capacity:] for column in COLUMNS}
+
+    def _trim(self):
+        # 1m candles are kept from the last completed bar of every timeframe on: the forming
+        # bars and a resent candle of the bar just completed are rebuilt from them
+        timestamps = self.candles['timestamp']
+        keep_from = len(timestamps)
+        for timeframe, bars in self.bars.items():
+            if len(bars['timestamp']) == 0:
+                return
+            keep_from = min(keep_from, int(np.searchsorted(timestamps, bars['timestamp'][-1], side='left')))
+        if keep_from > 0:
+            self.candles = {column: values[keep_from:] for column, values in self.candles.items()}
+
+    def read(self, timeframe, limit=None):
+        """
+        Bars of timeframe (completed ones then the one still forming) as a dict of column -> numpy array.
+        limit: keep only the last `limit` bars
+        """
+        if timeframe == self.base:
+            bars = self.candles
+        else:
+            self.add_timeframe(timeframe)
+            start = self._forming_start(timeframe)
+            forming = _aggregate({column: values[start:] for column, values in self.candles.items()}, self.timeframe_ms[timeframe])
+            bars = {column: np.concatenate([self.bars[timeframe][column], forming[column]]) for column in COLUMNS}
+        if limit is not None:
+            bars = {column: values[-limit:] for column, values in bars.items()}
+        return bars
+
+    def to_frame(self, timeframe, limit=None):
+        """
+        read() as a DataFrame like utils.api.fetch_ohlcv.
+        """
+        return to_frame(self.read(timeframe, limit))
@@ -0,0 +1,140 @@
+"""
+fixed-capacity candle ring buffer
+
+CandleRing keeps the last `capacity` candles of one symbol / timeframe and their indicator
+values in one preallocated numpy structured array, so a live cycle does not build a new
+DataFrame (datetime conversion, indicator columns) per symbol:
+  - update() appends the new candles in place, a candle with the timestamp of the last one
+    replaces it (it may still have been open), older ones are ignored
+  - every row is written twice (at i and i + capacity): the last n rows are always one
+    contiguous slice, views of it are zero-copy and read-only (set() writes indicator values)
+  - dtype=np.float32 halves the memory of the prices / volumes / indicators (timestamps stay int64)
+Memory is fixed at creation: 2 * capacity rows, e.g. 50 candles and 3 indicators take 7 KB in
+float64, 4 KB in float32.
+"""
+import numpy as np
+import pandas as pd
+
+from utils.candle_store import COLUMNS, as_columns
+
+# indicator fields of generate_signals
+INDICATORS = ('MA_short', 'MA_long', 'RSI')
+
+class CandleRing:
+    """
+    last `capacity` candles of one symbol / timeframe and their indicators
+    """
+    def __init__(self, capacity=50, dtype=np.float64, indicators=INDICATORS):
+        self.capacity = capacity
+        self.indicators = tuple(indicators)
+        self.dtype = np.dtype([('timestamp', np.int64)] + [(name, dtype) for name in COLUMNS[1:] + self.indicators])
+        self._data = np.zeros(2 * capacity, dtype=self.dtype)
+        for name in self.indicators:
+            self._data[name] = np.nan
+        # candles appended since creation, the newest is at (count - 1) % capacity
+        self.count = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    @property
+    def empty(self):
+        """
+        No candle yet (same test as DataFrame.empty).
+        """
+        return self.count == 0
+
+    @property
+    def nbytes(self):
+        """
+        Memory of the buffer.
+        """
+        return self._data.nbytes
+
+    def last_timestamp(self):
+        """
+        Open time (ms) of the newest candle, None when empty.
+        """
+        return int(self._data['timestamp'][(self.count - 1) % self.capacity]) if self.count else None
+
+    def _bounds(self, limit):
+        n = len(self) if limit is None else min(limit, len(self))
+        end = (self.count - 1) % self.capacity + self.capacity + 1 if self.count else 0
+        return end - n, end
+
+    def _write(self, slots, columns):
+        for name, values in columns.items():
+            self._data[name][slots] = values
+            self._data[name][slots + self.capacity] = values
+
+    def update(self, rows):
+        """
+        Add candles (ccxt rows or a dict of columns, e.g. CandleStore.read()).
+        Returns the number of candles appended.
+        """
+        new = as_columns(rows)
+        timestamps = new['timestamp']
+        last = self.last_timestamp()
+        if last is not None:
+            start = int(np.searchsorted(timestamps, last, side='left'))
+            if start < len(timestamps) and timestamps[start] == last:
+                # the last candle again: prices replaced, its indicators are stale
+                slot = np.array([(self.count - 1) % self.capacity])
+                self._write(slot, {name: values[start:start + 1] for name, values in new.items()})
+                self._write(slot, {name: np.nan for name in self.indicators})
+                start += 1
+            new = {name: values[start:] for name, values in new.items()}
+        appended = len(new['timestamp'])
+        if appended > self.capacity:
+            self.count += appended - self.capacity
+            new = {name: values[-self.capacity:] for name, values in new.items()}
+        if len(new['timestamp']):
+            slots = (self.count + np.arange(len(new['timestamp']))) % self.capacity
+            self._write(slots, new)
+            self._write(slots, {name: np.nan for name in self.indicators})
+            self.count += len(new['timestamp'])
+        return appended
+
+    def view(self, limit=None):
+        """
+        Last `limit` rows (all by default) as a read-only structured array, oldest first (no copy).
+        """
+        start, end = self._bounds(limit)
+        rows = self._data[start:end]
+        rows.flags.writeable = False
+        return rows
+
+    def column(self, name, limit=None):
+        """
+        Last `limit` values of one field as a read-only array (no copy).
+        """
+        return self.view(limit)[name]
+
+    def set(self, name, values):
+        """
+        Write the indicator `name` of the last len(values) rows (a scalar: of the last row).
+        """
+        values = np.atleast_1d(values)
+        start, end = self._bounds(len(values))
+        slots = np.arange(start, end) % self.capacity
+        self._write(slots, {name: values[len(values) - (end - start):]})
+
+    def to_frame(self, limit=None):
+        """
+        Copy of the last `limit` rows as a DataFrame like utils.api.fetch_ohlcv (indicator columns included).
+        """
+        df = pd.DataFrame(self.view(limit))
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+        return df
+
+def candle_column(candles, name):
+    """
+    One column of a CandleRing (no copy) or of a fetch_ohlcv DataFrame as a numpy array,
+    timestamps in ms.
+    """
+    if isinstance(candles, CandleRing):
+        return candles.column(name)
+    values = candles[name].values
+    if name == 'timestamp':
+        return values.astype('datetime64[ms]').astype(np.int64)
+    return values
@@ -2,7 +2,56 @@
 methods for risk management
 
 position size and sl tp
+the *_batch functions take numpy arrays (or scalars, broadcast together) for many positions at
+once, e.g. one per backtest column or per symbol. The scalar functions stay plain python for one
+position (cheaper than numpy, and a bad input raises instead of becoming NaN)
 """
+import numpy as np
+
+def position_directions(position_sides):
+    """
+    +1 for 'LONG', -1 for 'SHORT' (any case, or already +1 / -1) as an int array.
+    """
+    if isinstance(position_sides, str):
+        # one side (the scalar wrappers): no string array
+        direction = {'LONG': 1, 'SHORT': -1}.get(position_sides.upper())
+        if direction is None:
+            raise ValueError("Invalid position_side: must be 'LONG' or 'SHORT' ")
+        return np.int64(direction)
+    sides = np.asarray(position_sides)
+    if sides.dtype.kind in 'iuf':
+        directions = sides.astype(np.int64)
+        valid = np.isin(directions, (1, -1)) & (directions == sides)
+    else:
+        sides = np.char.upper(sides.astype(str))
+        directions = np.where(sides == 'LONG', 1, np.where(sides == 'SHORT', -1, 0))
+        valid = directions != 0
+    if not valid.all():
+        raise ValueError("Invalid position_side: must be 'LONG' or 'SHORT' ")
+    return directions
+
+def calculate_stop_loss_take_profit_batch(entry_prices, stop_loss_pct=7, take_profit_pct=5, position_sides='LONG'):
+    """
+    Stop-loss and take-profit price arrays, a percentage of the entry prices away from them
+    (below / above for LONG, above / below for SHORT). NaN where the percentage is 0 or None.
+    """
+    directions = position_directions(position_sides)
+    entry_prices = np.asarray(entry_prices, dtype=np.float64)
+    stop_loss_pct = np.asarray(stop_loss_pct, dtype=np.float64)
+    take_profit_pct = np.asarray(take_profit_pct, dtype=np.float64)
+    stop_loss_prices = np.where(stop_loss_pct != 0, entry_prices * (1 - directions * stop_loss_pct / 100), np.nan)
+    take_profit_prices = np.where(take_profit_pct != 0, entry_prices * (1 + directions * take_profit_pct / 100), np.nan)
+    return stop_loss_prices, take_profit_prices
+
+def calculate_position_size_batch(account_balances, risk_percentages, entry_prices, stop_loss_prices):
+    """
+    Position size array: risk_percentages of the balances over the stop-loss distances
+    (inf where the stop-loss is at the entry price).
+    """
+    risk_amounts = np.asarray(account_balances, dtype=np.float64) * (np.asarray(risk_percentages, dtype=np.float64) / 100)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return risk_amounts / np.abs(np.asarray(entry_prices, dtype=np.float64) - np.asarray(stop_loss_prices, dtype=np.float64))
+
 def calculate_stop_loss_take_profit(entry_price, stop_loss_pct=7, take_profit_pct=5, position_side='LONG'):
     """
     Calculate stop-loss and take-profit prices based on a percentage of the entry price
@@ -1,20 +1,34 @@
 """
 signals module to detect when to buy or sell
 """
+import numpy as np
 import pandas as pd
-import vectorbt as vbt
 
+from utils.ring_buffer import CandleRing, candle_column
+from utils.tracing import traced
 
-def generate_signals(df, short_window=8, long_window=14, rsi_window=14, rsi_buy_threshold=35, rsi_sell_threshold=60):
+
+@traced('generate_signals')
+def generate_signals(df, short_window=8, long_window=14, rsi_window=14, rsi_buy_threshold=35, rsi_sell_threshold=60, engine=None):
     """
     Adds two columns to the DataFrame: short MA and long MA.
     Returns the DataFrame with the new columns and a signal ('BUY', 'SELL', or None).
+    engine: optional utils.indicators.SignalEngine built with the same parameters. When given, only
+    the candles newer than the engine state are fed to it (O(1) each) and the DataFrame is returned as is.
+    df may also be a utils.ring_buffer.CandleRing (fetch_candles): no column is added, the indicators
+    of its last candles are written to its MA_short / MA_long / RSI fields (ring_signal).
     """
     if df is None or df.empty:
         return df, None
+    if engine is not None:
+        return df, update_engine(engine, df)
+    if isinstance(df, CandleRing):
+        return df, ring_signal(df, short_window, long_window, rsi_window, rsi_buy_threshold, rsi_sell_threshold)
     df['MA_short'] = df['close'].rolling(window=short_window).mean() # short MA reacts faster to price change
     df['MA_long'] = df['close'].rolling(window=long_window).mean() #  long MA reacts slower and representer broader trend
 
+    # vectorbt takes seconds to import, only load it when the full recompute path is used
+    import vectorbt as vbt
     rsi_series = vbt.RSI.run(df['close'], window=rsi_window).rsi
     df['RSI'] = rsi_series
 
@@ -23,15 +37,20 @@ def generate_signals(df, short_window=8, long_window=14, rsi_window=14, rsi_buy_
     latest_long = df['MA_long'].iloc[-1]
     latest_rsi = df['RSI'].iloc[-1]
 
+    # (We also check the previous candles to confirm a crossover event)
+    prev_short = df['MA_short'].iloc[-2] if len(df) > 1 else np.nan
+    prev_long = df['MA_long'].iloc[-2] if len(df) > 1 else np.nan
+    return df, crossover_signal(prev_short, prev_long, latest_short, latest_long, latest_rsi, rsi_buy_threshold, rsi_sell_threshold)
+
+def crossover_signal(prev_short, prev_long, latest_short, latest_long, latest_rsi, rsi_buy_threshold, rsi_sell_threshold):
+    """
+    'BUY', 'SELL' or None from the MAs of the last two candles and the last RSI.
+    """
     # Check for NaN
     if pd.isna(latest_short) or pd.isna(latest_long) or pd.isna(latest_rsi):
-        return df, None
+        return None
 
     # crossover logic
-    # (We also check the previous candles to confirm a crossover event)
-    prev_short = df['MA_short'].iloc[-2]
-    prev_long = df['MA_long'].iloc[-2]
-
     # Moving Average Crossover
     buy_condition  = (prev_short < prev_long) and (latest_short > latest_long)
     sell_condition = (prev_short > prev_long) and (latest_short < latest_long)
@@ -43,8 +62,58 @@ def generate_signals(df, short_window=8, long_window=14, rsi_window=14, rsi_buy_
     rsi_sell_filter = latest_rsi > rsi_sell_threshold
     # Buy signal if short MA crosses above long MA
     if buy_condition and rsi_buy_filter:
-        return df, 'BUY'
+        return 'BUY'
     # Sell signal if short MA crosses below long MA
     if sell_condition and rsi_sell_filter:
-        return df, 'SELL'
-    return df, None
+        return 'SELL'
+    return None
+
+def _tail_means(close, window):
+    # rolling(window).mean() of the last two candles
+    means = np.full(2, np.nan)
+    for i, end in enumerate((len(close) - 1, len(close))):
+        if end >= window:
+            means[i] = close[end - window:end].mean(dtype=np.float64)
+    return means
+
+def _tail_rsi(close, window):
+    # vbt.RSI.run(close, window).rsi of the last two candles: simple means of the gains / losses
+    rsi = np.full(2, np.nan)
+    for i, end in enumerate((len(close) - 1, len(close))):
+        if end > window:
+            delta = np.diff(close[end - window - 1:end].astype(np.float64))
+            up = np.array(np.where(delta > 0, delta, 0.0).mean())
+            down = np.array(np.where(delta < 0, -delta, 0.0).mean())
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rsi[i] = 100 - 100 / (1 + up / down)
+    return rsi
+
+def ring_signal(ring, short_window=8, long_window=14, rsi_window=14, rsi_buy_threshold=35, rsi_sell_threshold=60):
+    """
+    generate_signals on a CandleRing: only the MAs and the RSI of the last two candles are
+    computed (same formulas) and written to the ring, the signal is decided from them.
+    """
+    close = ring.column('close')
+    ma_short, ma_long, rsi = _tail_means(close, short_window), _tail_means(close, long_window), _tail_rsi(close, rsi_window)
+    for name, values in (('MA_short', ma_short), ('MA_long', ma_long), ('RSI', rsi)):
+        ring.set(name, values[-len(ring):])
+    return crossover_signal(ma_short[0], ma_long[0], ma_short[1], ma_long[1], rsi[1], rsi_buy_threshold, rsi_sell_threshold)
+
+def update_engine(engine, df):
+    """
+    Feed the candles of df that the engine has not seen yet (the last one again as it may still be open).
+    The engine is reset and warmed up from df when its state is older than the first candle of df.
+    df may be a CandleRing, the engine's indicator values are then written to its last candle.
+    Returns the engine signal for the last candle.
+    """
+    timestamps = candle_column(df, 'timestamp')
+    closes = candle_column(df, 'close')
+    if engine.last_timestamp is not None and engine.last_timestamp < timestamps[0]:
+        engine.reset()
+    for timestamp, close in zip(timestamps.tolist(), closes.tolist()):
+        if engine.last_timestamp is None or timestamp >= engine.last_timestamp:
+            engine.update(timestamp, close)
+    if isinstance(df, CandleRing):
+        for name, indicator in (('MA_short', engine.ma_short), ('MA_long', engine.ma_long), ('RSI', engine.rsi)):
+            df.set(name, indicator.value)
+    return engine.signal
@@ -0,0 +1,582 @@
+"""
+local exchange simulator
+
+SimulatedExchange implements the subset of the ccxt binanceusdm api the bot uses
+(fetch_ohlcv, fetch_ticker, fetch_balance, fetch_positions, fetch_open_orders, cancel_order,
+cancel_all_orders, create_order, create_orders) on replayed candles, in hedge mode
+(positionSide LONG / SHORT):
+  - MARKET orders fill at the close of the current candle (+/- slippage), taker fee charged
+  - STOP_MARKET / TAKE_PROFIT_MARKET orders rest until a later candle crosses their stopPrice,
+    they fill at the stopPrice (at the open when the candle gaps through it).
+    When both sides trigger in the same candle, the one closest to the open fills first.
+    closePosition orders close the whole position side, the other ones of that side expire.
+  - errors are raised as the ccxt exceptions binance would map to (InsufficientFunds, InvalidOrder, ...)
+The clock only moves with step(): each step makes the next candle visible and matches the
+resting trigger orders against it.
+
+BinanceClient.use(SimulatedExchange(...)) swaps it in for the testnet client (the async path
+follows, see utils.async_api.get_async_client). serve() exposes an exchange over local HTTP and
+SimulatorHTTPClient talks to it; with EXCHANGE_SIMULATOR_URL set, BinanceClient uses that client.
+"""
+import asyncio
+import json
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import ccxt
+import numpy as np
+
+from utils.candle_store import timeframe_to_ms
+
+# ccxt methods of the exchange, also the methods served over HTTP with the replay controls
+API_METHODS = (
+    'fetch_ohlcv', 'fetch_ticker', 'fetch_balance', 'fetch_positions', 'fetch_open_orders',
+    'fetch_time', 'cancel_order', 'cancel_all_orders', 'create_order', 'create_orders', 'load_markets',
+)
+CONTROL_METHODS = ('step', 'seek', 'add_candles', 'describe', 'milliseconds')
+
+TRIGGER_TYPES = ('STOP_MARKET', 'TAKE_PROFIT_MARKET')
+
+def synthetic_ohlcv(n, timeframe='1h', start=1_600_000_000_000, price=30000.0, volatility=0.01, seed=0):
+    """
+    Seeded random-walk candles: n rows of [timestamp, open, high, low, close, volume].
+    """
+    rng = np.random.default_rng(seed)
+    step = timeframe_to_ms(timeframe)
+    start = start // step * step
+    close = price * np.exp(np.cumsum(rng.normal(0.0, volatility, n)))
+    open_ = np.concatenate(([price], close[:-1]))
+    wick = np.abs(rng.normal(0.0, volatility / 2, (2, n)))
+    high = np.maximum(open_, close) * (1 + wick[0])
+    low = np.minimum(open_, close) * (1 - wick[1])
+    volume = rng.lognormal(3.0, 1.0, n)
+    timestamp = start + np.arange(n, dtype=np.float64) * step
+    return np.column_stack([timestamp, open_, high, low, close, volume])
+
+def _market_key(symbol):
+    # 'BTC/USDT' and 'BTC/USDT:USDT' are the same linear perpetual
+    return symbol.split(':')[0]
+
+def _trigger_direction(order_type, side):
+    # 'down': fires when the price falls to stopPrice, 'up': when it rises to it
+    if order_type == 'STOP_MARKET':
+        return 'down' if side == 'SELL' else 'up'
+    return 'up' if side == 'SELL' else 'down'
+
+class SimulatedExchange:
+    """
+    in-process hedge mode futures exchange driven by replayed candles of one timeframe
+    """
+    id = 'simulator'
+    simulated = True
+    isSandboxModeEnabled = False
+
+    def __init__(self, timeframe='1h', balance=10000.0, fee=0.0004, leverage=20, slippage=0.0, quote='USDT'):
+        self.timeframe = timeframe
+        self.timeframe_ms = timeframe_to_ms(timeframe)
+        self.fee = fee
+        self.leverage = leverage
+        self.slippage = slippage
+        self.quote = quote
+        self.wallet = float(balance)
+        self.candles = {}
+        self.positions = {}
+        self.orders = {}
+        self.open_orders = {}
+        self.markets = {}
+        self.currencies = {}
+        self.has = {'cancelAllOrders': True, 'createOrders': True, 'fetchPositions': True}
+        self.last_response_headers = {}
+        self.time = None
+        self._next_id = 1
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------ replay
+
+    def add_candles(self, symbol, ohlcv):
+        """
+        Candles of symbol for the replay: rows of [timestamp, open, high, low, close, volume].
+        The clock starts after the first candle when it is not set yet.
+        """
+        with self._lock:
+            candles = np.asarray(ohlcv, dtype=np.float64).reshape(-1, 6)
+            candles = candles[np.argsort(candles[:, 0], kind='stable')]
+            key = _market_key(symbol)
+            self.candles[key] = candles
+            base, _, quote = key.partition('/')
+            self.markets[key] = {
+                'id': key.replace('/', ''), 'symbol': f'{key}:{quote}', 'base': base, 'quote': quote,
+                'settle': quote, 'type': 'swap', 'swap': True, 'linear': True, 'contract': True, 'active': True,
+            }
+            if self.time is None and len(candles):
+                self.time = int(candles[0, 0]) + self.timeframe_ms
+
+    def seek(self, timestamp):
+        """
+        Move the clock so the candle opened at `timestamp` is the last visible one (no matching).
+        """
+        with self._lock:
+            self.time = int(timestamp) + self.timeframe_ms
+            return self.time
+
+    def step(self, count=1):
+        """
+        Make the next `count` candles visible, matching the trigger orders against each of them.
+        Returns False once every feed is exhausted.
+        """
+        with self._lock:
+            for _ in range(count):
+                if not self._has_next():
+                    return False
+                self.time += self.timeframe_ms
+                for key in list(self.candles):
+                    candle = self._current_candle(key)
+                    if candle is not None and int(candle[0]) == self.time - self.timeframe_ms:
+                        self._match(key, candle)
+            return self._has_next()
+
+    def _has_next(self):
+        return any(len(c) and c[-1, 0] + self.timeframe_ms > self.time for c in self.candles.values())
+
+    def _visible(self, key):
+        candles = self._feed(key)
+        return candles[:np.searchsorted(candles[:, 0], self.time - self.timeframe_ms, side='right')]
+
+    def _current_candle(self, key):
+        visible = self._visible(key)
+        return visible[-1] if len(visible) else None
+
+    def _feed(self, symbol):
+        try:
+            return self.candles[_market_key(symbol)]
+        except KeyError:
+            raise ccxt.BadSymbol(f'{self.id} does not have market symbol {symbol}') from None
+
+    def _price(self, symbol):
+        candle = self._current_candle(_market_key(symbol))
+        if candle is None:
+            raise ccxt.ExchangeError(f'{self.id} has no price for {symbol} yet')
+        return float(candle[4])
+
+    # ------------------------------------------------------------------ matching engine
+
+    def _position(self, key, position_side):
+        return self.positions.setdefault((key, position_side), {'contracts': 0.0, 'entry_price': 0.0})
+
+    def _fill(self, key, side, position_side, amount, price):
+        """
+        Apply a fill to the position of key/position_side, returns the filled amount.
+        """
+        position = self._position(key, position_side)
+        opening = (side == 'BUY') == (position_side == 'LONG')
+        if opening:
+            contracts = position['contracts'] + amount
+            position['entry_price'] = (position['entry_price'] * position['contracts'] + price * amount) / contracts
+            position['contracts'] = contracts
+        else:
+            amount = min(amount, position['contracts'])
+            direction = 1 if position_side == 'LONG' else -1
+            self.wallet += (price - position['entry_price']) * amount * direction
+            position['contracts'] -= amount
+            if position['contracts'] <= 1e-12:
+                position['contracts'] = 0.0
+                position['entry_price'] = 0.0
+                self._expire_close_orders(key, position_side)
+        self.wallet -= price * amount * self.fee
+        return amount
+
+    def _expire_close_orders(self, key, position_side):
+        for order_id, order in list(self.open_orders.items()):
+            if order['_key'] == key and order['info']['positionSide'] == position_side and order['reduceOnly']:
+                order['status'] = 'expired'
+                del self.open_orders[order_id]
+
+    def _match(self, key, candle):
+        _, open_, high, low, _, _ = (float(v) for v in candle)
+        resting = [o for o in self.open_orders.values() if o['_key'] == key]
+        resting.sort(key=lambda o: (abs(o['stopPrice'] - open_), int(o['id'])))
+        for order in resting:
+            if order['status'] != 'open':
+                continue
+            stop = order['stopPrice']
+            if _trigger_direction(order['_type'], order['_side']) == 'down':
+                if low > stop:
+                    continue
+                price = min(open_, stop)
+            else:
+                if high < stop:
+                    continue
+                price = max(open_, stop)
+            del self.open_orders[order['id']]
+            position_side = order['info']['positionSide']
+            amount = self._position(key, position_side)['contracts'] if order['info']['closePosition'] else order['amount']
+            filled = self._fill(key, order['_side'], position_side, amount, price) if amount > 0 else 0.0
+            self._finish(order, filled, price)
+
+    def _finish(self, order, filled, price):
+        order.update({
+            'status': 'closed' if filled > 0 else 'expired',
+            'filled': filled,
+            'remaining': 0.0,
+            'average': price if filled > 0 else None,
+            'lastTradeTimestamp': self.time,
+        })
+
+    # ------------------------------------------------------------------ orders
+
+    def _new_order(self, symbol, order_type, side, amount, params):
+        key = _market_key(symbol)
+        order_id = str(self._next_id)
+        self._next_id += 1
+        close_position = bool(params.get('closePosition', False))
+        stop_price = params.get('stopPrice', params.get('triggerPrice'))
+        order = {
+            'id': order_id,
+            'clientOrderId': params.get('clientOrderId', f'sim-{order_id}'),
+            'timestamp': self.time,
+            'datetime': None,
+            'lastTradeTimestamp': None,
+            'symbol': self.markets[key]['symbol'],
+            'type': order_type.lower(),
+            'side': side.lower(),
+            'price': None,
+            'average': None,
+            'amount': None if close_position else float(amount),
+            'filled': 0.0,
+            'remaining': None if close_position else float(amount),
+            'status': 'open',
+            'stopPrice': float(stop_price) if stop_price is not None else None,
+            'triggerPrice': float(stop_price) if stop_price is not None else None,
+            'reduceOnly': close_position or order_type in TRIGGER_TYPES,
+            'info': {'positionSide': params.get('positionSide'), 'closePosition': close_position},
+            '_key': key,
+            '_type': order_type,
+            '_side': side,
+        }
+        return order
+
+    def create_order(self, symbol, type, side, amount=None, price=None, params=None):
+        """
+        ccxt create_order: MARKET, STOP_MARKET or TAKE_PROFIT_MARKET with params positionSide
+        (required, hedge mode), stopPrice and closePosition.
+        """
+        params = params or {}
+        order_type, side = type.upper(), side.upper()
+        with self._lock:
+            self._feed(symbol)
+            position_side = params.get('positionSide')
+            if position_side not in ('LONG', 'SHORT'):
+                raise ccxt.InvalidOrder(f"{self.id} hedge mode requires positionSide LONG or SHORT, got {position_side}")
+            if side not in ('BUY', 'SELL'):
+                raise ccxt.InvalidOrder(f'{self.id} invalid side {side}')
+            if order_type not in ('MARKET',) + TRIGGER_TYPES:
+                raise ccxt.InvalidOrder(f'{self.id} order type {order_type} is not supported')
+            if not params.get('closePosition') and not (amount and amount > 0):
+                raise ccxt.InvalidOrder(f'{self.id} amount must be positive, got {amount}')
+            order = self._new_order(symbol, order_type, side, amount, params)
+            key = order['_key']
+            last = self._price(symbol)
+            if order_type == 'MARKET':
+                self._market(order, key, side, position_side, float(amount), last)
+            else:
+                stop = order['stopPrice']
+                if stop is None:
+                    raise ccxt.InvalidOrder(f'{self.id} {order_type} requires a stopPrice')
+                direction = _trigger_direction(order_type, side)
+                if (direction == 'down' and last <= stop) or (direction == 'up' and last >= stop):
+                    raise ccxt.OrderImmediatelyFillable(f'{self.id} Order would immediately trigger.')
+                self.open_orders[order['id']] = order
+            self.orders[order['id']] = order
+            return self._public(order)
+
+    def _market(self, order, key, side, position_side, amount, last):
+        opening = (side == 'BUY') == (position_side == 'LONG')
+        price = last * (1 + self.slippage) if side == 'BUY' else last * (1 - self.slippage)
+        if opening:
+            cost = price * amount / self.leverage + price * amount * self.fee
+            if cost > self._free():
+                raise ccxt.InsufficientFunds(f"{self.id} Margin is insufficient.")
+        elif self._position(key, position_side)['contracts'] <= 0:
+            raise ccxt.InvalidOrder(f'{self.id} ReduceOnly Order is rejected, no {position_side} position.')
+        filled = self._fill(key, side, position_side, amount, price)
+        self._finish(order, filled, price)
+
+    def create_orders(self, orders, params=None):
+        """
+        ccxt create_orders (batch orders): each order is placed on its own, a rejected one comes
+        back without id with the error in info, like binance does.
+        """
+        results = []
+        for request in orders:
+            try:
+                results.append(self.create_order(
+                    request['symbol'], request['type'], request['side'], request.get('amount'),
+                    request.get('price'), {**(params or {}), **request.get('params', {})}))
+            except ccxt.BaseError as e:
+                results.append({'id': None, 'status': 'rejected', 'info': {'msg': str(e), 'error': type(e).__name__}})
+        return results
+
+    def cancel_order(self, id, symbol=None, params=None):
+        """
+        ccxt cancel_order.
+        """
+        with self._lock:
+            order = self.open_orders.pop(str(id), None)
+            if order is None:
+                raise ccxt.OrderNotFound(f'{self.id} Unknown order sent: {id}')
+            order['status'] = 'canceled'
+            return self._public(order)
+
+    def cancel_all_orders(self, symbol=None, params=None):
+        """
+        ccxt cancel_all_orders.
+        """
+        with self._lock:
+            key = _market_key(symbol) if symbol else None
+            return [self.cancel_order(o['id']) for o in list(self.open_orders.values()) if key in (None, o['_key'])]
+
+    # ------------------------------------------------------------------ queries
+
+    def _public(self, order):
+        return {k: v for k, v in order.items() if not k.startswith('_')}
+
+    def fetch_open_orders(self, symbol=None, since=None, limit=None, params=None):
+        """
+        ccxt fetch_open_orders.
+        """
+        with self._lock:
+            key = _market_key(symbol) if symbol else None
+            return [self._public(o) for o in self.open_orders.values() if key in (None, o['_key'])]
+
+    def fetch_ohlcv(self, symbol, timeframe='1h', since=None, limit=None, params=None):
+        """
+        ccxt fetch_ohlcv over the candles visible at the current time.
+        """
+        with self._lock:
+            if timeframe_to_ms(timeframe) != self.timeframe_ms:
+                raise ccxt.BadRequest(f'{self.id} replays {self.timeframe} candles, not {timeframe}')
+            visible = self._visible(symbol)
+            if since is not None:
+                visible = visible[np.searchsorted(visible[:, 0], since):]
+                if limit:
+                    visible = visible[:limit]
+            elif limit:
+                visible = visible[-limit:]
+            return [[int(row[0]), *row[1:].tolist()] for row in visible]
+
+    def fetch_ticker(self, symbol, params=None):
+        """
+        ccxt fetch_ticker, last = close of the current candle.
+        """
+        with self._lock:
+            self._feed(symbol)
+            candle = self._current_candle(_market_key(symbol))
+            if candle is None:
+                raise ccxt.ExchangeError(f'{self.id} has no price for {symbol} yet')
+            last = float(candle[4])
+            return {
+                'symbol': self.markets[_market_key(symbol)]['symbol'], 'timestamp': self.time,
+                'last': last, 'close': last, 'bid': last, 'ask': last,
+                'open': float(candle[1]), 'high': float(candle[2]), 'low': float(candle[3]),
+                'baseVolume': float(candle[5]),
+            }
+
+    def _unrealized(self):
+        pnl = 0.0
+        for (key, position_side), position in self.positions.items():
+            if position['contracts'] > 0:
+                direction = 1 if position_side == 'LONG' else -1
+                pnl += (self._price(key) - position['entry_price']) * position['contracts'] * direction
+        return pnl
+
+    def _used(self):
+        return sum(p['entry_price'] * p['contracts'] for p in self.positions.values()) / self.leverage
+
+    def _free(self):
+        return self.wallet + min(self._unrealized(), 0.0) - self._used()
+
+    def fetch_balance(self, params=None):
+        """
+        ccxt fetch_balance (quote currency only).
+        """
+        with self._lock:
+            used = self._used()
+            free = self._free()
+            total = self.wallet + self._unrealized()
+            return {
+                self.quote: {'free': free, 'used': used, 'total': total},
+                'free': {self.quote: free}, 'used': {self.quote: used}, 'total': {self.quote: total},
+                'info': {'wallet': self.wallet},
+            }
+
+    def fetch_positions(self, symbols=None, params=None):
+        """
+        ccxt fetch_positions: both sides of every traded symbol (zero contracts included).
+        """
+        with self._lock:
+            keys = {_market_key(s) for s in symbols} if symbols else None
+            positions = []
+            for (key, position_side), position in self.positions.items():
+                if keys is not None and key not in keys:
+                    continue
+                contracts = position['contracts']
+                direction = 1 if position_side == 'LONG' else -1
+                mark = self._price(key)
+                positions.append({
+                    'symbol': self.markets[key]['symbol'],
+                    'side': position_side.lower(),
+                    'contracts': contracts,
+                    'entryPrice': position['entry_price'] or None,
+                    'markPrice': mark,
+                    'notional': contracts * mark,
+                    'leverage': self.leverage,
+                    'unrealizedPnl': (mark - position['entry_price']) * contracts * direction,
+                    'info': {'positionSide': position_side, 'positionAmt': str(contracts * direction)},
+                })
+            return positions
+
+    # ------------------------------------------------------------------ ccxt client surface
+
+    def milliseconds(self):
+        """
+        Simulated exchange time (close time of the last visible candle).
+        """
+        return self.time
+
+    def fetch_time(self, params=None):
+        """
+        ccxt fetch_time.
+        """
+        return self.time
+
+    def load_markets(self, reload=False, params=None):
+        """
+        ccxt load_markets, the markets are the replayed symbols.
+        """
+        return self.markets
+
+    def set_markets(self, markets, currencies=None):
+        """
+        Kept for the ccxt client surface, the replayed symbols are the markets.
+        """
+        return self.markets
+
+    def set_sandbox_mode(self, enabled):
+        """
+        Kept for the ccxt client surface.
+        """
+
+    def describe(self):
+        """
+        Static attributes of the exchange (used by SimulatorHTTPClient).
+        """
+        with self._lock:
+            return {'id': self.id, 'has': self.has, 'markets': self.markets, 'timeframe': self.timeframe}
+
+class AsyncSimulatedExchange:
+    """
+    coroutine facade over a SimulatedExchange or a SimulatorHTTPClient (ccxt.async_support surface)
+    """
+    simulated = True
+
+    def __init__(self, exchange):
+        self.exchange = exchange
+        # the in-process exchange answers immediately, the http client blocks on the socket
+        self.blocking = not isinstance(exchange, SimulatedExchange)
+
+    def __getattr__(self, name):
+        attr = getattr(self.exchange, name)
+        if name not in API_METHODS:
+            return attr
+
+        async def call(*args, **kwargs):
+            if self.blocking:
+                return await asyncio.to_thread(attr, *args, **kwargs)
+            return attr(*args, **kwargs)
+        return call
+
+    async def close(self):
+        """
+        Nothing to close, kept for the ccxt.async_support surface.
+        """
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+def serve(exchange, host='127.0.0.1', port=8765):
+    """
+    Expose `exchange` over HTTP: POST /<method> with {"args": [...], "kwargs": {...}}.
+    Returns the server, call serve_forever() (or run it in a thread).
+    """
+    allowed = set(API_METHODS + CONTROL_METHODS)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            method = self.path.strip('/')
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            try:
+                if method not in allowed:
+                    raise ccxt.NotSupported(f'{exchange.id} {method}() is not served')
+                body = {'result': getattr(exchange, method)(*payload.get('args', []), **payload.get('kwargs', {}))}
+            except ccxt.BaseError as e:
+                body = {'error': type(e).__name__, 'message': str(e)}
+            data = json.dumps(body, default=_json_default).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+class SimulatorHTTPClient:
+    """
+    ccxt-like client of an exchange exposed with serve(), ccxt errors are raised again locally
+    """
+    simulated = True
+    isSandboxModeEnabled = False
+
+    def __init__(self, url='http://127.0.0.1:8765'):
+        self.url = url.rstrip('/')
+        self.last_response_headers = {}
+        description = self._call('describe')
+        self.id = description['id']
+        self.has = description['has']
+        self.markets = description['markets']
+        self.currencies = {}
+
+    def _call(self, method, *args, **kwargs):
+        request = urllib.request.Request(
+            f'{self.url}/{method}', data=json.dumps({'args': args, 'kwargs': kwargs}).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}, method='POST')
+        try:
+            with urllib.request.urlopen(request) as response:
+                body = json.loads(response.read())
+        except OSError as e:
+            raise ccxt.NetworkError(f'simulator unreachable at {self.url}: {e}') from e
+        if 'error' in body:
+            raise getattr(ccxt, body['error'], ccxt.ExchangeError)(body['message'])
+        return body['result']
+
+    def __getattr__(self, name):
+        if name not in API_METHODS + CONTROL_METHODS:
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self._call(name, *args, **kwargs)
+
+    def set_markets(self, markets, currencies=None):
+        """
+        Kept for the ccxt client surface.
+        """
+        return self.markets
+
+    def set_sandbox_mode(self, enabled):
+        """
+        Kept for the ccxt client surface.
+        """
@@ -0,0 +1,85 @@
+"""
+fast start helpers
+
+- StartupTimer: per-phase wall clock timings of a run (imports, markets, fetch, ...)
+- market metadata cache: ccxt markets / currencies persisted to json with a TTL so a
+  restart does not pay a full load_markets() request before the first order
+"""
+import json
+import logging
+import os
+import time
+
+MARKETS_CACHE_DIR = os.getenv(
+    'MARKETS_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'markets')
+)
+MARKETS_CACHE_TTL = float(os.getenv('MARKETS_CACHE_TTL', 24 * 60 * 60))
+
+class StartupTimer:
+    """
+    mark(name) closes a phase started at the previous mark (or at creation)
+    """
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.phases = []
+
+    def mark(self, name):
+        """
+        End the current phase under `name`.
+        """
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def report(self):
+        """
+        Print and log the phase timings.
+        """
+        total = self.last - self.start
+        line = ', '.join(f'{name} {seconds * 1000:.0f} ms' for name, seconds in self.phases)
+        print(f"startup: {line} (total {total * 1000:.0f} ms)")
+        logging.info("startup: %s (total %.0f ms)", line, total * 1000)
+
+def _markets_cache_path(client):
+    sandbox = '_sandbox' if getattr(client, 'isSandboxModeEnabled', False) else ''
+    return os.path.join(MARKETS_CACHE_DIR, f'{client.id}{sandbox}.json')
+
+def load_cached_markets(client, ttl=MARKETS_CACHE_TTL):
+    """
+    Set the client markets from the local cache when it is younger than ttl seconds.
+    Returns True when the cache was used.
+    """
+    path = _markets_cache_path(client)
+    try:
+        if time.time() - os.path.getmtime(path) > ttl:
+            return False
+        with open(path, encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return False
+    client.set_markets(cached['markets'], cached.get('currencies'))
+    return True
+
+def save_markets(client):
+    """
+    Persist the client markets / currencies to the local cache.
+    """
+    path = _markets_cache_path(client)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'markets': client.markets, 'currencies': client.currencies}, f)
+    os.replace(tmp_path, path)
+
+def ensure_markets(client, ttl=MARKETS_CACHE_TTL):
+    """
+    Make sure the client has its markets: from the cache when fresh, else load_markets() and cache them.
+    """
+    if client.markets:
+        return
+    if load_cached_markets(client, ttl):
+        return
+    client.load_markets()
+    save_markets(client)
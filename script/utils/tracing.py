@@ -0,0 +1,230 @@
+"""
+latency tracing for the live path
+
+span(name) / @traced(name) time a stage with perf_counter_ns and record the duration in an
+in-process histogram per stage: log-linear buckets (8 per power of two, ~4% resolution) from
+1 ns to ~18 minutes, so recording is a log2 and an increment and the memory is fixed.
+trace_client() wraps a ccxt client (sync or async) so every exchange call gets its own
+'exchange.<method>' span.
+
+snapshot() gives count / mean / p50 / p90 / p99 / max per stage in ms, dump() writes it to a
+json file, prometheus_text() renders it for a scrape and serve_metrics() exposes /metrics.
+TRACING=0 in the environment turns every span into a no-op.
+"""
+import asyncio
+import contextlib
+import functools
+import json
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENABLED = os.getenv('TRACING', '1') != '0'
+
+SUB_BUCKETS = 8
+BUCKETS = 40 * SUB_BUCKETS
+QUANTILES = (0.5, 0.9, 0.99)
+
+# ccxt calls traced by trace_client()
+EXCHANGE_CALLS = frozenset((
+    'fetch_ohlcv', 'fetch_ticker', 'fetch_tickers', 'fetch_balance', 'fetch_positions', 'fetch_open_orders',
+    'fetch_time', 'cancel_order', 'cancel_all_orders', 'create_order', 'create_orders', 'load_markets',
+))
+
+class Histogram:
+    """
+    fixed-size log-linear latency histogram (nanoseconds)
+    """
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self._lock = threading.Lock()
+
+    def record(self, ns):
+        """
+        Add one duration in ns.
+        """
+        index = min(int(math.log2(ns) * SUB_BUCKETS), BUCKETS - 1) if ns > 1 else 0
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += ns
+            if ns > self.max:
+                self.max = ns
+
+    def quantile(self, q):
+        """
+        Duration in ns below which a fraction q of the samples fall (bucket midpoint).
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(2 ** ((index + 0.5) / SUB_BUCKETS), self.max)
+        return self.max
+
+    def summary(self):
+        """
+        count, mean, quantiles and max in ms.
+        """
+        if self.count == 0:
+            return {'count': 0}
+        summary = {'count': self.count, 'mean_ms': self.total / self.count / 1e6}
+        for q in QUANTILES:
+            summary[f'p{round(q * 100)}_ms'] = self.quantile(q) / 1e6
+        summary['max_ms'] = self.max / 1e6
+        return summary
+
+_histograms = {}
+_registry_lock = threading.Lock()
+
+def histogram(name):
+    """
+    Histogram of the stage `name` (created on first use).
+    """
+    hist = _histograms.get(name)
+    if hist is None:
+        with _registry_lock:
+            hist = _histograms.setdefault(name, Histogram())
+    return hist
+
+def record(name, ns):
+    """
+    Record one duration of stage `name`.
+    """
+    histogram(name).record(ns)
+
+@contextlib.contextmanager
+def span(name):
+    """
+    with span('stage'): ... records the wall time of the block (exceptions included).
+    """
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter_ns() - start)
+
+def traced(name):
+    """
+    Decorator recording every call of a function (or coroutine function) under `name`.
+    """
+    def decorator(func):
+        if not ENABLED:
+            return func
+        hist = histogram(name)
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter_ns()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    hist.record(time.perf_counter_ns() - start)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                hist.record(time.perf_counter_ns() - start)
+        return wrapper
+    return decorator
+
+class TracedClient:
+    """
+    proxy to a ccxt client recording each exchange call as 'exchange.<method>'
+    """
+    def __init__(self, client):
+        self._client = client
+        self._wrapped = {}
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name not in EXCHANGE_CALLS:
+            return attr
+        wrapped = self._wrapped.get(name)
+        if wrapped is None:
+            wrapped = self._wrapped[name] = traced(f'exchange.{name}')(attr)
+        return wrapped
+
+def trace_client(client):
+    """
+    TracedClient around client (client itself when tracing is off).
+    """
+    return TracedClient(client) if ENABLED else client
+
+def snapshot():
+    """
+    {stage: summary} of every recorded stage.
+    """
+    return {name: hist.summary() for name, hist in sorted(_histograms.items())}
+
+def reset():
+    """
+    Zero every histogram (the decorated functions keep their histogram).
+    """
+    with _registry_lock:
+        for hist in _histograms.values():
+            with hist._lock:
+                hist.counts = [0] * BUCKETS
+                hist.count = hist.total = hist.max = 0
+
+def dump(path):
+    """
+    Write the snapshot as json (atomic replace).
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'time_ms': int(time.time() * 1000), 'stages': snapshot()}, f, indent=2)
+    os.replace(tmp_path, path)
+
+def prometheus_text():
+    """
+    Prometheus exposition of the histograms (summary type, seconds).
+    """
+    lines = ['# TYPE bot_stage_latency_seconds summary']
+    for name, hist in sorted(_histograms.items()):
+        if hist.count == 0:
+            continue
+        for q in QUANTILES:
+            lines.append(f'bot_stage_latency_seconds{{stage="{name}",quantile="{q}"}} {hist.quantile(q) / 1e9:.9f}')
+        lines.append(f'bot_stage_latency_seconds_sum{{stage="{name}"}} {hist.total / 1e9:.9f}')
+        lines.append(f'bot_stage_latency_seconds_count{{stage="{name}"}} {hist.count}')
+    return '\n'.join(lines) + '\n'
+
+def serve_metrics(port=9108, host='127.0.0.1'):
+    """
+    Serve prometheus_text() on http://host:port/metrics from a daemon thread, returns the server.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            data = prometheus_text().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
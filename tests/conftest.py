@@ -0,0 +1,20 @@
+"""
+pytest setup: the modules of script/ are imported as the scripts do (from utils.x / backtest.x),
+caches and stores written by the tests go to a temporary directory
+"""
+import logging
+import os
+import sys
+import tempfile
+
+SCRIPT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'script')
+sys.path.insert(0, SCRIPT_DIR)
+
+# must be set before utils.candle_store / backtest.indicator_cache are imported
+_TMP = tempfile.mkdtemp(prefix='btc-bot-tests-')
+os.environ.setdefault('INDICATOR_CACHE_DIR', os.path.join(_TMP, 'indicators'))
+os.environ.setdefault('CANDLE_STORE_DIR', os.path.join(_TMP, 'candles'))
+os.environ.setdefault('RESULT_STORE_PATH', os.path.join(_TMP, 'results', 'grid_search.sqlite'))
+
+# main.setup_logger() (basicConfig) is then a no-op: importing main / daemon writes no log file
+logging.getLogger().addHandler(logging.NullHandler())
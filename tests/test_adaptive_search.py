@@ -0,0 +1,78 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtest.adaptive_search as adaptive_search
+from backtest.adaptive_search import evaluate, neighbours, rank, successive_halving
+from backtest.backtest_simulation import param_grid
+
+GRID = {
+    'short_window_range': [4, 5, 6], 'long_window_range': [14, 16, 18], 'rsi_window_range': [10, 14, 20],
+    'rsi_buy_threshold_range': [45], 'rsi_sell_threshold_range': [55], 'ma_combinations': [('SMA', 'SMA')],
+}
+
+@pytest.fixture(scope='module')
+def prices():
+    rng = np.random.default_rng(11)
+    index = pd.date_range('2024-01-01', periods=2700, freq='1h')
+    return pd.Series(30000 * np.exp(np.cumsum(rng.normal(0, 0.01, len(index)))), index=index)
+
+@pytest.fixture
+def evaluated(monkeypatch):
+    # (candidates, fraction) of every evaluate call
+    calls = []
+    evaluate = adaptive_search.evaluate
+    def recorded(data, candidates, fraction=1.0, chunk_size=512):
+        calls.append((list(candidates), fraction))
+        return evaluate(data, candidates, fraction, chunk_size)
+    monkeypatch.setattr(adaptive_search, 'evaluate', recorded)
+    return calls
+
+def test_rung_sizes_and_budget(prices, evaluated):
+    results, budget = successive_halving(data=prices, eta=3, min_fraction=1 / 9, min_trades=0, **GRID)
+    # 27 tuples on 1/9 of the history, the best third on 1/3, the best third of those on all of it
+    assert budget == [27, 9, 3]
+    assert [len(candidates) for candidates, _ in evaluated] == budget
+    assert [fraction for _, fraction in evaluated] == pytest.approx([1 / 9, 1 / 3, 1.0])
+    assert len(results) == 3
+    assert list(results.columns[:7]) == ['short_window', 'long_window', 'rsi_window', 'rsi_buy_threshold',
+                                         'rsi_sell_threshold', 'short_type', 'long_type']
+    # every rung keeps survivors of the previous one
+    for (previous, _), (survivors, _) in zip(evaluated, evaluated[1:]):
+        assert set(survivors) <= set(previous)
+
+def test_survivors_are_the_best_of_their_rung(prices, evaluated):
+    successive_halving(data=prices, eta=3, min_fraction=1 / 9, min_trades=0, **GRID)
+    (rung0, fraction), (rung1, _) = evaluated[0], evaluated[1]
+    order = rank(evaluate(prices, rung0, fraction), 'sharpe_ratio', 0)
+    assert set(rung1) == {rung0[i] for i in order[:9]}
+
+def test_sampled_search_stays_in_budget(prices, evaluated):
+    results, budget = successive_halving(data=prices, eta=3, min_fraction=1 / 9, min_trades=0, sample=0.3, seed=1, **GRID)
+    space = set(param_grid(**GRID))
+    tried = [params for candidates, _ in evaluated for params in candidates]
+    assert set(tried) <= space
+    assert len(evaluated[0][0]) == math.ceil(27 * 0.3)
+    # the neighbours added to a rung were never backtested before on it
+    per_fraction = {}
+    for candidates, fraction in evaluated:
+        per_fraction.setdefault(fraction, []).extend(candidates)
+    assert all(len(candidates) == len(set(candidates)) for candidates in per_fraction.values())
+    assert sum(budget) == len(tried)
+    assert 1 <= len(results) <= budget[-1]
+
+def test_rank_puts_undefined_scores_and_few_trades_last():
+    results = [
+        {'sharpe_ratio': 1.0, 'total_trades': 10}, {'sharpe_ratio': np.nan, 'total_trades': 10},
+        {'sharpe_ratio': 3.0, 'total_trades': 2}, {'sharpe_ratio': 2.0, 'total_trades': 10},
+        {'sharpe_ratio': np.inf, 'total_trades': 10}, {'sharpe_ratio': None, 'total_trades': 10},
+    ]
+    assert rank(results, min_trades=5)[:2] == [3, 0]
+    assert set(rank(results, min_trades=5)[2:]) == {1, 2, 4, 5}
+
+def test_neighbours():
+    values = {0: [4, 5, 6], 1: [14, 16]}
+    found = neighbours((4, 16, 14, 45, 55, 'SMA', 'SMA'), values)
+    assert sorted(found) == [(4, 14, 14, 45, 55, 'SMA', 'SMA'), (5, 16, 14, 45, 55, 'SMA', 'SMA')]
@@ -0,0 +1,76 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from backfill import Backfill
+from utils.candle_store import CandleStore, timeframe_to_ms
+
+MINUTE = timeframe_to_ms('1m')
+SYMBOL = 'BTC/USDT'
+
+class Interrupted(Exception):
+    pass
+
+class CandleClient:
+    """
+    exchange with 1m candles from `listed` to `now`, none in `missing`
+    """
+    def __init__(self, listed=0, now=2000 * MINUTE, missing=(), fail_after=None):
+        self.timestamps = [t for t in range(listed, now, MINUTE) if t not in set(missing)]
+        self.fail_after = fail_after
+        self.calls = 0
+
+    async def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=1000):
+        if self.fail_after is not None and self.calls >= self.fail_after:
+            raise Interrupted()
+        self.calls += 1
+        rows = [t for t in self.timestamps if t >= since][:limit]
+        return [[t, t / MINUTE, t / MINUTE + 1, t / MINUTE - 1, t / MINUTE + 0.5, 1.0] for t in rows]
+
+def backfill(store, client):
+    return Backfill(client, store=store, limit=10, window=2)
+
+def stored(store):
+    return np.asarray(store.read(SYMBOL, '1m')['timestamp'])
+
+@pytest.fixture
+def store(tmp_path):
+    return CandleStore(str(tmp_path / 'candles'))
+
+def test_head_tail_and_gaps(store):
+    client = CandleClient(missing=[700 * MINUTE, 701 * MINUTE])
+    asyncio.run(backfill(store, client).backfill(SYMBOL, 500 * MINUTE, 1000 * MINUTE))
+    store.write(SYMBOL, '1m', {column: np.delete(values, np.arange(300, 310)) for column, values in store.read(SYMBOL, '1m').items()})
+    run = backfill(store, client)
+    gaps = asyncio.run(run.backfill(SYMBOL, 100 * MINUTE, 1200 * MINUTE))
+    expected = [t for t in client.timestamps if 100 * MINUTE <= t < 1200 * MINUTE]
+    assert stored(store).tolist() == expected
+    assert store.read(SYMBOL, '1m')['close'][0] == 100.5
+    assert gaps == [(700 * MINUTE, 702 * MINUTE)]
+    assert run.staging.count(SYMBOL, '1m') == 0
+
+def test_interrupted_head_resumes(store):
+    asyncio.run(backfill(store, CandleClient()).backfill(SYMBOL, 1000 * MINUTE, 1100 * MINUTE))
+    # 100 pages of head in windows of 2, interrupted in the 21st window
+    interrupted = CandleClient(fail_after=41)
+    with pytest.raises(Interrupted):
+        asyncio.run(backfill(store, interrupted).backfill(SYMBOL, 0, 1100 * MINUTE))
+    # the store is untouched until the head is complete
+    assert stored(store).tolist() == list(range(1000 * MINUTE, 1100 * MINUTE, MINUTE))
+    client = CandleClient()
+    asyncio.run(backfill(store, client).backfill(SYMBOL, 0, 1100 * MINUTE))
+    assert stored(store).tolist() == list(range(0, 1100 * MINUTE, MINUTE))
+    # only the pages after the 20 staged windows
+    assert client.calls == 100 - 40
+
+def test_interrupted_replace_recovers(store):
+    run = backfill(store, CandleClient())
+    asyncio.run(run.backfill(SYMBOL, 100 * MINUTE, 200 * MINUTE))
+    run.staging.write(SYMBOL, '1m', store.read(SYMBOL, '1m'))
+    # crash between the two renames: the stored candles are gone, the staged ones are complete
+    store.clear(SYMBOL, '1m')
+    client = CandleClient()
+    asyncio.run(backfill(store, client).backfill(SYMBOL, 100 * MINUTE, 200 * MINUTE))
+    assert stored(store).tolist() == list(range(100 * MINUTE, 200 * MINUTE, MINUTE))
+    assert client.calls == 0
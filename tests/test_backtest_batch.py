@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest.backtest_simulation import RESULT_STATS, param_grid, run_backtest_batch, run_backtest_pool
+from test_compute_metrics import assert_stats_close
+
+@pytest.fixture(scope='module')
+def prices():
+    rng = np.random.default_rng(3)
+    index = pd.date_range('2024-01-01', periods=3000, freq='1h')
+    return pd.Series(30000 * np.exp(np.cumsum(rng.normal(0, 0.01, len(index)))), index=index)
+
+def test_batch_matches_pool(prices):
+    combinations = param_grid(
+        short_window_range=[5, 8], long_window_range=[15, 21], rsi_window_range=[14],
+        rsi_buy_threshold_range=[30, 45], rsi_sell_threshold_range=[55, 70], ma_combinations=[('SMA', 'SMA'), ('EMA', 'SMA')],
+    )
+    batched = run_backtest_batch(prices, combinations, chunk_size=7)
+    pooled = run_backtest_pool(prices, combinations, chunk_size=7)
+    assert len(batched) == len(pooled) == len(combinations)
+    for row, expected in zip(batched, pooled):
+        assert {key: row[key] for key in row if key not in RESULT_STATS} == {key: expected[key] for key in expected if key not in RESULT_STATS}
+        assert_stats_close({RESULT_STATS[key]: value for key, value in row.items() if key in RESULT_STATS},
+                           {RESULT_STATS[key]: value for key, value in expected.items() if key in RESULT_STATS})
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+import utils.api as api
+import utils.async_api as async_api
+from utils.ledger import Ledger
+
+SYMBOL = 'BTC/USDT'
+
+def batch_result(entry_id):
+    # entry rejected (no id) or accepted, stop-loss and take-profit accepted
+    return [
+        {'id': entry_id, 'symbol': SYMBOL, 'type': 'MARKET', 'info': {'code': -2019, 'msg': 'Margin is insufficient.'}},
+        {'id': 'sl-1', 'symbol': SYMBOL, 'type': 'STOP_MARKET', 'status': 'open', 'info': {'positionSide': 'LONG'}},
+        {'id': 'tp-1', 'symbol': SYMBOL, 'type': 'TAKE_PROFIT_MARKET', 'status': 'open', 'info': {'positionSide': 'LONG'}},
+    ]
+
+class BatchClient:
+    has = {'createOrders': True}
+
+    def __init__(self, orders):
+        self.orders = orders
+        self.canceled = []
+
+    def create_orders(self, requests):
+        return self.orders
+
+    def cancel_order(self, id, symbol=None):
+        self.canceled.append(id)
+        return {'id': id, 'status': 'canceled'}
+
+class AsyncBatchClient(BatchClient):
+    async def create_orders(self, requests):
+        return self.orders
+
+    async def cancel_order(self, id, symbol=None):
+        return BatchClient.cancel_order(self, id, symbol)
+
+@pytest.fixture
+def ledger(monkeypatch):
+    ledger = Ledger()
+    monkeypatch.setattr(api, 'ledger', ledger)
+    monkeypatch.setattr(async_api, 'ledger', ledger)
+    monkeypatch.setattr(api, 'log_order', lambda order: None)
+    monkeypatch.setitem(api._batch_orders, 'supported', True)
+    return ledger
+
+@pytest.fixture
+def client(monkeypatch):
+    def use(client):
+        previous = api.BinanceClient.use(client)
+        monkeypatch.setattr(async_api, '_async_client', client)
+        return client
+    previous = api.BinanceClient._instance.client if api.BinanceClient._instance is not None else None
+    yield use
+    if previous is not None:
+        api.BinanceClient.use(previous)
+    else:
+        api.BinanceClient._instance = None
+
+def test_rejected_entry_cancels_protective_orders(ledger, client):
+    exchange = client(BatchClient(batch_result(None)))
+    api.place_bracket_order(SYMBOL, 'BUY', 0.01, 'LONG', 90.0, 110.0)
+    assert exchange.canceled == ['sl-1', 'tp-1']
+    assert ledger.open_orders == {}
+    assert 'BTC/USDT' in ledger.stale
+
+def test_accepted_entry_keeps_protective_orders(ledger, client):
+    exchange = client(BatchClient(batch_result('entry-1')))
+    api.place_bracket_order(SYMBOL, 'BUY', 0.01, 'LONG', 90.0, 110.0)
+    assert exchange.canceled == []
+    assert set(ledger.open_orders) == {'sl-1', 'tp-1'}
+
+def test_rejected_entry_cancels_protective_orders_async(ledger, client):
+    exchange = client(AsyncBatchClient(batch_result(None)))
+    asyncio.run(async_api.place_bracket_order_async(SYMBOL, 'BUY', 0.01, 'LONG', 90.0, 110.0))
+    assert sorted(exchange.canceled) == ['sl-1', 'tp-1']
+    assert ledger.open_orders == {}
+    assert 'BTC/USDT' in ledger.stale
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+import vectorbt as vbt
+
+from backtest.backtest_simulation import RESULT_STATS, generate_signals, generate_signals_batch, simulate_batch
+from backtest.indicator_cache import IndicatorCache
+from backtest.metrics import portfolio_stats
+
+RTOL = 1e-9
+# vbt averages the durations as Timedelta (ns rounding), compute_metrics in float
+DURATION_TOLERANCE = pd.Timedelta(1, unit='us')
+
+PARAMS = [
+    (5, 15, 14, 40, 60, 'SMA', 'SMA'),
+    (8, 21, 10, 45, 55, 'EMA', 'SMA'),
+    (12, 26, 20, 50, 50, 'EMA', 'EMA'),
+    (3, 40, 7, 40, 60, 'SMA', 'EMA'),
+]
+
+@pytest.fixture(scope='module')
+def prices():
+    rng = np.random.default_rng(3)
+    index = pd.date_range('2024-01-01', periods=3000, freq='1h')
+    return pd.Series(30000 * np.exp(np.cumsum(rng.normal(0, 0.01, len(index)))), index=index)
+
+def assert_stats_close(ours, expected):
+    for stat in RESULT_STATS.values():
+        if stat == 'Avg Winning Trade Duration':
+            if pd.isna(expected[stat]):
+                assert pd.isna(ours[stat]), stat
+            else:
+                assert abs(ours[stat] - expected[stat]) <= DURATION_TOLERANCE, stat
+        else:
+            np.testing.assert_allclose(float(ours[stat]), float(expected[stat]), rtol=RTOL, equal_nan=True, err_msg=stat)
+
+@pytest.mark.parametrize('params', PARAMS, ids=lambda params: '-'.join(map(str, params)))
+def test_compute_metrics_matches_vbt_stats(prices, params):
+    short_window, long_window, rsi_window, rsi_buy, rsi_sell, short_type, long_type = params
+    entries, exits = generate_signals(prices, short_window, long_window, rsi_window, rsi_buy, rsi_sell, short_type, long_type,
+                                      cache=IndicatorCache(directory=None))
+    portfolio = vbt.Portfolio.from_signals(prices, entries=entries, exits=exits, size=1.0, fees=0.001, freq='1h')
+    expected = portfolio.stats()
+    assert expected['Total Trades'] > 0
+    assert_stats_close(portfolio_stats(portfolio).iloc[0], expected)
+
+def test_compute_metrics_per_column_matches_vbt_stats(prices):
+    entries, exits = generate_signals_batch(prices, PARAMS, cache=IndicatorCache(directory=None))
+    columns = pd.RangeIndex(len(PARAMS))
+    portfolio = vbt.Portfolio.from_signals(
+        prices, entries=pd.DataFrame(entries, index=prices.index, columns=columns),
+        exits=pd.DataFrame(exits, index=prices.index, columns=columns), size=1.0, fees=0.001, freq='1h'
+    )
+    stats = simulate_batch(prices, entries, exits)
+    for column in columns:
+        assert_stats_close(stats.iloc[column], portfolio.stats(column=column))
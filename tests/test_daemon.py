@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+import daemon
+from utils.ledger import Ledger
+
+HOUR = 60 * 60 * 1000
+
+class Exchange:
+    def fetch_balance(self):
+        return {'USDT': {'free': 1000.0, 'used': 0.0, 'total': 1000.0}}
+
+    def fetch_positions(self):
+        return []
+
+class FakeTime:
+    """
+    exchange clock of the daemon, sleeps return at once
+    """
+    def __init__(self, now_ms):
+        self.now_ms = now_ms
+
+    def seconds(self):
+        return self.now_ms / 1000
+
+@pytest.fixture
+def replay(monkeypatch):
+    clock = FakeTime(1000 * HOUR + 5 * 60 * 1000)
+    ledger = Ledger(reconcile_interval=300, clock=clock.seconds)
+    exchange = Exchange()
+    monkeypatch.setattr(daemon, 'ledger', ledger)
+    monkeypatch.setattr(daemon, 'binance_futures_testnet', exchange)
+    monkeypatch.setattr(daemon, 'dump', lambda path: None)
+    monkeypatch.setattr(daemon.TradingDaemon, 'sync_clock', lambda self: None)
+    monkeypatch.setattr(daemon.TradingDaemon, 'now_ms', lambda self: clock.now_ms)
+
+    async def sleep_until(self, time_ms):
+        clock.now_ms = max(clock.now_ms, time_ms)
+        return self.stop_event.is_set()
+    monkeypatch.setattr(daemon.TradingDaemon, 'sleep_until', sleep_until)
+    return clock, ledger
+
+def run(cycles, cycle, timeframe='1h'):
+    calls = []
+
+    async def one_cycle():
+        calls.append(cycle())
+        if len(calls) == cycles:
+            bot.stop_event.set()
+    bot = daemon.TradingDaemon('prod', timeframe=timeframe, cycle=one_cycle)
+    asyncio.run(bot.run())
+    return calls
+
+@pytest.mark.parametrize('timeframe', ['1h', '1m', '4h'])
+def test_signals_are_sized_from_memory(replay, timeframe):
+    clock, ledger = replay
+    # the signal comes a few seconds after the candle close
+    def cycle():
+        clock.now_ms += 3000
+        return ledger.needs_reconcile()
+    assert run(18, cycle, timeframe) == [False] * 18
+    assert ledger.reconciles >= 1
+
+def test_stale_ledger_reconciled_after_the_cycle(replay):
+    clock, ledger = replay
+    def cycle():
+        stale = ledger.needs_reconcile()
+        # orders of the cycle whose fill is unknown
+        ledger.invalidate('BTC/USDT')
+        return stale
+    assert run(3, cycle) == [False] * 3
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtest.backtest_simulation as backtest
+from utils.candle_store import CandleStore, timeframe_to_ms
+
+MINUTE = timeframe_to_ms('1m')
+START, END = '2024-01-01', '2024-01-03'
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setitem(backtest.HISTORY_RANGES, '1h', (START, END))
+    # Yahoo must not be asked when the 1m candles cover the range
+    monkeypatch.setattr(backtest, 'download_history', lambda *args: pytest.fail('downloaded from Yahoo'))
+    return CandleStore(str(tmp_path / 'candles'))
+
+def write_minutes(store, symbol, start, end):
+    timestamps = np.arange(pd.Timestamp(start, tz='UTC').value // 10**6, pd.Timestamp(end, tz='UTC').value // 10**6, MINUTE)
+    prices = 100 + np.arange(len(timestamps), dtype=np.float64)
+    store.write(symbol, '1m', {'timestamp': timestamps, 'open': prices, 'high': prices + 1, 'low': prices - 1, 'close': prices, 'volume': np.ones(len(timestamps))})
+
+def test_base_symbol():
+    assert backtest.base_symbol('BTC-USD') == 'BTC/USDT'
+    assert backtest.base_symbol('ETH-USD') == 'ETH/USDT'
+    assert backtest.base_symbol('BTC/USDT') == 'BTC/USDT'
+
+def test_resampled_from_backfilled_candles(store):
+    write_minutes(store, 'BTC/USDT', START, END)
+    candles = backtest.fetch_historical_candles('BTC-USD', store=store, timeframe='1h')
+    assert len(candles) == 48
+    last = candles.iloc[-1]
+    assert (last['Open'], last['Close'], last['Volume']) == (100 + 47 * 60, 100 + 48 * 60 - 1, 60)
+
+def test_store_ending_early_is_not_resampled(store, monkeypatch):
+    # one bar short: the last 1h bar would only hold the candles of its first minutes
+    write_minutes(store, 'BTC/USDT', START, pd.Timestamp(END) - pd.Timedelta(minutes=55))
+    downloads = []
+    monkeypatch.setattr(backtest, 'download_history', lambda *args: downloads.append(args) or store.read('BTC-USD', '1h'))
+    backtest.fetch_historical_candles('BTC-USD', store=store, timeframe='1h')
+    assert len(downloads) == 1
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest.backtest_simulation import generate_signals
+from backtest.indicator_cache import IndicatorCache, dataset_key
+
+def prices(n=300, seed=0):
+    return 100 + np.cumsum(np.random.default_rng(seed).normal(size=n))
+
+@pytest.mark.parametrize('index', [
+    pd.RangeIndex(300),
+    pd.date_range('2024-01-01', periods=300, freq='1h'),
+    pd.date_range('2024-01-01', periods=300, freq='1h', tz='UTC'),
+    pd.Index(np.arange(300) * 10),
+], ids=['range', 'datetime', 'datetime-tz', 'int'])
+def test_dataset_key_index_kinds(index):
+    data = pd.Series(prices(), index=index)
+    key = dataset_key(data)
+    assert key == dataset_key(data.copy())
+    assert key != dataset_key(data * 1.01)
+    assert key != dataset_key(pd.Series(data.values, index=index[::-1]))
+
+def test_dataset_key_datetime_unchanged():
+    # keys of DatetimeIndex series are the ones already used by the caches / result stores
+    import hashlib
+    data = pd.Series(prices(), index=pd.date_range('2024-01-01', periods=300, freq='1h'))
+    digest = hashlib.sha1(data.values.astype(np.float64).tobytes())
+    digest.update(data.index.asi8.tobytes())
+    assert dataset_key(data) == digest.hexdigest()[:16]
+
+def test_range_and_datetime_index_differ():
+    values = prices()
+    assert dataset_key(pd.Series(values)) != dataset_key(pd.Series(values, index=pd.date_range('2024-01-01', periods=300, freq='1h')))
+
+@pytest.mark.parametrize('index', [pd.RangeIndex(300), pd.date_range('2024-01-01', periods=300, freq='1h')], ids=['range', 'datetime'])
+def test_generate_signals_any_index(index):
+    data = pd.Series(prices(), index=index)
+    entries, exits = generate_signals(data, cache=IndicatorCache(directory=None))
+    assert entries.index.equals(index) and exits.index.equals(index)
+    assert entries.dtype == bool and exits.dtype == bool
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+import vectorbt as vbt
+
+from utils.indicators import EMA, RSI, SMA, SignalEngine
+from utils.signals import generate_signals
+
+# relative tolerance of the streamed values against pandas / vectorbt (the arithmetic is the same)
+RTOL = 1e-9
+
+def random_walk(n, seed=42):
+    rng = np.random.default_rng(seed)
+    return 100000 + np.cumsum(rng.normal(0, 250, n))
+
+def candles(closes, start=0, step=60 * 60 * 1000):
+    timestamps = start + step * np.arange(len(closes))
+    return pd.DataFrame({'timestamp': pd.to_datetime(timestamps, unit='ms'), 'close': closes})
+
+@pytest.mark.parametrize('window', [5, 8, 14, 25])
+def test_streaming_indicators_match_pandas_and_vbt(window):
+    closes = pd.Series(random_walk(5000))
+    sma, ema, rsi = SMA(window), EMA(window), RSI(window)
+    streamed = np.array([[sma.update(c), ema.update(c), rsi.update(c)] for c in closes])
+    expected = np.column_stack([
+        closes.rolling(window).mean(),
+        closes.ewm(span=window, adjust=False).mean(),
+        vbt.RSI.run(closes, window=window).rsi,
+    ])
+    np.testing.assert_allclose(streamed, expected, rtol=RTOL, equal_nan=True)
+
+@pytest.mark.parametrize('params', [
+    {},
+    {'short_window': 5, 'long_window': 20, 'rsi_window': 10, 'rsi_buy_threshold': 45, 'rsi_sell_threshold': 55},
+])
+def test_engine_replay_matches_generate_signals(tmp_path, params):
+    # live loop: a window of the last 50 candles every cycle, the open candle seen before it closes,
+    # the engine saved and reloaded (bot restart) every 100 candles
+    closes = random_walk(2000, seed=7)
+    df = candles(closes)
+    path = str(tmp_path / 'engine.json')
+    engine = SignalEngine(**params)
+    signals = {'BUY': 0, 'SELL': 0}
+    for end in range(2, len(df) + 1):
+        window = df.iloc[max(0, end - 50):end].reset_index(drop=True)
+        # open candle: a partial close first, then the final one
+        partial = window.copy()
+        partial.loc[partial.index[-1], 'close'] = closes[end - 1] * 1.001
+        generate_signals(partial, engine=engine, **params)
+        _, streamed = generate_signals(window, engine=engine, **params)
+        recomputed, expected = generate_signals(window.copy(), **params)
+        assert streamed == expected, f"candle {end - 1}"
+        latest = recomputed.iloc[-1]
+        np.testing.assert_allclose(
+            [engine.ma_short.value, engine.ma_long.value, engine.rsi.value],
+            [latest['MA_short'], latest['MA_long'], latest['RSI']],
+            rtol=RTOL, equal_nan=True,
+        )
+        if expected:
+            signals[expected] += 1
+        if end % 100 == 0:
+            engine.save(path)
+            engine = SignalEngine.load(path, **params)
+    assert signals['BUY'] and signals['SELL']
+
+def test_engine_load_with_other_params_starts_fresh(tmp_path):
+    path = str(tmp_path / 'engine.json')
+    engine = SignalEngine()
+    for i, close in enumerate(random_walk(100)):
+        engine.update(i, close)
+    engine.save(path)
+    assert SignalEngine.load(path).last_timestamp == 99
+    assert SignalEngine.load(path, short_window=5).last_timestamp is None
@@ -0,0 +1,129 @@
+import os
+import time
+
+import pytest
+
+import utils.journal as journal_module
+from utils.journal import EventJournal, journal_files, read_journal
+
+def lines(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read().splitlines()
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'logs' / 'journal.jsonl')
+
+def test_events_written_in_batches(path, monkeypatch):
+    journal = EventJournal(path, batch_size=100, flush_interval=0.05)
+    batches = []
+    write = journal._write
+    monkeypatch.setattr(journal, '_write', lambda batch: batches.append(len(batch)) or write(batch))
+    for i in range(1000):
+        journal.record('order', order_id=i)
+    assert journal.flush(timeout=5)
+    journal.close()
+    assert sum(batches) == 1000 and max(batches) <= 100
+    df = read_journal(path, event='order')
+    assert df['order_id'].tolist() == list(range(1000))
+
+def test_rotation_keeps_backup_count_files(path):
+    journal = EventJournal(path, max_bytes=2000, backup_count=2, batch_size=10, flush_interval=0.05)
+    for i in range(300):
+        journal.record('order', order_id=i)
+        if i % 10 == 9:
+            journal.flush()
+    journal.close()
+    files = journal_files(path)
+    assert files == [path + '.2', path + '.1', path]
+    assert all(os.path.getsize(file) <= 2000 for file in files)
+    ids = read_journal(path)['order_id'].tolist()
+    # the oldest files were dropped, the rest is contiguous up to the last event
+    assert ids == list(range(ids[0], 300))
+
+def test_flush_without_events_and_after_close(path):
+    journal = EventJournal(path)
+    assert journal.flush()
+    journal.record('order', order_id=1)
+    journal.close()
+    assert journal.flush()
+    assert len(lines(path)) == 1
+
+def test_write_error_is_retried(path, monkeypatch):
+    journal = EventJournal(path, flush_interval=0.05, write_retries=3)
+    failures = []
+    write = journal._write
+    def flaky(batch):
+        if len(failures) < 2:
+            failures.append(len(batch))
+            raise OSError(28, 'No space left on device')
+        write(batch)
+    monkeypatch.setattr(journal, '_write', flaky)
+    journal.record('order', order_id=1)
+    assert journal.flush(timeout=5)
+    journal.record('order', order_id=2)
+    assert journal.flush(timeout=5)
+    journal.close()
+    # the failed event is retried along with the next one
+    assert failures == [1, 2]
+    assert read_journal(path)['order_id'].tolist() == [1, 2]
+    assert journal.dropped == 0
+
+def test_persistent_write_error_drops_and_keeps_the_writer_alive(path, monkeypatch):
+    journal = EventJournal(path, flush_interval=0.05, write_retries=2)
+    write = journal._write
+    def broken(batch):
+        raise PermissionError(13, 'Permission denied')
+    monkeypatch.setattr(journal, '_write', broken)
+    journal.record('order', order_id=1)
+    journal.record('order', order_id=2)
+    assert journal.flush(timeout=5)
+    deadline = time.monotonic() + 5
+    while journal.dropped < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert journal.dropped == 2
+    assert journal.thread.is_alive()
+    monkeypatch.setattr(journal, '_write', write)
+    journal.record('order', order_id=3)
+    assert journal.flush(timeout=5)
+    journal.close()
+    assert read_journal(path)['order_id'].tolist() == [3]
+
+def test_flush_returns_when_the_writer_is_gone(path, monkeypatch):
+    journal = EventJournal(path, flush_interval=0.05)
+    journal.record('order', order_id=1)
+    journal.close()
+    # a writer thread that died: flush must not wait forever
+    journal.thread = journal_module.threading.Thread(target=lambda: None)
+    journal.thread.start()
+    journal.thread.join()
+    assert journal.flush() is False
+
+def test_interval_fsync_when_idle(path, monkeypatch):
+    synced = []
+    fsync = os.fsync
+    monkeypatch.setattr(journal_module.os, 'fsync', lambda fd: synced.append(fd) or fsync(fd))
+    journal = EventJournal(path, fsync='interval', fsync_interval=3600, flush_interval=0.05)
+    journal.record('order', order_id=1)
+    assert journal.flush(timeout=5)
+    # first batch: fsynced, none for an hour after
+    assert len(synced) == 1
+    journal.record('order', order_id=2)
+    assert journal.flush(timeout=5)
+    deadline = time.monotonic() + 5
+    while len(synced) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # the queue went idle: the second batch is synced without waiting for the interval
+    assert len(synced) == 2
+    journal.close()
+    assert len(synced) == 2
+
+def test_interval_fsync_on_close(path, monkeypatch):
+    synced = []
+    monkeypatch.setattr(journal_module.os, 'fsync', lambda fd: synced.append(fd))
+    journal = EventJournal(path, fsync='interval', fsync_interval=3600, flush_interval=60)
+    journal._last_fsync = time.monotonic()
+    journal.record('order', order_id=1)
+    journal.close()
+    assert len(synced) == 1
+    assert len(lines(path)) == 1
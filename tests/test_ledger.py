@@ -0,0 +1,136 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from utils.ledger import Ledger
+
+SYMBOL = 'BTC/USDT'
+HOUR = 60 * 60 * 1000
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class Exchange:
+    """
+    fetch_balance / fetch_positions of a flat account with 10x leverage
+    """
+    def __init__(self, free=1000.0, delay=0.0):
+        self.free = free
+        self.delay = delay
+        self.calls = 0
+
+    def fetch_balance(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return {'USDT': {'free': self.free, 'used': 0.0, 'total': self.free}}
+
+    def fetch_positions(self):
+        return [{'symbol': SYMBOL + ':USDT', 'side': side, 'contracts': 0, 'entryPrice': 0, 'leverage': 10} for side in ('long', 'short')]
+
+def market_order(side, position_side, filled, price, fee=0.0):
+    return {'id': f'{side}-{filled}-{price}', 'symbol': SYMBOL + ':USDT', 'type': 'market', 'side': side.lower(),
+            'filled': filled, 'average': price, 'fee': {'cost': fee}, 'info': {'positionSide': position_side}}
+
+def trigger_order(order_id, order_type, side, stop, timestamp=0, position_side='LONG'):
+    return {'id': order_id, 'symbol': SYMBOL + ':USDT', 'type': order_type, 'side': side, 'status': 'open',
+            'stopPrice': stop, 'timestamp': timestamp, 'info': {'positionSide': position_side, 'closePosition': True}}
+
+def candles(lows, highs, start=0):
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime([start + i * HOUR for i in range(len(lows))], unit='ms'),
+        'low': lows, 'high': highs,
+    })
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+@pytest.fixture
+def ledger(clock):
+    ledger = Ledger(reconcile_interval=300, clock=clock)
+    ledger.reconcile(Exchange())
+    return ledger
+
+def test_fills_move_position_margin_and_pnl(ledger):
+    ledger.apply_order(market_order('BUY', 'LONG', 2.0, 100.0, fee=0.08))
+    assert ledger.position_quantities(SYMBOL) == (2.0, 0.0)
+    # margin of 2 * 100 / 10 and the fee
+    assert ledger.free() == pytest.approx(1000 - 20 - 0.08)
+    ledger.apply_order(market_order('BUY', 'LONG', 2.0, 110.0))
+    assert ledger.positions[(SYMBOL, 'LONG')]['entry_price'] == pytest.approx(105.0)
+    ledger.apply_order(market_order('SELL', 'LONG', 4.0, 120.0, fee=0.2))
+    assert ledger.position_quantities(SYMBOL) == (0.0, 0.0)
+    # margin back, pnl (120 - 105) * 4, both fees
+    assert ledger.free() == pytest.approx(1000 + 60 - 0.08 - 0.2)
+    assert ledger.balance['used'] == pytest.approx(0.0)
+    assert not ledger.needs_reconcile(SYMBOL)
+
+def test_fill_without_price_marks_stale(ledger):
+    order = market_order('BUY', 'LONG', 1.0, None)
+    ledger.apply_order(order)
+    assert ledger.needs_reconcile(SYMBOL)
+    assert not ledger.needs_reconcile('ETH/USDT')
+
+def test_close_position_orders_expire_when_flat(ledger):
+    ledger.apply_order(market_order('BUY', 'LONG', 1.0, 100.0))
+    ledger.apply_order(trigger_order('sl', 'STOP_MARKET', 'sell', 93.0))
+    ledger.apply_order(trigger_order('tp', 'TAKE_PROFIT_MARKET', 'sell', 105.0))
+    assert set(ledger.open_orders) == {'sl', 'tp'}
+    ledger.apply_order(market_order('SELL', 'LONG', 1.0, 101.0))
+    assert ledger.open_orders == {}
+
+def test_close_position_orders_expire_on_flat_reload(ledger):
+    ledger.apply_order(trigger_order('sl', 'STOP_MARKET', 'sell', 93.0))
+    ledger.reconcile(Exchange())
+    assert ledger.open_orders == {}
+
+def test_observe_candles_marks_touched_triggers_stale(ledger):
+    ledger.apply_order(market_order('BUY', 'LONG', 1.0, 100.0))
+    ledger.apply_order(trigger_order('sl', 'STOP_MARKET', 'sell', 93.0, timestamp=2 * HOUR + 1))
+    ledger.apply_order(trigger_order('tp', 'TAKE_PROFIT_MARKET', 'sell', 105.0, timestamp=2 * HOUR + 1))
+    # the low of 90 is before the orders were placed (candle 0 closes before them)
+    assert not ledger.observe_candles(SYMBOL, candles([90, 95, 96, 97], [101, 102, 103, 104]))
+    assert not ledger.needs_reconcile(SYMBOL)
+    assert ledger.observe_candles(SYMBOL, candles([90, 95, 96, 97], [101, 102, 103, 106]))
+    assert set(ledger.open_orders) == {'sl'}
+    assert ledger.needs_reconcile(SYMBOL)
+
+def test_observe_candles_short_stop_triggers_upwards(ledger):
+    ledger.apply_order(trigger_order('sl', 'STOP_MARKET', 'buy', 107.0, position_side='SHORT'))
+    assert not ledger.observe_candles(SYMBOL, candles([90, 95], [106, 106.5]))
+    assert ledger.observe_candles(SYMBOL, candles([90, 95], [106, 107]))
+
+def test_reconcile_interval(ledger, clock):
+    assert not ledger.needs_reconcile()
+    clock.now += 299
+    assert not ledger.needs_reconcile()
+    # due within the next 2 seconds: a reconcile ahead of the next decision
+    assert ledger.needs_reconcile(within=2)
+    clock.now += 1
+    assert ledger.needs_reconcile()
+    assert Ledger().needs_reconcile()
+
+def test_invalidate(ledger):
+    ledger.invalidate(SYMBOL + ':USDT')
+    assert ledger.needs_reconcile(SYMBOL) and not ledger.needs_reconcile('ETH/USDT')
+    ledger.invalidate()
+    assert ledger.needs_reconcile('ETH/USDT')
+    assert ledger.ensure_fresh(Exchange())
+    assert not ledger.needs_reconcile()
+
+def test_ensure_fresh_waits_for_a_reconcile_in_progress():
+    ledger = Ledger()
+    exchange = Exchange(delay=0.2)
+    threads = [threading.Thread(target=ledger.ensure_fresh, args=(exchange,)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert exchange.calls == 1
+    assert ledger.free() == 1000.0
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest.backtest_simulation import grid_search, live_dataset_key, param_grid, run_live_batch
+from backtest.result_store import ResultStore
+
+GRID = {
+    'short_window_range': [5, 8], 'long_window_range': [15], 'rsi_window_range': [14],
+    'rsi_buy_threshold_range': [45], 'rsi_sell_threshold_range': [55], 'ma_combinations': [('SMA', 'SMA'), ('EMA', 'SMA')],
+}
+RULES = {'stop_loss_pct': 2, 'take_profit_pct': 3, 'leverage': 10}
+
+@pytest.fixture(scope='module')
+def candles():
+    rng = np.random.default_rng(5)
+    index = pd.date_range('2024-01-01', periods=1500, freq='1h', tz='UTC', name='Date')
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.01, len(index))))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.004, len(index))) * close
+    return pd.DataFrame({'Open': open_, 'High': np.maximum(open_, close) + spread, 'Low': np.minimum(open_, close) - spread,
+                         'Close': close, 'Volume': np.ones(len(index))}, index=index)
+
+def test_live_dataset_key(candles):
+    key = live_dataset_key(candles)
+    assert key.endswith('-live')
+    assert key == live_dataset_key(candles.copy(), {'stop_loss_pct': 7})
+    assert key != live_dataset_key(candles, RULES)
+    wider = candles.copy()
+    wider['High'] *= 1.01
+    assert key != live_dataset_key(wider)
+    with pytest.raises(TypeError):
+        live_dataset_key(candles, {'stop_los_pct': 2})
+
+def test_grid_search_live_rules(candles, tmp_path):
+    store = ResultStore(str(tmp_path / 'results.sqlite'))
+    combinations = param_grid(**GRID)
+    results = grid_search(data=candles, store=store, live=True, rules=RULES, **GRID)
+    expected = pd.DataFrame(run_live_batch(candles, combinations, **RULES))
+    pd.testing.assert_series_equal(results['total_return'], expected['total_return'], check_names=False)
+    defaults = grid_search(data=candles, store=store, live=True, **GRID)
+    assert not np.allclose(defaults['total_return'], results['total_return'])
+    # the rows of both rule sets are kept apart and reused
+    assert len(store.pending(live_dataset_key(candles, RULES), combinations)) == 0
+    assert len(store.pending(live_dataset_key(candles), combinations)) == 0
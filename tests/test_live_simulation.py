@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest.backtest_simulation import crossover_signals_batch, generate_signals_batch
+from backtest.indicator_cache import IndicatorCache
+from utils.indicators import SignalEngine
+from utils.signals import crossover_signal
+
+PARAMS = [
+    (8, 14, 14, 45, 55, 'SMA', 'SMA'),
+    (5, 20, 10, 48, 52, 'SMA', 'SMA'),
+    (8, 21, 14, 50, 50, 'EMA', 'SMA'),
+]
+
+@pytest.fixture(scope='module')
+def close():
+    rng = np.random.default_rng(11)
+    index = pd.date_range('2024-01-01', periods=3000, freq='1h')
+    return pd.Series(30000 * np.exp(np.cumsum(rng.normal(0, 0.01, len(index)))), index=index)
+
+def engine_signals(close, params):
+    short_window, long_window, rsi_window, rsi_buy, rsi_sell, short_type, long_type = params
+    engine = SignalEngine(short_window, long_window, rsi_window, rsi_buy, rsi_sell, short_type, long_type)
+    return [engine.update(t, value) for t, value in enumerate(close.values)]
+
+def test_crossover_signals_match_the_live_engine(close):
+    cache = IndicatorCache(directory=None)
+    buy, sell = crossover_signals_batch(close, PARAMS, cache=cache)
+    assert not (buy & sell).any()
+    for column, params in enumerate(PARAMS):
+        short_window, long_window, rsi_window, rsi_buy, rsi_sell, short_type, long_type = params
+        ma_short = cache.moving_average(close, short_window, short_type)
+        ma_long = cache.moving_average(close, long_window, long_type)
+        rsi = cache.rsi(close, rsi_window)
+        live = [None] + [crossover_signal(ma_short[t - 1], ma_long[t - 1], ma_short[t], ma_long[t], rsi[t], rsi_buy, rsi_sell)
+                         for t in range(1, len(close))]
+        batch = np.where(buy[:, column], 'BUY', np.where(sell[:, column], 'SELL', None)).tolist()
+        assert batch == live
+        assert batch == engine_signals(close, params)
+        assert live.count('BUY') and live.count('SELL')
+
+def test_crossover_signals_only_on_the_crossing_candle(close):
+    # the entry / exit conditions of the vectorbt backtest hold on more candles than the crosses
+    buy, sell = crossover_signals_batch(close, PARAMS[:1], cache=IndicatorCache(directory=None))
+    entries, exits = generate_signals_batch(close, PARAMS[:1], cache=IndicatorCache(directory=None))
+    assert (entries[buy]).all() and (exits[sell]).all()
+    onsets = entries[1:] & ~entries[:-1]
+    assert buy.sum() < onsets.sum()
@@ -0,0 +1,91 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+import utils.api as api
+import utils.async_api as async_api
+from utils.candle_store import CandleStore, timeframe_to_ms
+from utils.simulator import AsyncSimulatedExchange, SimulatedExchange, synthetic_ohlcv
+
+SYMBOL = 'BTC/USDT'
+HOUR = timeframe_to_ms('1h')
+LIMIT = 50
+
+@pytest.fixture
+def exchange(tmp_path, monkeypatch):
+    store = CandleStore(str(tmp_path / 'candles'))
+    monkeypatch.setattr(api, 'candle_store', store)
+    monkeypatch.setattr(async_api, 'candle_store', store)
+    monkeypatch.setattr(api, 'candle_rings', {})
+    monkeypatch.setattr(api, 'OHLCV_BASE_TIMEFRAME', None)
+    monkeypatch.setattr(async_api, 'OHLCV_BASE_TIMEFRAME', None)
+    exchange = SimulatedExchange('1h')
+    candles = synthetic_ohlcv(1000)
+    exchange.add_candles(SYMBOL, candles)
+    exchange.requests = []
+    fetch_ohlcv = exchange.fetch_ohlcv
+    def counted(*args, **kwargs):
+        exchange.requests.append(kwargs.get('since'))
+        return fetch_ohlcv(*args, **kwargs)
+    exchange.fetch_ohlcv = counted
+    exchange.start = int(candles[0, 0])
+    previous = api.BinanceClient.use(exchange)
+    monkeypatch.setattr(async_api, '_async_client', AsyncSimulatedExchange(exchange))
+    yield exchange
+    if previous is not None:
+        api.BinanceClient.use(previous)
+    else:
+        api.BinanceClient._instance = None
+
+def contiguous(df):
+    return bool((df['timestamp'].diff().dropna() == np.timedelta64(HOUR, 'ms')).all())
+
+FETCHES = {
+    'fetch_ohlcv': lambda: api.fetch_ohlcv(SYMBOL, '1h', LIMIT),
+    'fetch_candles': lambda: api.fetch_candles(SYMBOL, '1h', LIMIT),
+    'fetch_ohlcv_async': lambda: asyncio.run(async_api.fetch_ohlcv_async(SYMBOL, '1h', LIMIT)),
+    'fetch_candles_async': lambda: asyncio.run(async_api.fetch_candles_async(SYMBOL, '1h', LIMIT)),
+}
+
+@pytest.mark.parametrize('fetch', FETCHES)
+def test_store_far_behind_is_caught_up_without_a_hole(exchange, fetch):
+    exchange.seek(exchange.start + 99 * HOUR)
+    FETCHES[fetch]()
+    assert exchange.requests == [None]
+    # down for 200 candles: 4 pages of LIMIT from the last stored candle
+    exchange.seek(exchange.start + 299 * HOUR)
+    exchange.requests.clear()
+    result = FETCHES[fetch]()
+    assert exchange.requests[0] == exchange.start + 99 * HOUR
+    assert len(exchange.requests) == 5
+    stored = api.candle_store.to_frame(SYMBOL, '1h')
+    assert len(stored) == 250 and contiguous(stored)
+    assert stored['timestamp'].iloc[-1].value // 10**6 == exchange.start + 299 * HOUR
+    if fetch.startswith('fetch_ohlcv'):
+        assert len(result) == LIMIT and contiguous(result)
+        assert result['close'].iloc[-1] == exchange.fetch_ticker(SYMBOL)['last']
+    else:
+        assert np.all(np.diff(result.column('timestamp', LIMIT)) == HOUR)
+        assert result.column('close', 1)[0] == exchange.fetch_ticker(SYMBOL)['last']
+
+@pytest.mark.parametrize('fetch', FETCHES)
+def test_store_up_to_date_is_one_request(exchange, fetch):
+    exchange.seek(exchange.start + 99 * HOUR)
+    FETCHES[fetch]()
+    for _ in range(3):
+        exchange.step()
+        exchange.requests.clear()
+        FETCHES[fetch]()
+        assert len(exchange.requests) == 1
+    assert contiguous(api.candle_store.to_frame(SYMBOL, '1h'))
+    assert api.candle_store.count(SYMBOL, '1h') == LIMIT + 3
+
+def test_few_old_candles_are_caught_up(exchange):
+    # fewer than LIMIT stored long ago: the new window must not leave a hole after them
+    exchange.seek(exchange.start + 9 * HOUR)
+    api.candle_store.write(SYMBOL, '1h', exchange.fetch_ohlcv(SYMBOL, '1h'))
+    exchange.seek(exchange.start + 199 * HOUR)
+    df = api.fetch_ohlcv(SYMBOL, '1h', LIMIT)
+    assert len(df) == LIMIT and contiguous(df)
+    assert api.candle_store.count(SYMBOL, '1h') == 200 and contiguous(api.candle_store.to_frame(SYMBOL, '1h'))
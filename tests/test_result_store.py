@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtest.backtest_simulation as backtest
+from backtest.backtest_simulation import dataset_key, grid_search, param_grid
+from backtest.result_store import PARAM_COLUMNS, ResultStore
+
+GRID = {
+    'short_window_range': [5, 8], 'long_window_range': [15, 21], 'rsi_window_range': [14],
+    'rsi_buy_threshold_range': [45], 'rsi_sell_threshold_range': [55], 'ma_combinations': [('SMA', 'SMA'), ('EMA', 'SMA')],
+}
+
+@pytest.fixture(scope='module')
+def prices():
+    rng = np.random.default_rng(13)
+    index = pd.date_range('2024-01-01', periods=1500, freq='1h')
+    return pd.Series(30000 * np.exp(np.cumsum(rng.normal(0, 0.01, len(index)))), index=index)
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultStore(str(tmp_path / 'results.sqlite'))
+    yield store
+    store.close()
+
+def row(params, **stats):
+    return {**dict(zip(PARAM_COLUMNS, params)), 'total_return': 1.5, 'total_trades': 4, **stats}
+
+def test_results_for_round_trip(store):
+    params = [(5, 15, 14, 45, 55, 'SMA', 'SMA'), (8, 21, 14, 45, 55, 'EMA', 'SMA')]
+    duration = pd.Timedelta(hours=3, nanoseconds=7)
+    store.write('data', [
+        row(params[0], sharpe_ratio=np.nan, profit_factor=np.inf, avg_win_trade_duration=duration),
+        row(params[1], sharpe_ratio=np.float64(0.25), total_trades=np.int64(0), avg_win_trade_duration=pd.NaT),
+    ])
+    # NaN / NaT are NULL in the database
+    nulls = store.connection.execute(
+        'SELECT sharpe_ratio IS NULL, avg_win_trade_duration IS NULL FROM results ORDER BY short_window').fetchall()
+    assert nulls == [(1, 0), (0, 1)]
+    # in the order asked, the ones not stored left out
+    results = store.results_for('data', [params[1], (6, 15, 14, 45, 55, 'SMA', 'SMA'), params[0]])
+    assert [tuple(values) for values in results[list(PARAM_COLUMNS)].itertuples(index=False)] == [params[1], params[0]]
+    assert results['avg_win_trade_duration'].dtype == 'timedelta64[ns]'
+    assert results['avg_win_trade_duration'].iloc[1] == duration
+    assert pd.isna(results['avg_win_trade_duration'].iloc[0])
+    assert np.isnan(results['sharpe_ratio'].iloc[1]) and results['sharpe_ratio'].iloc[0] == 0.25
+    assert results['profit_factor'].iloc[1] == np.inf
+    assert results['total_trades'].tolist() == [0, 4]
+    assert results['short_type'].tolist() == ['EMA', 'SMA']
+    assert store.results_for('other', params).empty
+
+def test_write_replaces_a_stored_tuple(store):
+    params = (5, 15, 14, 45, 55, 'SMA', 'SMA')
+    store.write('data', [row(params, total_return=1.0)])
+    store.write('data', [row(params, total_return=2.0)])
+    assert store.load('data')['total_return'].tolist() == [2.0]
+    assert store.pending('data', [params, (8, 15, 14, 45, 55, 'SMA', 'SMA')]) == [(8, 15, 14, 45, 55, 'SMA', 'SMA')]
+
+def test_grid_search_resumes(prices, store, monkeypatch):
+    ran = []
+    run_backtest_batch = backtest.run_backtest_batch
+    def recorded(data, param_combinations, *args, **kwargs):
+        ran.append(list(param_combinations))
+        return run_backtest_batch(data, param_combinations, *args, **kwargs)
+    monkeypatch.setattr(backtest, 'run_backtest_batch', recorded)
+    # interrupted after the first chunk
+    first = param_grid(**GRID)[:3]
+    run_backtest_batch(prices, first, on_chunk=lambda rows: store.write(dataset_key(prices), rows))
+    results = grid_search(data=prices, store=store, batched=True, chunk_size=2, **GRID)
+    assert ran == [param_grid(**GRID)[3:]]
+    # an extended range only backtests its new tuples
+    wider = {**GRID, 'rsi_window_range': [10, 14]}
+    wider_results = grid_search(data=prices, store=store, batched=True, **wider)
+    assert ran[1] == [params for params in param_grid(**wider) if params[2] == 10]
+    assert len(results) == 8 and len(wider_results) == 16
+    fresh = grid_search(data=prices, batched=True, **GRID)
+    pd.testing.assert_frame_equal(results, fresh, check_dtype=False)
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from utils.risk_management import (
+    calculate_position_size, calculate_position_size_batch, calculate_stop_loss_take_profit,
+    calculate_stop_loss_take_profit_batch,
+)
+
+PRICES = [0.5, 93.0, 100.0, 27345.67]
+PERCENTAGES = [(7, 5), (1.5, 3), (0, 5), (7, 0), (None, 2), (0, None)]
+
+@pytest.mark.parametrize('side', ['LONG', 'SHORT', 'short'])
+@pytest.mark.parametrize('stop_loss_pct,take_profit_pct', PERCENTAGES)
+def test_stop_loss_take_profit_batch_matches_scalar(side, stop_loss_pct, take_profit_pct):
+    stop_loss, take_profit = calculate_stop_loss_take_profit_batch(PRICES, stop_loss_pct or 0, take_profit_pct or 0, side)
+    for i, price in enumerate(PRICES):
+        expected_sl, expected_tp = calculate_stop_loss_take_profit(price, stop_loss_pct, take_profit_pct, side)
+        # None in the scalar function (no order) is NaN in the batch
+        assert (np.isnan(stop_loss[i]) if expected_sl is None else stop_loss[i] == pytest.approx(expected_sl))
+        assert (np.isnan(take_profit[i]) if expected_tp is None else take_profit[i] == pytest.approx(expected_tp))
+
+def test_stop_loss_take_profit_batch_per_position_sides():
+    expected = [calculate_stop_loss_take_profit(price, 7, 5, side)
+                for price, side in zip(PRICES, ['LONG', 'SHORT', 'SHORT', 'LONG'])]
+    for sides in (['LONG', 'SHORT', 'short', 'long'], [1, -1, -1, 1]):
+        stop_loss, take_profit = calculate_stop_loss_take_profit_batch(PRICES, 7, 5, sides)
+        np.testing.assert_allclose(stop_loss, [sl for sl, _ in expected])
+        np.testing.assert_allclose(take_profit, [tp for _, tp in expected])
+
+@pytest.mark.parametrize('side', ['FLAT', '', 0, 2, 0.5])
+def test_invalid_side_raises(side):
+    with pytest.raises(ValueError):
+        calculate_stop_loss_take_profit_batch(PRICES, 7, 5, side)
+    with pytest.raises(ValueError):
+        calculate_stop_loss_take_profit_batch(PRICES, 7, 5, [side, 'LONG', 'LONG', 'LONG'])
+    if isinstance(side, str):
+        with pytest.raises(ValueError):
+            calculate_stop_loss_take_profit(100.0, 7, 5, side)
+
+def test_position_size_batch_matches_scalar():
+    balances = np.array([10000.0, 523.4, 0.0, 1e6])
+    risks = np.array([3, 1.5, 3, 0.1])
+    stop_losses = np.array([0.465, 99.51, 93.0, 29260.0])
+    sizes = calculate_position_size_batch(balances, risks, PRICES, stop_losses)
+    for i, price in enumerate(PRICES):
+        assert sizes[i] == pytest.approx(calculate_position_size(balances[i], risks[i], price, stop_losses[i]))
+
+def test_position_size_stop_loss_at_entry():
+    assert calculate_position_size_batch([10000.0], 3, 100.0, 100.0)[0] == np.inf
+    with pytest.raises(ZeroDivisionError):
+        calculate_position_size(10000.0, 3, 100.0, 100.0)
+
+@pytest.mark.parametrize('args', [
+    (None, 3, 100.0, 93.0), (10000.0, None, 100.0, 93.0), (10000.0, 3, None, 93.0),
+    (10000.0, 3, 100.0, None), ('10000', 3, 100.0, 93.0),
+])
+def test_position_size_rejects_missing_inputs(args):
+    with pytest.raises(TypeError):
+        calculate_position_size(*args)
+
+def test_stop_loss_take_profit_rejects_missing_price():
+    with pytest.raises(TypeError):
+        calculate_stop_loss_take_profit(None, 7, 5)
@@ -0,0 +1,129 @@
+import ccxt
+import pytest
+
+from utils.simulator import SimulatedExchange
+
+SYMBOL = 'BTC/USDT'
+HOUR = 3_600_000
+START = 400_000 * HOUR
+
+def exchange_with(candles, balance=10000.0, fee=0.0):
+    """
+    A simulator on the candles (open, high, low, close), the first one visible.
+    """
+    exchange = SimulatedExchange('1h', balance=balance, fee=fee)
+    exchange.add_candles(SYMBOL, [[START + i * HOUR, o, h, l, c, 1.0] for i, (o, h, l, c) in enumerate(candles)])
+    return exchange
+
+def open_with_brackets(exchange, position_side, stop_loss, take_profit, amount=1.0):
+    entry, close = ('BUY', 'SELL') if position_side == 'LONG' else ('SELL', 'BUY')
+    exchange.create_order(SYMBOL, 'MARKET', entry, amount, params={'positionSide': position_side})
+    sl = exchange.create_order(SYMBOL, 'STOP_MARKET', close, params={
+        'positionSide': position_side, 'stopPrice': stop_loss, 'closePosition': True})
+    tp = exchange.create_order(SYMBOL, 'TAKE_PROFIT_MARKET', close, params={
+        'positionSide': position_side, 'stopPrice': take_profit, 'closePosition': True})
+    return sl['id'], tp['id']
+
+def contracts(exchange, position_side):
+    return next((p['contracts'] for p in exchange.fetch_positions([SYMBOL])
+                if p['info']['positionSide'] == position_side), 0.0)
+
+@pytest.mark.parametrize('position_side,stop_loss,take_profit,candle,filled,price', [
+    # LONG: stop-loss below (falls to it), take-profit above (rises to it)
+    ('LONG', 95, 110, (100, 104, 94, 96), 'sl', 95),
+    ('LONG', 95, 110, (100, 111, 97, 108), 'tp', 110),
+    ('LONG', 95, 110, (100, 109, 96, 101), None, None),
+    # SHORT: the other way around
+    ('SHORT', 105, 90, (100, 106, 97, 104), 'sl', 105),
+    ('SHORT', 105, 90, (100, 103, 89, 91), 'tp', 90),
+    ('SHORT', 105, 90, (100, 104, 91, 99), None, None),
+])
+def test_bracket_trigger_direction(position_side, stop_loss, take_profit, candle, filled, price):
+    exchange = exchange_with([(100, 100, 100, 100), candle])
+    sl, tp = open_with_brackets(exchange, position_side, stop_loss, take_profit)
+    exchange.step()
+    orders = {'sl': exchange.orders[sl], 'tp': exchange.orders[tp]}
+    if filled is None:
+        assert all(order['status'] == 'open' for order in orders.values())
+        assert contracts(exchange, position_side) == 1.0
+        return
+    assert orders[filled]['status'] == 'closed'
+    assert orders[filled]['average'] == price
+    assert orders[filled]['filled'] == 1.0
+    direction = 1 if position_side == 'LONG' else -1
+    assert exchange.wallet == pytest.approx(10000.0 + (price - 100) * direction)
+    assert contracts(exchange, position_side) == 0.0
+
+@pytest.mark.parametrize('position_side,candle,filled,price', [
+    ('LONG', (90, 92, 88, 91), 'sl', 90),
+    ('LONG', (115, 118, 113, 116), 'tp', 115),
+    ('SHORT', (112, 114, 110, 111), 'sl', 112),
+    ('SHORT', (85, 87, 83, 86), 'tp', 85),
+])
+def test_gap_through_the_trigger_fills_at_the_open(position_side, candle, filled, price):
+    stop_loss, take_profit = (95, 110) if position_side == 'LONG' else (105, 90)
+    exchange = exchange_with([(100, 100, 100, 100), candle])
+    sl, tp = open_with_brackets(exchange, position_side, stop_loss, take_profit)
+    exchange.step()
+    assert exchange.orders[sl if filled == 'sl' else tp]['average'] == price
+
+@pytest.mark.parametrize('open_,filled', [(96, 'sl'), (109, 'tp'), (102.5, 'sl')])
+def test_both_brackets_in_one_candle_closest_to_the_open_first(open_, filled):
+    # the candle crosses 95 and 110, the stop-loss wins the 102.5 tie (placed first)
+    exchange = exchange_with([(100, 100, 100, 100), (open_, 111, 94, 100)])
+    sl, tp = open_with_brackets(exchange, 'LONG', 95, 110)
+    exchange.step()
+    first, other = (sl, tp) if filled == 'sl' else (tp, sl)
+    assert exchange.orders[first]['status'] == 'closed'
+    assert exchange.orders[first]['average'] == (95 if filled == 'sl' else 110)
+    assert exchange.orders[other]['status'] == 'expired'
+    assert exchange.orders[other]['filled'] == 0.0
+
+def test_close_position_orders_expire_when_flat():
+    exchange = exchange_with([(100, 100, 100, 100), (100, 101, 99, 100), (100, 120, 80, 100)])
+    sl, tp = open_with_brackets(exchange, 'LONG', 95, 110)
+    short_sl, short_tp = open_with_brackets(exchange, 'SHORT', 105, 90)
+    exchange.step()
+    # closing the LONG side by hand expires its brackets, the SHORT ones keep resting
+    exchange.create_order(SYMBOL, 'MARKET', 'SELL', 1.0, params={'positionSide': 'LONG'})
+    assert exchange.orders[sl]['status'] == exchange.orders[tp]['status'] == 'expired'
+    assert {order['id'] for order in exchange.fetch_open_orders(SYMBOL)} == {short_sl, short_tp}
+    # a stop-loss fill expires the take-profit of the side
+    exchange.step()
+    assert exchange.orders[short_sl]['status'] == 'closed'
+    assert exchange.orders[short_tp]['status'] == 'expired'
+    assert exchange.fetch_open_orders(SYMBOL) == []
+
+def test_partial_close_keeps_the_brackets():
+    exchange = exchange_with([(100, 100, 100, 100)])
+    sl, tp = open_with_brackets(exchange, 'LONG', 95, 110, amount=2.0)
+    exchange.create_order(SYMBOL, 'MARKET', 'SELL', 1.0, params={'positionSide': 'LONG'})
+    assert contracts(exchange, 'LONG') == 1.0
+    assert {order['id'] for order in exchange.fetch_open_orders(SYMBOL)} == {sl, tp}
+
+def test_margin_rejection():
+    # 20x leverage: 19 contracts at 100 cost 95 of margin + 0.76 of fee
+    exchange = exchange_with([(100, 100, 100, 100)], balance=100.0, fee=0.0004)
+    with pytest.raises(ccxt.InsufficientFunds):
+        exchange.create_order(SYMBOL, 'MARKET', 'BUY', 21.0, params={'positionSide': 'LONG'})
+    assert contracts(exchange, 'LONG') == 0.0
+    assert exchange.wallet == 100.0
+    exchange.create_order(SYMBOL, 'MARKET', 'BUY', 19.0, params={'positionSide': 'LONG'})
+    assert exchange.wallet == pytest.approx(100.0 - 19 * 100 * 0.0004)
+    # the margin in use counts against the next entry, on both sides
+    with pytest.raises(ccxt.InsufficientFunds):
+        exchange.create_order(SYMBOL, 'MARKET', 'SELL', 1.0, params={'positionSide': 'SHORT'})
+    batch = exchange.create_orders([{'symbol': SYMBOL, 'type': 'MARKET', 'side': 'BUY', 'amount': 5.0,
+                                     'params': {'positionSide': 'LONG'}}])
+    assert batch[0]['id'] is None and batch[0]['info']['error'] == 'InsufficientFunds'
+
+def test_rejected_orders():
+    exchange = exchange_with([(100, 100, 100, 100)])
+    with pytest.raises(ccxt.InvalidOrder):
+        exchange.create_order(SYMBOL, 'MARKET', 'SELL', 1.0, params={'positionSide': 'LONG'})
+    with pytest.raises(ccxt.InvalidOrder):
+        exchange.create_order(SYMBOL, 'MARKET', 'BUY', 1.0)
+    # a LONG stop-loss above the price would trigger at once
+    with pytest.raises(ccxt.OrderImmediatelyFillable):
+        exchange.create_order(SYMBOL, 'STOP_MARKET', 'SELL', params={
+            'positionSide': 'LONG', 'stopPrice': 101, 'closePosition': True})
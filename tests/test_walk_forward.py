@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest.walk_forward import best_params, walk_forward, walk_forward_folds
+
+INDEX = pd.date_range('2024-01-01', periods=30 * 24, freq='1h')
+
+def test_rolling_folds():
+    folds = walk_forward_folds(INDEX, train='10D', test='5D')
+    assert folds == [(0, 240, 360), (120, 360, 480), (240, 480, 600), (360, 600, 720)]
+    # the last test window ends on the last candle
+    assert folds[-1][2] == len(INDEX)
+
+def test_anchored_folds():
+    folds = walk_forward_folds(INDEX, train='10D', test='5D', anchored=True)
+    assert folds == [(0, 240, 360), (0, 360, 480), (0, 480, 600), (0, 600, 720)]
+
+def test_step_and_incomplete_last_window():
+    folds = walk_forward_folds(INDEX[:-10], train='10D', test='5D', step='2D')
+    assert [fold[0] for fold in folds] == [0, 48, 96, 144, 192, 240, 288, 336]
+    assert all(test_end - train_end == 120 and train_end - train_start == 240 for train_start, train_end, test_end in folds)
+    # a test window running past the history is not a fold
+    assert folds[-1][2] <= len(INDEX) - 10 < folds[-1][2] + 48
+
+def test_no_fold_when_history_is_too_short():
+    assert walk_forward_folds(INDEX[:300], train='10D', test='5D') == []
+
+def results(**columns):
+    return pd.DataFrame({'short_window': range(len(columns['total_trades'])), **columns})
+
+def test_best_params_among_enough_trades():
+    train = results(total_trades=[3, 12, 20, 15], sharpe_ratio=[5.0, 1.0, np.inf, 2.0])
+    # 3 trades is too few, inf is not a score
+    assert best_params(train, min_trades=10)['short_window'] == 3
+
+def test_best_params_without_any_tuple_meeting_min_trades():
+    train = results(total_trades=[3, 5, 2], sharpe_ratio=[0.5, 1.5, np.nan])
+    assert best_params(train, min_trades=10)['short_window'] == 1
+    undefined = results(total_trades=[3, 5], sharpe_ratio=[np.nan, -np.inf])
+    assert best_params(undefined, min_trades=10)['short_window'] == 0
+
+def test_walk_forward_out_of_sample_windows():
+    rng = np.random.default_rng(7)
+    index = pd.date_range('2024-01-01', periods=60 * 24, freq='1h')
+    data = pd.Series(30000 * np.exp(np.cumsum(rng.normal(0, 0.01, len(index)))), index=index)
+    folds, train = walk_forward(
+        data=data, train='20D', test='10D', processes=1, min_trades=1,
+        short_window_range=[5, 8], long_window_range=[15, 21], rsi_window_range=[14],
+        rsi_buy_threshold_range=[45], rsi_sell_threshold_range=[55], ma_combinations=[('SMA', 'SMA')],
+    )
+    assert len(folds) == 4 and len(train) == 4 * 4
+    # test windows follow their train window and each other, the last one ends the history
+    assert (folds['test_start'] > folds['train_end']).all()
+    assert (folds['test_start'].iloc[1:].to_numpy() == (folds['test_end'].iloc[:-1] + pd.Timedelta('1h')).to_numpy()).all()
+    assert folds['test_end'].iloc[-1] == index[-1]
+    for fold, row in folds.iterrows():
+        fold_train = train[train['fold'] == fold]
+        assert row['train_sharpe_ratio'] == pytest.approx(best_params(fold_train, min_trades=1)['sharpe_ratio'], nan_ok=True)